@@ -0,0 +1,341 @@
+"""Admission control for /quantum from a calibrated estimate of model cost, made before compiling.
+
+Cached and coalesced requests are assessed for size but never charged to the in-flight budget.
+"""
+import os
+import re
+import threading
+import time
+
+from integer_encoding import encoded_size, parse_spec
+
+MAX_VARIABLES = int(os.environ.get("QUANTUM_MAX_VARIABLES", 20000))
+MAX_MODEL_BYTES = int(os.environ.get("QUANTUM_MAX_MODEL_MB", 512)) * 1024 * 1024
+REQUEST_BUDGET_SECONDS = float(os.environ.get("QUANTUM_REQUEST_BUDGET_SECONDS", 10))
+INFLIGHT_BUDGET_SECONDS = float(os.environ.get("QUANTUM_INFLIGHT_BUDGET_SECONDS", 60))
+MIN_READS = 10
+
+IDENTIFIER = re.compile(r"[A-Za-z_][A-Za-z0-9_]*(?:\[\d+\])?")
+PRODUCT_OF_SUMS = re.compile(r"\*\*|\)\s*\*|\*\s*\(")
+
+
+class Estimate:
+    def __init__(self, variables, linear_terms, quadratic_terms):
+        self.variables = variables
+        self.linear_terms = linear_terms
+        self.quadratic_terms = quadratic_terms
+        self.solver = "neal"
+        self.compile_seconds = 0.0
+        self.memory_bytes = 0
+        self.sample_seconds_per_read = 0.0
+        self.sample_seconds_base = 0.0
+
+    def sample_seconds(self, num_reads):
+        return self.sample_seconds_base + self.sample_seconds_per_read * num_reads
+
+    @property
+    def terms(self):
+        return self.linear_terms + self.quadratic_terms
+
+    def to_dict(self, num_reads=None):
+        result = {
+            "variables": self.variables,
+            "quadratic_terms_bound": self.quadratic_terms,
+            "compile_seconds": round(self.compile_seconds, 4),
+            "memory_bytes": int(self.memory_bytes),
+        }
+        if num_reads is not None:
+            result["sample_seconds"] = round(self.sample_seconds(num_reads), 4)
+        return result
+
+
+def _variable_sizes(variable_data):
+    """Number of binary variables behind each name the expressions can use."""
+    sizes = {}
+    for name, info in variable_data.items():
+        if not isinstance(info, dict):
+            continue
+        var_type = info.get("type")
+        if var_type in ("Binary", "Spin"):
+            sizes[name] = 1
+        elif var_type == "Array":
+            shape = info.get("shape")
+            if isinstance(shape, int):
+                if shape > MAX_VARIABLES:
+                    sizes[name] = shape
+                    continue
+                for i in range(max(shape, 0)):
+                    sizes[f"{name}_{i}"] = 1
+            elif isinstance(shape, (list, tuple)) and len(shape) == 2 and all(isinstance(d, int) for d in shape):
+                rows, cols = shape
+                if rows * cols > MAX_VARIABLES:
+                    # Don't materialise names for a model that will be rejected anyway.
+                    sizes[name] = rows * cols
+                    continue
+                for i in range(rows):
+                    for j in range(cols):
+                        sizes[f"{name}_{i}_{j}"] = 1
+        elif var_type == "Unary":
+            lower, upper = info.get("lower"), info.get("upper")
+            if isinstance(lower, int) and isinstance(upper, int):
+                bits = max(upper - lower + 1, 0)
+                sizes[name] = bits
+                for i in range(min(bits, MAX_VARIABLES + 1)):
+                    sizes[f"{name}[{i}]"] = 1
+        elif var_type == "Integer":
+            try:
+                lower, upper, encoding, max_coefficient = parse_spec(name, info)
+            except ValueError:
+                continue
+            sizes[name] = encoded_size(upper - lower, encoding, max_coefficient)[0]
+    return sizes
+
+
+def _expression_terms(expr, sizes):
+    """Upper bound on (linear, quadratic) terms produced by one expression."""
+    if not isinstance(expr, str):
+        return 0, 0
+    referenced = set(IDENTIFIER.findall(expr)) & sizes.keys()
+    k = sum(sizes[name] for name in referenced)
+    if PRODUCT_OF_SUMS.search(expr):
+        return k, k * (k - 1) // 2
+    return k, min(expr.count("*"), k * (k - 1) // 2)
+
+
+def estimate_model(data):
+    sizes = _variable_sizes(data.get("variables") or {})
+    unary = [name for name in sizes if "[" not in name and f"{name}[0]" in sizes]
+    variables = sum(size for name, size in sizes.items() if "[" not in name or name.split("[")[0] not in unary)
+
+    linear, quadratic = _expression_terms(data.get("Objective", "0"), sizes)
+    for constraint in data.get("Constraints") or []:
+        if isinstance(constraint, dict):
+            k, _ = _expression_terms(constraint.get("lhs", "0"), sizes)
+            # (lhs - rhs) ** 2 couples every pair of referenced variables.
+            linear += k
+            quadratic += k * (k - 1) // 2
+    for name in unary:
+        # UnaryEncInteger's own structure plus the ordering penalties in parse_constraints.
+        linear += sizes[name]
+        quadratic += sizes[name] * (sizes[name] - 1) // 2 + max(sizes[name] - 1, 0)
+
+    for name, info in (data.get("variables") or {}).items():
+        if isinstance(info, dict) and info.get("type") == "Integer" and name in sizes:
+            # One-hot and domain-wall validity penalties.
+            _, _, encoding, max_coefficient = parse_spec(name, info)
+            bits, penalty = encoded_size(info["upper"] - info["lower"], encoding, max_coefficient)
+            linear += bits if penalty else 0
+            quadratic += penalty
+
+    quadratic = min(quadratic, variables * (variables - 1) // 2)
+    linear = min(linear, variables)
+    return Estimate(variables, linear, quadratic)
+
+
+class Calibration:
+    """Per-unit costs, updated from observed solves by exponential moving average.
+
+    Priors were measured with pyqubo 1.5 and neal 0.6 (1000 sweeps per read).
+    Solvers listed in `solver_priors` get their own sampling rate, learned
+    separately; every other solver shares neal's. Solvers in `refine_priors`
+    also pay a per-solve cost on top of their reads. Estimates never drop
+    below the priors, so feedback only makes admission more conservative.
+    """
+
+    def __init__(self, compile_per_term=4e-6, compile_base=2e-3, sample_per_unit=1.2e-6,
+                 bytes_per_term=2048, bytes_base=1024 * 1024, alpha=0.1, solver_priors=None,
+                 refine_priors=None):
+        self.priors = {"compile_per_term": compile_per_term, "sample_per_unit": sample_per_unit,
+                       "bytes_per_term": bytes_per_term}
+        # Measured with the tabu_solver defaults on one-hot and grid models.
+        for solver, rate in (solver_priors or {"tabu": 2e-7}).items():
+            self.priors[f"sample_per_unit:{solver}"] = rate
+        # The hybrid solver's reads are one neal anneal; refining its best
+        # states costs about as much as a hundred reads, whatever num_reads is.
+        for solver, rate in (refine_priors or {"hybrid": 1e-4}).items():
+            self.priors[f"refine_per_unit:{solver}"] = rate
+        self.rates = dict(self.priors)
+        self.compile_base = compile_base
+        self.bytes_base = bytes_base
+        self.alpha = alpha
+        self.observations = 0
+        self._lock = threading.Lock()
+
+    def rate(self, name):
+        return max(self.rates[name], self.priors[name])
+
+    def _sample_rate(self, solver):
+        name = f"sample_per_unit:{solver}"
+        return name if name in self.priors else "sample_per_unit"
+
+    @staticmethod
+    def sample_units(estimate):
+        """Work per read: QUBO size for the annealers, quadratic in the variables for tabu."""
+        if estimate.solver == "tabu":
+            # Each restart takes O(n) steps, each an argmin over n flips plus a neighbour update.
+            return estimate.variables ** 2 + 2 * estimate.quadratic_terms
+        return estimate.terms + estimate.variables
+
+    def apply(self, estimate, solver="neal"):
+        estimate.solver = solver
+        terms = estimate.terms + estimate.variables
+        estimate.compile_seconds = self.compile_base + self.rate("compile_per_term") * terms
+        estimate.memory_bytes = self.bytes_base + self.rate("bytes_per_term") * terms
+        estimate.sample_seconds_per_read = self.rate(self._sample_rate(solver)) * self.sample_units(estimate)
+        refine = f"refine_per_unit:{solver}"
+        estimate.sample_seconds_base = self.rate(refine) * terms if refine in self.priors else 0.0
+        return estimate
+
+    def observe(self, estimate, num_reads, compile_seconds=None, sample_seconds=None, rss_delta=None):
+        terms = estimate.terms + estimate.variables
+        if terms < 100:
+            # Fixed overheads dominate tiny models and would skew the rates.
+            return
+        with self._lock:
+            self.observations += 1
+            if compile_seconds is not None:
+                self._update("compile_per_term", max(compile_seconds - self.compile_base, 0) / terms)
+            refine = f"refine_per_unit:{estimate.solver}"
+            if sample_seconds is not None and refine in self.priors:
+                # The reads themselves are priced at the shared rate; only the refinement is learned.
+                reads_seconds = self.rate(self._sample_rate(estimate.solver)) * self.sample_units(estimate) * num_reads
+                self._update(refine, max(sample_seconds - reads_seconds, 0) / terms)
+            elif sample_seconds is not None:
+                self._update(self._sample_rate(estimate.solver),
+                             sample_seconds / (num_reads * max(self.sample_units(estimate), 1)))
+            if rss_delta:
+                self._update("bytes_per_term", rss_delta / terms)
+
+    def _update(self, name, value):
+        self.rates[name] += self.alpha * (value - self.rates[name])
+
+    def stats(self):
+        with self._lock:
+            return {"observations": self.observations, "rates": dict(self.rates)}
+
+
+class Decision:
+    def __init__(self, status, num_reads, estimate, reason=None):
+        self.status = status
+        self.num_reads = num_reads
+        self.estimate = estimate
+        self.reason = reason
+        self.downgraded = False
+        self.charge = 0.0
+
+    @property
+    def admitted(self):
+        return self.status == 200
+
+    def to_dict(self, requested_reads):
+        return {
+            "num_reads": self.num_reads,
+            "downgraded": self.admitted and self.num_reads < requested_reads,
+            "estimate": self.estimate.to_dict(self.num_reads),
+        }
+
+
+class AdmissionController:
+    def __init__(self, calibration=None, max_variables=MAX_VARIABLES, max_model_bytes=MAX_MODEL_BYTES,
+                 request_budget=REQUEST_BUDGET_SECONDS, inflight_budget=INFLIGHT_BUDGET_SECONDS):
+        self.calibration = calibration or Calibration()
+        self.max_variables = max_variables
+        self.max_model_bytes = max_model_bytes
+        self.request_budget = request_budget
+        self.inflight_budget = inflight_budget
+        self._lock = threading.Lock()
+        self.inflight_seconds = 0.0
+        self.counts = {"admitted": 0, "downgraded": 0, "rejected_size": 0, "rejected_load": 0, "shared": 0}
+
+    def admit(self, data, num_reads, solver="neal"):
+        """`assess` and `reserve` in one step, for requests that always do their own work."""
+        decision = self.assess(data, num_reads, solver)
+        return self.reserve(decision) if decision.admitted else decision
+
+    def assess(self, data, num_reads, solver="neal"):
+        """Size checks and read downgrade for `data`, without charging the in-flight budget.
+
+        Requests that may be served from a cache or join another request's
+        solve are assessed first, and only the one that actually solves
+        `reserve`s the admitted decision.
+        """
+        estimate = self.calibration.apply(estimate_model(data), solver)
+
+        if estimate.variables > self.max_variables:
+            return self._reject(413, estimate, f"Model has {estimate.variables} variables; "
+                                               f"the limit is {self.max_variables}.")
+        if estimate.memory_bytes > self.max_model_bytes:
+            return self._reject(413, estimate, "Model is too large to compile on this server.")
+
+        sample_budget = self.request_budget - estimate.compile_seconds - estimate.sample_seconds_base
+        reads = num_reads
+        if estimate.sample_seconds_per_read * reads > sample_budget:
+            reads = int(sample_budget / estimate.sample_seconds_per_read) if sample_budget > 0 else 0
+            if reads < min(MIN_READS, num_reads):
+                return self._reject(413, estimate, "Model is too expensive to solve within the "
+                                                   f"{self.request_budget:g} s request budget.")
+
+        decision = Decision(200, reads, estimate)
+        decision.downgraded = reads < num_reads
+        return decision
+
+    def reserve(self, decision):
+        """Charge an assessed decision to the in-flight budget; a 429 decision if it doesn't fit."""
+        charge = decision.estimate.compile_seconds + decision.estimate.sample_seconds(decision.num_reads)
+        with self._lock:
+            # Always let one request through so a single big model can't lock itself out.
+            if self.inflight_seconds > 0 and self.inflight_seconds + charge > self.inflight_budget:
+                self.counts["rejected_load"] += 1
+                return Decision(429, decision.num_reads, decision.estimate, "Server is busy; try again shortly.")
+            self.inflight_seconds += charge
+            self.counts["downgraded" if decision.downgraded else "admitted"] += 1
+        decision.charge = charge
+        return decision
+
+    def shared(self):
+        """Count a request answered from a cache or another request's solve, which is never charged."""
+        with self._lock:
+            self.counts["shared"] += 1
+
+    def _reject(self, status, estimate, reason):
+        with self._lock:
+            self.counts["rejected_size"] += 1
+        return Decision(status, 0, estimate, reason)
+
+    def release(self, decision):
+        with self._lock:
+            self.inflight_seconds = max(self.inflight_seconds - decision.charge, 0.0)
+        decision.charge = 0.0
+
+    def stats(self):
+        with self._lock:
+            result = {"inflight_seconds": round(self.inflight_seconds, 4), **self.counts}
+        result["calibration"] = self.calibration.stats()
+        return result
+
+
+def rss_bytes():
+    """Current resident set size, or None where /proc is unavailable."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class ResourceMeter:
+    """Times a solve and tracks the largest RSS growth seen at its checkpoints."""
+
+    def __init__(self):
+        self.start_rss = rss_bytes()
+        self.peak_rss_delta = 0
+        self.timings = {}
+        self._mark = time.perf_counter()
+
+    def checkpoint(self, stage):
+        now = time.perf_counter()
+        self.timings[stage] = self.timings.get(stage, 0.0) + now - self._mark
+        self._mark = now
+        rss = rss_bytes()
+        if rss is not None and self.start_rss is not None:
+            self.peak_rss_delta = max(self.peak_rss_delta, rss - self.start_rss)
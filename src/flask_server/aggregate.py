@@ -0,0 +1,162 @@
+"""Merge sampler reads into distinct bit-packed states with occurrence counts."""
+import numpy as np
+
+DISTRIBUTION_TOP_K = 5
+HISTOGRAM_BINS = 20
+ENERGY_TOLERANCE = 1e-9
+# Sampler `info` entries worth passing on to the response.
+REPORTED_INFO = ("quantization", "hybrid")
+POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+class AggregatedSamples:
+    """Distinct states sorted by energy (lowest first).
+
+    `states` is a `(m, ceil(n / 8))` uint8 array of bit-packed rows, with
+    `energies` and `counts` alongside; columns follow `labels`. For models
+    with constraints, `violations` holds each state's number of violated
+    constraints once they have been checked. `info` keeps the REPORTED_INFO
+    entries of the sampler's own info.
+    """
+
+    def __init__(self, labels, states, energies, counts, violations=None, info=None):
+        self.labels = list(labels)
+        self.states = states
+        self.energies = energies
+        self.counts = counts
+        self.violations = violations
+        self.info = info or {}
+
+    @classmethod
+    def from_arrays(cls, labels, samples, energies, counts=None):
+        samples = np.asarray(samples)
+        energies = np.asarray(energies, dtype=np.float64)
+        counts = np.ones(len(samples), dtype=np.int64) if counts is None else np.asarray(counts, dtype=np.int64)
+
+        packed = np.packbits(samples.astype(np.uint8, copy=False), axis=1)
+        # View each packed row as a single opaque value so np.unique merges whole rows.
+        rows = np.ascontiguousarray(packed).view(np.dtype((np.void, packed.shape[1]))).ravel()
+        _, first, inverse = np.unique(rows, return_index=True, return_inverse=True)
+        merged = np.bincount(inverse.ravel(), weights=counts).astype(np.int64)
+
+        order = np.lexsort((-merged, energies[first]))
+        return cls(labels, packed[first[order]], energies[first[order]], merged[order])
+
+    @classmethod
+    def from_sampleset(cls, sampleset):
+        record = sampleset.record
+        return cls.from_arrays(list(sampleset.variables), record.sample, record.energy,
+                               record.num_occurrences)
+
+    @classmethod
+    def from_samplesets(cls, samplesets):
+        """Aggregate the reads of several samplesets over the same variables."""
+        labels = list(samplesets[0].variables)
+        samples, energies, counts = [], [], []
+        for sampleset in samplesets:
+            columns = [sampleset.variables.index(label) for label in labels]
+            record = sampleset.record
+            samples.append(record.sample[:, columns])
+            energies.append(record.energy)
+            counts.append(record.num_occurrences)
+        aggregated = cls.from_arrays(labels, np.concatenate(samples), np.concatenate(energies),
+                                     np.concatenate(counts))
+        aggregated.info = {key: samplesets[0].info[key] for key in REPORTED_INFO if key in samplesets[0].info}
+        return aggregated
+
+    @property
+    def num_variables(self):
+        return len(self.labels)
+
+    @property
+    def num_distinct(self):
+        return len(self.energies)
+
+    @property
+    def total_reads(self):
+        return int(self.counts.sum())
+
+    def unpacked(self, index=slice(None)):
+        """0/1 uint8 rows for `index` (default: all states)."""
+        return np.unpackbits(np.atleast_2d(self.states[index]), axis=1, count=self.num_variables)
+
+    def aligned(self, labels, index=slice(None)):
+        """Like `unpacked`, with columns reordered to follow `labels` (missing labels read as 0)."""
+        position = {label: i for i, label in enumerate(self.labels)}
+        rows = self.unpacked(index)
+        columns = np.array([position.get(label, -1) for label in labels], dtype=np.int64)
+        aligned = rows[:, columns]
+        aligned[:, columns < 0] = 0
+        return aligned
+
+    def with_fixed(self, labels, assignment):
+        """These states over `labels`, with the variables in `assignment` set to its values."""
+        position = {label: i for i, label in enumerate(labels)}
+        states = np.zeros((self.num_distinct, len(labels)), dtype=np.uint8)
+        states[:, [position[label] for label in self.labels]] = self.unpacked()
+        for label, bit in assignment.items():
+            states[:, position[label]] = bit
+        result = AggregatedSamples.from_arrays(labels, states, self.energies, self.counts)
+        result.info = self.info
+        return result
+
+    def distances(self, i):
+        """Hamming distance from state `i` to every state."""
+        return POPCOUNT[self.states ^ self.states[i]].sum(axis=1, dtype=np.int64)
+
+    def diverse(self, k, min_distance=1):
+        """Indices of up to `k` low-energy states, pairwise at least `min_distance` bits apart.
+
+        States are taken greedily in energy order (fewest `violations` first
+        when known), skipping any within `min_distance` of one already taken.
+        Returns `(indices, distances)`, where each distance is the state's
+        Hamming distance to the nearest earlier pick (None for the first).
+        """
+        rank = np.arange(self.num_distinct)
+        if self.violations is not None:
+            rank = np.lexsort((self.energies, self.violations))
+        nearest = np.full(self.num_distinct, np.iinfo(np.int64).max)
+        picked, distances = [], []
+        while len(picked) < k:
+            eligible = np.flatnonzero(nearest[rank] >= max(min_distance, 1))
+            if not len(eligible):
+                break
+            i = int(rank[eligible[0]])
+            distances.append(int(nearest[i]) if picked else None)
+            picked.append(i)
+            np.minimum(nearest, self.distances(i), out=nearest)
+        return picked, distances
+
+    def sample(self, i):
+        return dict(zip(self.labels, self.unpacked(i)[0].tolist()))
+
+    def ground_state_probability(self):
+        if not self.num_distinct:
+            return 0.0
+        ground = self.energies <= self.energies[0] + ENERGY_TOLERANCE
+        return float(self.counts[ground].sum() / self.total_reads)
+
+    def histogram(self, bins=HISTOGRAM_BINS):
+        if not self.num_distinct:
+            return {"bin_edges": [], "counts": []}
+        low, high = float(self.energies[0]), float(self.energies[-1])
+        if high - low < ENERGY_TOLERANCE:
+            high = low + 1.0
+        counts, edges = np.histogram(self.energies, bins=bins, range=(low, high), weights=self.counts)
+        return {"bin_edges": edges.tolist(), "counts": counts.astype(np.int64).tolist()}
+
+    def summary(self, top_k=DISTRIBUTION_TOP_K, bins=HISTOGRAM_BINS):
+        total = self.total_reads
+        top = [{
+            "sample": self.sample(i),
+            "energy": float(self.energies[i]),
+            "num_occurrences": int(self.counts[i]),
+            "frequency": float(self.counts[i] / total),
+        } for i in range(min(top_k, self.num_distinct))]
+        return {
+            "num_reads": total,
+            "distinct_states": self.num_distinct,
+            "ground_state_probability": self.ground_state_probability(),
+            "top": top,
+            "energy_histogram": self.histogram(bins),
+        }
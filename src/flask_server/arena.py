@@ -0,0 +1,406 @@
+"""Headless arena that plays Blockly move models against baseline opponents, batching their solves."""
+import argparse
+import importlib
+import importlib.util
+import json
+import multiprocessing
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+TTT_LINES = [(0, 1, 2), (3, 4, 5), (6, 7, 8), (0, 3, 6), (1, 4, 7), (2, 5, 8), (0, 4, 8), (2, 4, 6)]
+
+
+def other(player):
+    return "O" if player == "X" else "X"
+
+
+class TicTacToe:
+    name = "tictactoe"
+
+    def __init__(self):
+        self.board = [""] * 9
+        self.player = "X"
+        self.winner = None
+        self.over = False
+
+    def legal_moves(self):
+        return [i for i, cell in enumerate(self.board) if cell == ""]
+
+    def board_for_model(self):
+        return list(self.board)
+
+    def wins(self, board, player):
+        return any(all(board[i] == player for i in line) for line in TTT_LINES)
+
+    def play(self, move):
+        self.board[move] = self.player
+        if self.wins(self.board, self.player):
+            self.winner, self.over = self.player, True
+        elif "" not in self.board:
+            self.over = True
+        self.player = other(self.player)
+
+    def winning_move(self, player):
+        for move in self.legal_moves():
+            board = list(self.board)
+            board[move] = player
+            if self.wins(board, player):
+                return move
+        return None
+
+
+class Connect4:
+    """6x7 board stored row-major like Connect4.js; a move is a column 0-6."""
+
+    name = "connect4"
+    rows, cols = 6, 7
+
+    def __init__(self):
+        self.board = [""] * (self.rows * self.cols)
+        self.player = "X"
+        self.winner = None
+        self.over = False
+
+    def legal_moves(self):
+        return [c for c in range(self.cols) if self.board[c] == ""]
+
+    def board_for_model(self):
+        return list(self.board)
+
+    def landing(self, board, column):
+        for row in range(self.rows - 1, -1, -1):
+            if board[row * self.cols + column] == "":
+                return row * self.cols + column
+        return None
+
+    def wins_at(self, board, index, player):
+        row, col = divmod(index, self.cols)
+        for dr, dc in ((0, 1), (1, 0), (1, 1), (1, -1)):
+            count = 1
+            for sign in (1, -1):
+                r, c = row + sign * dr, col + sign * dc
+                while 0 <= r < self.rows and 0 <= c < self.cols and board[r * self.cols + c] == player:
+                    count += 1
+                    r, c = r + sign * dr, c + sign * dc
+            if count >= 4:
+                return True
+        return False
+
+    def play(self, move):
+        index = self.landing(self.board, move)
+        self.board[index] = self.player
+        if self.wins_at(self.board, index, self.player):
+            self.winner, self.over = self.player, True
+        elif "" not in self.board:
+            self.over = True
+        self.player = other(self.player)
+
+    def winning_move(self, player):
+        for move in self.legal_moves():
+            board = list(self.board)
+            index = self.landing(board, move)
+            board[index] = player
+            if self.wins_at(board, index, player):
+                return move
+        return None
+
+
+class Mancala:
+    """Kalah rules as in Mancala.js: pits 0-5 and store 6 for X, pits 7-12 and store 13 for O."""
+
+    name = "mancala"
+
+    def __init__(self, seeds=4):
+        self.pits = [seeds] * 6 + [0] + [seeds] * 6 + [0]
+        self.player = "X"
+        self.winner = None
+        self.over = False
+
+    def base(self, player):
+        return 0 if player == "X" else 7
+
+    def legal_moves(self):
+        base = self.base(self.player)
+        return [i for i in range(6) if self.pits[base + i] > 0]
+
+    def board_for_model(self):
+        """The mover's pits and store first, then the opponent's."""
+        base = self.base(self.player)
+        return self.pits[base:base + 7] + self.pits[7 - base:14 - base]
+
+    def sow(self, pits, player, move):
+        """Sow from `move` on a copy of `pits`; return (pits, extra_turn)."""
+        pits = list(pits)
+        base = self.base(player)
+        skip = 13 - base
+        index = base + move
+        seeds, pits[index] = pits[index], 0
+        while seeds:
+            index = (index + 1) % 14
+            if index == skip:
+                continue
+            pits[index] += 1
+            seeds -= 1
+        store = base + 6
+        if index == store:
+            return pits, True
+        if base <= index < store and pits[index] == 1 and pits[12 - index] > 0:
+            pits[store] += pits[12 - index] + 1
+            pits[index] = pits[12 - index] = 0
+        return pits, False
+
+    def play(self, move):
+        self.pits, extra = self.sow(self.pits, self.player, move)
+        if not any(self.pits[0:6]) or not any(self.pits[7:13]):
+            self.pits[6] += sum(self.pits[0:6])
+            self.pits[13] += sum(self.pits[7:13])
+            self.pits[0:6] = [0] * 6
+            self.pits[7:13] = [0] * 6
+            self.over = True
+            if self.pits[6] != self.pits[13]:
+                self.winner = "X" if self.pits[6] > self.pits[13] else "O"
+        elif not extra:
+            self.player = other(self.player)
+
+    def winning_move(self, player):
+        # "Winning" here means a move that earns another turn.
+        for move in self.legal_moves():
+            if self.sow(self.pits, player, move)[1]:
+                return move
+        return None
+
+
+GAMES = {game.name: game for game in (TicTacToe, Connect4, Mancala)}
+
+
+def random_opponent(game, rng):
+    return rng.choice(game.legal_moves())
+
+
+def greedy_opponent(game, rng):
+    """Win (or take an extra turn) if possible, else block, else Mancala's best capture, else random."""
+    move = game.winning_move(game.player)
+    if move is None and not isinstance(game, Mancala):
+        move = game.winning_move(other(game.player))
+    if move is None and isinstance(game, Mancala):
+        store = game.base(game.player) + 6
+        gains = {m: game.sow(game.pits, game.player, m)[0][store] for m in game.legal_moves()}
+        best = max(gains.values())
+        if best > game.pits[store] + 1:
+            move = rng.choice([m for m, gain in gains.items() if gain == best])
+    return move if move is not None else random_opponent(game, rng)
+
+
+OPPONENTS = {"random": random_opponent, "greedy": greedy_opponent}
+
+
+def example_model(board, player):
+    """Reference model: one Binary per move, a one-hot constraint and positional weights."""
+    if len(board) == 9:
+        weights = [3, 1, 3, 1, 5, 1, 3, 1, 3]
+        moves = [i for i, cell in enumerate(board) if cell == ""]
+    elif len(board) == 42:
+        weights = [1, 2, 3, 4, 3, 2, 1]
+        moves = [c for c in range(7) if board[c] == ""]
+    else:
+        weights = [board[i] + (4 if board[i] == 6 - i else 0) for i in range(6)]
+        moves = [i for i in range(6) if board[i] > 0]
+    variables = {f"x{i}": {"type": "Binary"} for i in range(len(weights))}
+    objective = " + ".join(f"{-weights[i] if i in moves else 20} * x{i}" for i in range(len(weights)))
+    return {
+        "variables": variables,
+        "Constraints": [{"lhs": " + ".join(variables), "comparison": "=", "rhs": 1}],
+        "Objective": objective,
+        "Return": " + ".join(f"{i} * x{i}" for i in range(len(weights))),
+    }
+
+
+def load_model(spec):
+    """Load `path/to/file.py:function` or `module:function`; None selects example_model."""
+    if not spec:
+        return example_model
+    target, _, attr = spec.rpartition(":")
+    if not target:
+        raise ValueError(f"Model must be given as file.py:function or module:function, got {spec!r}")
+    if target.endswith(".py"):
+        module_spec = importlib.util.spec_from_file_location("arena_model", target)
+        module = importlib.util.module_from_spec(module_spec)
+        module_spec.loader.exec_module(module)
+    else:
+        module = importlib.import_module(target)
+    return getattr(module, attr)
+
+
+def solve_batch(models, num_reads, seed=None):
+    """Sample several CompiledQubos in one call; return each model's best 0/1 row."""
+    import dimod
+
+    from backends import get_backend
+
+    sizes = [model.num_variables for model in models]
+    starts = np.concatenate(([0], np.cumsum(sizes)))
+    linear = np.concatenate([model.linear() for model in models])
+    quadratic = [model.quadratic() for model in models]
+    rows = np.concatenate([q[0] + start for q, start in zip(quadratic, starts)])
+    cols = np.concatenate([q[1] + start for q, start in zip(quadratic, starts)])
+    coeffs = np.concatenate([q[2] for q in quadratic])
+    bqm = dimod.BinaryQuadraticModel.from_numpy_vectors(linear, (rows, cols, coeffs), 0.0, dimod.BINARY)
+
+    response = get_backend("neal").sample(bqm, num_reads=num_reads, seed=seed)
+    order = np.argsort(np.fromiter(response.variables, dtype=np.int64, count=len(response.variables)))
+    samples = response.record.sample[:, order]
+
+    # Blocks are independent, so each game takes its own lowest-energy read.
+    best = []
+    for model, start, size in zip(models, starts, sizes):
+        block = samples[:, start:start + size]
+        best.append(block[int(np.argmin(model.energies(block)))])
+    return best
+
+
+def choose_moves(waiting, model_fn, num_reads, rng, stats):
+    """Ask the model for a move in every game of `waiting` and play them."""
+    from integer_encoding import integer_encodings
+    from server import app, evaluate_return_expression, get_compiled_model
+
+    jobs = []
+    with app.app_context():
+        for game in waiting:
+            try:
+                payload = model_fn(game.board_for_model(), game.player)
+                compiled = get_compiled_model(payload)
+            except Exception:
+                compiled = None
+            if compiled is None or isinstance(compiled, tuple):
+                stats["model_errors"] += 1
+                game.play(rng.choice(game.legal_moves()))
+                continue
+            jobs.append((game, payload, compiled))
+
+    if not jobs:
+        return
+    start = time.perf_counter()
+    try:
+        best = solve_batch([compiled for _, _, compiled in jobs], num_reads,
+                           seed=rng.randrange(2 ** 31))
+    finally:
+        labels = [compiled.labels for _, _, compiled in jobs]
+        for _, _, compiled in jobs:
+            compiled.release()
+    stats["solve_seconds"] += time.perf_counter() - start
+    stats["solves"] += len(jobs)
+    stats["sampler_calls"] += 1
+
+    for (game, payload, _), names, row in zip(jobs, labels, best):
+        sample = dict(zip(names, row.tolist()))
+        result = evaluate_return_expression(payload.get("Return", ""), sample,
+                                            integer_encodings(payload.get("variables")))
+        move = result[0] if isinstance(result, tuple) else None
+        if not isinstance(move, (int, np.integer)) or move not in game.legal_moves():
+            stats["invalid_moves"] += 1
+            move = rng.choice(game.legal_moves())
+        game.play(int(move))
+
+
+def play_shard(game_name, model_spec, opponent_name, games, num_reads, batch, seed):
+    """Play `games` games in one process and return the tallies."""
+    rng = random.Random(seed)
+    model_fn = load_model(model_spec)
+    opponent = OPPONENTS[opponent_name]
+    stats = dict.fromkeys(("games", "wins", "losses", "draws", "moves", "solves",
+                           "sampler_calls", "invalid_moves", "model_errors"), 0)
+    stats["solve_seconds"] = 0.0
+
+    started = 0
+    active = []
+    while active or started < games:
+        while len(active) < batch and started < games:
+            # The model plays X in even games and O in odd ones.
+            active.append((GAMES[game_name](), "X" if started % 2 == 0 else "O"))
+            started += 1
+
+        for game, side in active:
+            while not game.over and game.player != side:
+                game.play(opponent(game, rng))
+                stats["moves"] += 1
+
+        waiting = [game for game, side in active if not game.over]
+        moves_before = stats["solves"] + stats["model_errors"]
+        choose_moves(waiting, model_fn, num_reads, rng, stats)
+        stats["moves"] += stats["solves"] + stats["model_errors"] - moves_before
+
+        still_active = []
+        for game, side in active:
+            if not game.over:
+                still_active.append((game, side))
+                continue
+            stats["games"] += 1
+            if game.winner is None:
+                stats["draws"] += 1
+            elif game.winner == side:
+                stats["wins"] += 1
+            else:
+                stats["losses"] += 1
+        active = still_active
+    return stats
+
+
+def run_arena(game, model=None, opponent="random", games=1000, processes=None,
+              batch=32, num_reads=100, seed=0):
+    # Importing the server here creates the shared QUBO cache in this process,
+    # so forked pool workers share it and it is cleaned up when we exit.
+    import server  # noqa: F401
+
+    processes = processes or os.cpu_count() or 1
+    shards = [games // processes + (1 if i < games % processes else 0) for i in range(processes)]
+    shards = [n for n in shards if n]
+    start = time.perf_counter()
+    if len(shards) == 1:
+        results = [play_shard(game, model, opponent, shards[0], num_reads, batch, seed)]
+    else:
+        context = multiprocessing.get_context("fork" if "fork" in multiprocessing.get_all_start_methods() else None)
+        with ProcessPoolExecutor(len(shards), mp_context=context) as pool:
+            futures = [pool.submit(play_shard, game, model, opponent, n, num_reads, batch, seed + i)
+                       for i, n in enumerate(shards)]
+            results = [future.result() for future in futures]
+    elapsed = time.perf_counter() - start
+
+    totals = {key: sum(result[key] for result in results) for key in results[0]}
+    played = totals["games"] or 1
+    totals.update({
+        "game": game,
+        "opponent": opponent,
+        "processes": len(shards),
+        "elapsed_seconds": round(elapsed, 3),
+        "win_rate": totals["wins"] / played,
+        "draw_rate": totals["draws"] / played,
+        "loss_rate": totals["losses"] / played,
+        "moves_per_second": totals["moves"] / elapsed if elapsed else 0.0,
+        "games_per_second": totals["games"] / elapsed if elapsed else 0.0,
+        "solve_seconds": round(totals["solve_seconds"], 3),
+    })
+    return totals
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Play Blockly QUBO models against baseline opponents.")
+    parser.add_argument("--game", choices=sorted(GAMES), default="tictactoe")
+    parser.add_argument("--model", help="file.py:function or module:function (default: built-in example)")
+    parser.add_argument("--opponent", choices=sorted(OPPONENTS), default="random")
+    parser.add_argument("--games", type=int, default=1000)
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--batch", type=int, default=32, help="games solved together per sampler call")
+    parser.add_argument("--num-reads", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    report = run_arena(args.game, args.model, args.opponent, args.games, args.processes,
+                       args.batch, args.num_reads, args.seed)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
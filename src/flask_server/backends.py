@@ -0,0 +1,96 @@
+"""Registry of solver backends, imported on first use so server.py starts quickly."""
+import threading
+
+_loaders = {}
+_backends = {}
+_lock = threading.Lock()
+
+
+def register_backend(name, loader):
+    """Register `loader`, a zero-argument callable returning a sampler with `.sample(bqm, **kwargs)`."""
+    with _lock:
+        _loaders[name] = loader
+        _backends.pop(name, None)
+
+
+def get_backend(name):
+    backend = _backends.get(name)
+    if backend is not None:
+        return backend
+    with _lock:
+        if name not in _backends:
+            if name not in _loaders:
+                raise KeyError(f"Unknown solver backend: {name}")
+            _backends[name] = _loaders[name]()
+        return _backends[name]
+
+
+def available_backends():
+    return sorted(_loaders)
+
+
+def loaded_backends():
+    return sorted(_backends)
+
+
+def preload(names=None, modules=("pyqubo",), background=True):
+    """Load backends (all registered ones by default) and import `modules` ahead of the first request."""
+    def load():
+        import importlib
+
+        for module in modules:
+            importlib.import_module(module)
+        for name in names or available_backends():
+            get_backend(name)
+
+    if not background:
+        load()
+        return None
+    thread = threading.Thread(target=load, name="backend-preload", daemon=True)
+    thread.start()
+    return thread
+
+
+def _load_neal():
+    from neal import SimulatedAnnealingSampler
+
+    return SimulatedAnnealingSampler()
+
+
+register_backend("neal", _load_neal)
+
+
+def _load_hybrid():
+    from hybrid_solver import HybridSampler
+
+    return HybridSampler()
+
+
+register_backend("hybrid", _load_hybrid)
+
+
+def _load_tabu():
+    from tabu_solver import TabuSampler
+
+    return TabuSampler()
+
+
+register_backend("tabu", _load_tabu)
+
+
+def _load_colored():
+    from colored_solver import ColoredAnnealingSampler
+
+    return ColoredAnnealingSampler()
+
+
+register_backend("colored", _load_colored)
+
+
+def _load_quantized():
+    from colored_solver import ColoredAnnealingSampler
+
+    return ColoredAnnealingSampler(quantize=True)
+
+
+register_backend("quantized", _load_quantized)
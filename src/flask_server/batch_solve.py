@@ -0,0 +1,111 @@
+"""Solve a directory of models offline, writing one NDJSON result line per file."""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from qubo_io import FORMATS
+
+EXTENSIONS = (".json",) + tuple(f".{fmt}" for fmt in FORMATS)
+
+
+def find_models(sources):
+    paths = []
+    for source in sources:
+        if os.path.isdir(source):
+            paths.extend(sorted(os.path.join(source, name) for name in os.listdir(source)
+                                if name.lower().endswith(EXTENSIONS)))
+        else:
+            paths.append(source)
+    return paths
+
+
+def solve_file(path, defaults, mmap=False):
+    """One NDJSON record for the model at `path`."""
+    from flask import Response
+    from sampling import best_result, sample_compiled
+    from server import app, evaluate_return_expression, parse_solve_options, solve_model
+    from integer_encoding import integer_encodings
+    import qubo_io
+
+    start = time.perf_counter()
+    record = {"file": path}
+    try:
+        if path.lower().endswith(".json"):
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            with app.app_context():
+                options = parse_solve_options({**defaults, **data})
+                if isinstance(options, tuple):
+                    return {**record, "error": options[0].get_json()["error"]}
+                options.pop("fresh")
+                top_k, min_distance = options.pop("top_k"), options.pop("min_distance")
+                result = solve_model(data, **options)
+                if isinstance(result[0], Response):
+                    return {**record, "error": result[0].get_json()["error"]}
+            best = best_result(*result, top_k, min_distance)
+            record.update(options)
+            if data.get("Return"):
+                encodings = integer_encodings(data.get("variables"))
+                decoded = evaluate_return_expression(data["Return"], best["sample"], encodings)
+                record["return"] = decoded[0] if isinstance(decoded, tuple) else None
+                for option in best.get("solutions", ()):
+                    decoded = evaluate_return_expression(data["Return"], option["sample"], encodings)
+                    option["return"] = decoded[0] if isinstance(decoded, tuple) else None
+            if "solutions" in best:
+                record["solutions"] = best["solutions"]
+        else:
+            compiled = qubo_io.load(path, mmap=mmap)
+            options = {key: defaults[key] for key in ("solver", "num_reads", "seed", "polish")}
+            samples, stats, feasibility = sample_compiled(compiled, **options)
+            best = best_result(samples, compiled.offset, stats, feasibility)
+            record.update(options)
+        record.update(energy=best["energy"], offset=best["offset"], sample=best["sample"])
+        if best["feasibility"] is not None:
+            record["feasible"] = best["feasibility"]["feasible"]
+    except Exception as e:
+        record["error"] = f"{type(e).__name__}: {e}"
+    record["seconds"] = round(time.perf_counter() - start, 4)
+    return record
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Solve models from disk and write NDJSON results.")
+    parser.add_argument("models", nargs="+", help="model files or directories")
+    parser.add_argument("--out", default="-", help="output file (default: stdout)")
+    parser.add_argument("--solver", default="neal")
+    parser.add_argument("--num-reads", type=int, default=1000)
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--polish", type=int, default=0, help="number of best samples to polish")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--mmap", action="store_true", help="memory-map .npz coefficient arrays")
+    args = parser.parse_args(argv)
+
+    paths = find_models(args.models)
+    if not paths:
+        parser.error("no models found")
+    defaults = {"solver": args.solver, "num_reads": args.num_reads, "seed": args.seed, "polish": args.polish}
+
+    # Imported before the pool forks, so workers share its compiled-QUBO cache.
+    import server  # noqa: F401
+
+    out = sys.stdout if args.out == "-" else open(args.out, "w", encoding="utf-8")
+    start, errors = time.perf_counter(), 0
+    try:
+        with ProcessPoolExecutor(max_workers=args.workers) as pool:
+            futures = [pool.submit(solve_file, path, defaults, args.mmap) for path in paths]
+            for future in as_completed(futures):
+                record = future.result()
+                errors += "error" in record
+                out.write(json.dumps(record, separators=(",", ":"), default=str) + "\n")
+                out.flush()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    print(f"{len(paths)} models, {errors} errors, {time.perf_counter() - start:.1f}s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,353 @@
+"""Job queue between the web tier and solver workers, shared through SQLite or over HTTP.
+
+Jobs reference a compiled QUBO stored once per model hash, and workers hold renewable leases on them.
+"""
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+
+LEASE_SECONDS = float(os.environ.get("QUANTUM_BROKER_LEASE_SECONDS", 30))
+MAX_ATTEMPTS = int(os.environ.get("QUANTUM_BROKER_MAX_ATTEMPTS", 3))
+PAYLOAD_TTL = float(os.environ.get("QUANTUM_BROKER_PAYLOAD_TTL", 3600))
+WORKER_TIMEOUT = 3 * LEASE_SECONDS
+POLL_MIN_SECONDS = 0.01
+POLL_MAX_SECONDS = 0.25
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS payloads (hash TEXT PRIMARY KEY, data BLOB NOT NULL, created REAL NOT NULL);
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY, payload TEXT NOT NULL, params TEXT NOT NULL, priority REAL NOT NULL,
+    status TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, worker TEXT, lease_until REAL,
+    result TEXT, error TEXT, created REAL NOT NULL, updated REAL NOT NULL);
+CREATE INDEX IF NOT EXISTS jobs_queue ON jobs (status, priority DESC, created);
+CREATE TABLE IF NOT EXISTS workers (id TEXT PRIMARY KEY, info TEXT, heartbeat REAL NOT NULL, completed INTEGER NOT NULL DEFAULT 0);
+"""
+
+
+class JobFailed(Exception):
+    pass
+
+
+class SqliteBroker:
+    """The queue itself; safe to share between threads and processes."""
+
+    def __init__(self, path, lease_seconds=LEASE_SECONDS, max_attempts=MAX_ATTEMPTS, payload_ttl=PAYLOAD_TTL):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.payload_ttl = payload_ttl
+        self._local = threading.local()
+        self._connection().executescript(SCHEMA)
+
+    def _connection(self):
+        # One connection per thread and per (possibly forked) process.
+        connection = getattr(self._local, "connection", None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection, self._local.pid = connection, os.getpid()
+        return connection
+
+    def _transaction(self):
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        return connection
+
+    def has_payload(self, key):
+        return self._connection().execute("SELECT 1 FROM payloads WHERE hash = ?", (key,)).fetchone() is not None
+
+    def put_payload(self, key, data):
+        self._connection().execute("INSERT OR IGNORE INTO payloads VALUES (?, ?, ?)", (key, data, time.time()))
+
+    def get_payload(self, key):
+        row = self._connection().execute("SELECT data FROM payloads WHERE hash = ?", (key,)).fetchone()
+        return bytes(row[0]) if row else None
+
+    def submit(self, payload, params, priority=1.0):
+        """Queue a job on the stored payload `payload`; None if there is no such payload."""
+        job_id = uuid.uuid4().hex
+        connection = self._transaction()
+        try:
+            now = time.time()
+            # `created` doubles as the payload's last use, which keeps it from expiring.
+            if not connection.execute("UPDATE payloads SET created = ? WHERE hash = ?", (now, payload)).rowcount:
+                connection.execute("ROLLBACK")
+                return None
+            connection.execute(
+                "INSERT INTO jobs (id, payload, params, priority, status, created, updated) "
+                "VALUES (?, ?, ?, ?, 'queued', ?, ?)", (job_id, payload, json.dumps(params), priority, now, now))
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        return job_id
+
+    def claim(self, worker):
+        """Lease the next job to `worker`: `{"id", "payload", "params"}`, or None."""
+        connection = self._transaction()
+        try:
+            now = time.time()
+            self._expire(connection, now)
+            row = connection.execute(
+                "SELECT id, payload, params FROM jobs WHERE status = 'queued' "
+                "ORDER BY priority DESC, created LIMIT 1").fetchone()
+            if row is not None:
+                connection.execute(
+                    "UPDATE jobs SET status = 'running', worker = ?, attempts = attempts + 1, "
+                    "lease_until = ?, updated = ? WHERE id = ?", (worker, now + self.lease_seconds, now, row[0]))
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        if row is None:
+            return None
+        return {"id": row[0], "payload": row[1], "params": json.loads(row[2])}
+
+    def _expire(self, connection, now):
+        """Re-queue running jobs whose lease ran out, or fail them once out of attempts."""
+        connection.execute(
+            "UPDATE jobs SET status = 'failed', error = 'Lease expired too many times', updated = ? "
+            "WHERE status = 'running' AND lease_until < ? AND attempts >= ?", (now, now, self.max_attempts))
+        connection.execute(
+            "UPDATE jobs SET status = 'queued', worker = NULL, updated = ? "
+            "WHERE status = 'running' AND lease_until < ?", (now, now))
+
+    def heartbeat(self, worker, job_id=None, info=None):
+        """Record that `worker` is alive and extend its lease on `job_id`.
+
+        Returns False if the job is no longer leased to the worker, so it can give up.
+        """
+        now = time.time()
+        connection = self._connection()
+        connection.execute(
+            "INSERT INTO workers (id, info, heartbeat) VALUES (?, ?, ?) "
+            "ON CONFLICT(id) DO UPDATE SET heartbeat = excluded.heartbeat, info = COALESCE(excluded.info, info)",
+            (worker, json.dumps(info) if info is not None else None, now))
+        if job_id is None:
+            return True
+        updated = connection.execute(
+            "UPDATE jobs SET lease_until = ? WHERE id = ? AND worker = ? AND status = 'running'",
+            (now + self.lease_seconds, job_id, worker)).rowcount
+        return updated == 1
+
+    def complete(self, job_id, worker, result):
+        connection = self._connection()
+        updated = connection.execute(
+            "UPDATE jobs SET status = 'done', result = ?, updated = ? WHERE id = ? AND worker = ? AND status = 'running'",
+            (json.dumps(result), time.time(), job_id, worker)).rowcount
+        if updated:
+            connection.execute("UPDATE workers SET completed = completed + 1 WHERE id = ?", (worker,))
+        return updated == 1
+
+    def fail(self, job_id, worker, error):
+        """Give a job back after an error; it is retried until it runs out of attempts."""
+        now = time.time()
+        updated = self._connection().execute(
+            "UPDATE jobs SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'queued' END, "
+            "worker = NULL, error = ?, updated = ? WHERE id = ? AND worker = ? AND status = 'running'",
+            (self.max_attempts, error, now, job_id, worker)).rowcount
+        return updated == 1
+
+    def status(self, job_id):
+        row = self._connection().execute(
+            "SELECT status, attempts, result, error FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = {"id": job_id, "status": row[0], "attempts": row[1], "error": row[3]}
+        if row[2] is not None:
+            job["result"] = json.loads(row[2])
+        return job
+
+    def forget(self, job_id):
+        """Delete a finished job, then anything that has sat unused for `payload_ttl`."""
+        connection = self._transaction()
+        try:
+            connection.execute("DELETE FROM jobs WHERE id = ? AND status IN ('done', 'failed')", (job_id,))
+            self._prune(connection, time.time() - self.payload_ttl)
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+
+    def _prune(self, connection, cutoff):
+        # Finished jobs whose waiter gave up, then payloads no remaining job needs.
+        connection.execute("DELETE FROM jobs WHERE status IN ('done', 'failed') AND updated < ?", (cutoff,))
+        connection.execute("DELETE FROM payloads WHERE created < ? AND hash NOT IN (SELECT payload FROM jobs)",
+                           (cutoff,))
+
+    def stats(self):
+        connection = self._connection()
+        jobs = dict(connection.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+        alive = connection.execute("SELECT COUNT(*) FROM workers WHERE heartbeat > ?",
+                                   (time.time() - WORKER_TIMEOUT,)).fetchone()[0]
+        payloads = connection.execute("SELECT COUNT(*), COALESCE(SUM(LENGTH(data)), 0) FROM payloads").fetchone()
+        return {"jobs": jobs, "workers_alive": alive, "payloads": payloads[0], "payload_bytes": payloads[1]}
+
+
+class HttpBroker:
+    """Client for a broker served by `broker.py`, with the SqliteBroker interface."""
+
+    def __init__(self, url, timeout=30):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+
+    def _request(self, method, path, body=None, content_type="application/json"):
+        if body is not None and content_type == "application/json":
+            body = json.dumps(body).encode("utf-8")
+        req = urllib.request.Request(self.url + path, data=body, method=method,
+                                     headers={"Content-Type": content_type} if body is not None else {})
+        try:
+            with urllib.request.urlopen(req, timeout=self.timeout) as response:
+                return response.status, response.read()
+        except urllib.error.HTTPError as e:
+            if e.code in (404, 409):
+                return e.code, None
+            raise
+
+    def _json(self, method, path, body=None):
+        status, data = self._request(method, path, body)
+        return json.loads(data) if status == 200 and data else None
+
+    def has_payload(self, key):
+        return self._request("HEAD", f"/payloads/{key}")[0] == 200
+
+    def put_payload(self, key, data):
+        self._request("PUT", f"/payloads/{key}", data, "application/octet-stream")
+
+    def get_payload(self, key):
+        status, data = self._request("GET", f"/payloads/{key}")
+        return data if status == 200 else None
+
+    def submit(self, payload, params, priority=1.0):
+        job = self._json("POST", "/jobs", {"payload": payload, "params": params, "priority": priority})
+        return job["id"] if job is not None else None
+
+    def claim(self, worker):
+        return self._json("POST", "/jobs/claim", {"worker": worker})
+
+    def heartbeat(self, worker, job_id=None, info=None):
+        return self._json("POST", "/heartbeat", {"worker": worker, "job": job_id, "info": info})["ok"]
+
+    def complete(self, job_id, worker, result):
+        return self._json("POST", f"/jobs/{job_id}/complete", {"worker": worker, "result": result})["ok"]
+
+    def fail(self, job_id, worker, error):
+        return self._json("POST", f"/jobs/{job_id}/fail", {"worker": worker, "error": error})["ok"]
+
+    def status(self, job_id):
+        return self._json("GET", f"/jobs/{job_id}")
+
+    def forget(self, job_id):
+        self._request("DELETE", f"/jobs/{job_id}")
+
+    def stats(self):
+        return self._json("GET", "/stats")
+
+
+def connect(target):
+    """HttpBroker for an http(s) URL, SqliteBroker for a file path."""
+    if target.startswith(("http://", "https://")):
+        return HttpBroker(target)
+    return SqliteBroker(target)
+
+
+def wait(broker, job_id, timeout):
+    """Result of `job_id` once done; raises JobFailed or TimeoutError."""
+    deadline = time.monotonic() + timeout
+    delay = POLL_MIN_SECONDS
+    while True:
+        job = broker.status(job_id)
+        if job is None:
+            raise JobFailed(f"Job {job_id} disappeared")
+        if job["status"] == "done":
+            broker.forget(job_id)
+            return job["result"]
+        if job["status"] == "failed":
+            broker.forget(job_id)
+            raise JobFailed(job["error"] or "Job failed")
+        if time.monotonic() >= deadline:
+            raise TimeoutError(f"Job {job_id} not finished after {timeout:.0f}s")
+        time.sleep(delay)
+        delay = min(delay * 2, POLL_MAX_SECONDS)
+
+
+def broker_app(broker):
+    """Flask app exposing `broker` to HttpBroker clients."""
+    from flask import Flask, Response, jsonify, request
+
+    app = Flask("broker")
+
+    @app.route("/payloads/<key>", methods=["HEAD", "GET", "PUT"])
+    def payload(key):
+        if request.method == "PUT":
+            broker.put_payload(key, request.get_data())
+            return jsonify({"ok": True}), 200
+        data = broker.get_payload(key) if request.method == "GET" else None
+        if data is None and not broker.has_payload(key):
+            return Response(status=404)
+        return Response(data or b"", mimetype="application/octet-stream")
+
+    @app.route("/jobs", methods=["POST"])
+    def submit():
+        body = request.json
+        job_id = broker.submit(body["payload"], body["params"], body.get("priority", 1.0))
+        if job_id is None:
+            return jsonify({"error": f"No payload {body['payload']}"}), 409
+        return jsonify({"id": job_id}), 200
+
+    @app.route("/jobs/claim", methods=["POST"])
+    def claim():
+        job = broker.claim(request.json["worker"])
+        return (jsonify(job), 200) if job is not None else Response(status=204)
+
+    @app.route("/heartbeat", methods=["POST"])
+    def heartbeat():
+        body = request.json
+        return jsonify({"ok": broker.heartbeat(body["worker"], body.get("job"), body.get("info"))}), 200
+
+    @app.route("/jobs/<job_id>/complete", methods=["POST"])
+    def complete(job_id):
+        body = request.json
+        return jsonify({"ok": broker.complete(job_id, body["worker"], body["result"])}), 200
+
+    @app.route("/jobs/<job_id>/fail", methods=["POST"])
+    def fail(job_id):
+        body = request.json
+        return jsonify({"ok": broker.fail(job_id, body["worker"], body["error"])}), 200
+
+    @app.route("/jobs/<job_id>", methods=["GET", "DELETE"])
+    def job(job_id):
+        if request.method == "DELETE":
+            broker.forget(job_id)
+            return jsonify({"ok": True}), 200
+        status = broker.status(job_id)
+        return (jsonify(status), 200) if status is not None else Response(status=404)
+
+    @app.route("/stats", methods=["GET"])
+    def stats():
+        return jsonify(broker.stats()), 200
+
+    return app
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve a solver job queue over HTTP.")
+    parser.add_argument("--db", default="queue.db", help="SQLite file holding the queue")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8100)
+    args = parser.parse_args(argv)
+
+    from werkzeug.serving import run_simple
+
+    run_simple(args.host, args.port, broker_app(SqliteBroker(args.db)), threaded=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""Opt-in capture of /quantum and session requests to gzipped NDJSON traces for replay.py.
+
+Sessions are sampled whole, by a hash of their id, so a captured turn always has its create.
+"""
+import atexit
+import gzip
+import json
+import os
+import random
+import threading
+import time
+import zlib
+
+from flask import g, request
+
+CAPTURE_MAX_BYTES = 64 * 1024 * 1024
+CAPTURE_FLUSH_RECORDS = 32
+CAPTURE_FLUSH_SECONDS = 2.0
+
+
+class TraceWriter:
+    """Appends records as complete gzip members to per-process `trace-<pid>-<n>.ndjson.gz` files."""
+
+    def __init__(self, directory, max_bytes=CAPTURE_MAX_BYTES,
+                 flush_records=CAPTURE_FLUSH_RECORDS, flush_seconds=CAPTURE_FLUSH_SECONDS):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.flush_records = flush_records
+        self.flush_seconds = flush_seconds
+        self._lock = threading.Lock()
+        self._pid = None
+        os.makedirs(directory, exist_ok=True)
+        atexit.register(self.flush)
+
+    def _reset_for_process(self):
+        # Called with the lock held, the first time a (possibly forked) process writes.
+        self._pid = os.getpid()
+        self._buffer = []
+        self._sequence = 0
+        self._path = self._next_path()
+        self._last_flush = time.monotonic()
+        threading.Thread(target=self._flush_periodically, name="capture-flush", daemon=True).start()
+
+    def _next_path(self):
+        while True:
+            path = os.path.join(self.directory, f"trace-{self._pid}-{self._sequence}.ndjson.gz")
+            self._sequence += 1
+            if not os.path.exists(path):
+                return path
+
+    def write(self, record):
+        line = json.dumps(record, separators=(",", ":"), ensure_ascii=False) + "\n"
+        with self._lock:
+            if self._pid != os.getpid():
+                self._reset_for_process()
+            self._buffer.append(line)
+            if len(self._buffer) >= self.flush_records:
+                self._flush_locked()
+
+    def _flush_periodically(self):
+        while True:
+            time.sleep(self.flush_seconds)
+            with self._lock:
+                if self._buffer and time.monotonic() - self._last_flush >= self.flush_seconds:
+                    self._flush_locked()
+
+    def flush(self):
+        with self._lock:
+            if self._pid == os.getpid():
+                self._flush_locked()
+
+    def _flush_locked(self):
+        self._last_flush = time.monotonic()
+        if not self._buffer:
+            return
+        chunk = gzip.compress("".join(self._buffer).encode("utf-8"))
+        self._buffer = []
+        with open(self._path, "ab") as f:
+            f.write(chunk)
+            size = f.tell()
+        if size >= self.max_bytes:
+            self._path = self._next_path()
+
+
+def read_trace(paths):
+    """Yield records from trace files in file order."""
+    for path in paths:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def install_capture(app, directory, rate=1.0, paths=("/quantum", "/session")):
+    """Record requests to `paths` (and their sub-paths) on `app`."""
+    writer = TraceWriter(directory)
+
+    def captured():
+        return any(request.path == p or request.path.startswith(p + "/") for p in paths)
+
+    def sampled(session):
+        return rate >= 1 or zlib.crc32(session.encode("utf-8")) < rate * 2 ** 32
+
+    @app.before_request
+    def start_capture():
+        if request.method != "POST" or not captured():
+            return
+        # A session's sampling is decided once its id is known, after the request.
+        if request.path.startswith("/session") or rate >= 1 or random.random() < rate:
+            g.capture_start = time.perf_counter()
+
+    @app.after_request
+    def finish_capture(response):
+        start = g.pop("capture_start", None)
+        if start is None:
+            return response
+        duration = time.perf_counter() - start
+        try:
+            record = {
+                "ts": time.time() - duration,
+                "path": request.path,
+                "payload": request.get_json(force=True, silent=True),
+                "status": response.status_code,
+                "duration_ms": round(duration * 1000, 3),
+                "response_bytes": response.calculate_content_length(),
+                "pid": os.getpid(),
+            }
+            if request.path.startswith("/session"):
+                session = (request.view_args or {}).get("session_id")
+                if session is None and response.is_json:
+                    session = (response.get_json(silent=True) or {}).get("session")
+                if session is not None and not sampled(session):
+                    return response
+                if session is None and rate < 1 and random.random() >= rate:
+                    return response
+                record["session"] = session
+            writer.write(record)
+        except Exception as e:
+            app.logger.warning("Traffic capture failed: %s", e)
+        return response
+
+    return writer
@@ -0,0 +1,265 @@
+"""Simulated annealing that flips a whole colour class of uncoupled variables at once.
+
+Suits sparse, lattice-like models; `quantize` runs the same sweeps on int16 when the weights allow.
+"""
+import functools
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from compiled_qubo import CompiledQubo
+
+COLORING_CACHE_SIZE = 64
+DEFAULT_SWEEPS = 1000
+CHUNK_BYTES = 1 << 21
+MIN_CHUNK_READS = 32
+ACCEPT_LOG_SCALE = np.float32(np.log(65536))
+INT16_LIMIT = int(np.iinfo(np.int16).max)
+# Scales tried, in order, to make decimal weights exact integers.
+EXACT_SCALES = (1, 2, 4, 5, 8, 10, 16, 20, 25, 50, 100, 1000)
+QUANTIZATION_TOLERANCE = 0.01
+
+_colorings = OrderedDict()
+_colorings_lock = threading.Lock()
+
+
+def greedy_coloring(indptr, indices):
+    """Colour of each vertex of a CSR graph, no two neighbours sharing one."""
+    n = len(indptr) - 1
+    colors = np.full(n, -1, dtype=np.int32)
+    order = np.argsort(-np.diff(indptr), kind="stable")
+    for v in order.tolist():
+        used = colors[indices[indptr[v]:indptr[v + 1]]]
+        taken = np.zeros(len(used) + 1, dtype=bool)
+        taken[used[(used >= 0) & (used <= len(used))]] = True
+        colors[v] = int(np.argmin(taken))
+    return colors
+
+
+def cached_coloring(qubo):
+    """`greedy_coloring` of `qubo`'s couplings, memoized on the graph structure."""
+    indptr, indices, _ = qubo.adjacency()
+    key = hashlib.blake2b(indptr.tobytes() + indices.tobytes(), digest_size=16).digest()
+    with _colorings_lock:
+        colors = _colorings.get(key)
+        if colors is not None:
+            _colorings.move_to_end(key)
+            return colors
+    colors = greedy_coloring(indptr, indices)
+    with _colorings_lock:
+        _colorings[key] = colors
+        while len(_colorings) > COLORING_CACHE_SIZE:
+            _colorings.popitem(last=False)
+    return colors
+
+
+def color_classes(qubo, colors, dtype=np.float32):
+    """Variables reordered so each colour is contiguous, plus padded neighbour tables.
+
+    Returns `(order, classes)`: position p of the reordered state holds
+    variable `order[p]`, and each class is `(start, stop, linear,
+    neighbours, coupling)` in reordered positions, with padding slots pointing
+    at position n. Coefficients are stored as `dtype`.
+    """
+    indptr, indices, weights = qubo.adjacency()
+    n = qubo.num_variables
+    order = np.argsort(colors, kind="stable")
+    position = np.empty(n + 1, dtype=np.int64)
+    position[order] = np.arange(n)
+    position[n] = n
+    linear = qubo.linear()
+    degree = np.diff(indptr)
+    bounds = np.searchsorted(colors[order], np.arange(int(colors.max()) + 2 if n else 1))
+    classes = []
+    for start, stop in zip(bounds[:-1].tolist(), bounds[1:].tolist()):
+        members = order[start:stop]
+        degrees = degree[members]
+        width = max(int(degrees.max()), 1)
+        rows = np.repeat(np.arange(len(members)), degrees)
+        slots = np.arange(len(rows)) - np.repeat(np.cumsum(degrees) - degrees, degrees)
+        source = np.repeat(indptr[members], degrees) + slots
+        neighbours = np.full((width, len(members)), n, dtype=np.int64)
+        coupling = np.zeros((width, len(members), 1), dtype=dtype)
+        neighbours[slots, rows] = position[indices[source]]
+        coupling[slots, rows, 0] = weights[source]
+        classes.append((start, stop, linear[members].astype(dtype)[:, None], neighbours, coupling))
+    return order, classes
+
+
+def field_bound(qubo, coeffs):
+    """Largest `|h_v| + sum_k |J_vk|` over the variables: a bound on every local field."""
+    magnitude = np.abs(coeffs)
+    off = qubo.rows != qubo.cols
+    n = qubo.num_variables
+    bound = np.bincount(qubo.rows, magnitude, n) + np.bincount(qubo.cols[off], magnitude[off], n)
+    return float(bound.max()) if n else 0.0
+
+
+def quantize(qubo, limit=INT16_LIMIT, tolerance=QUANTIZATION_TOLERANCE):
+    """Integer coefficients for `qubo` whose local fields stay within `limit`.
+
+    Returns `(coeffs, scale, report)`, where `coeffs` approximates
+    `qubo.coeffs * scale`, or `(None, None, report)` when no scale keeps
+    the rounding error within `tolerance` of the smallest coefficient.
+    """
+    coeffs = qubo.coeffs
+    bound = field_bound(qubo, coeffs)
+    nonzero = np.abs(coeffs[coeffs != 0])
+    if not len(nonzero):
+        return np.zeros_like(coeffs), 1.0, {"kernel": "int16", "scale": 1.0, "exact": True,
+                                            "max_coefficient_error": 0.0, "energy_error_bound": 0.0}
+    for scale in EXACT_SCALES:
+        scaled = coeffs * scale
+        rounded = np.round(scaled)
+        if bound * scale > limit:
+            break
+        if np.abs(scaled - rounded).max() <= 1e-9 * max(1.0, float(np.abs(scaled).max())):
+            return rounded, float(scale), {"kernel": "int16", "scale": float(scale), "exact": True,
+                                           "max_coefficient_error": 0.0, "energy_error_bound": 0.0}
+
+    scale = limit / bound
+    rounded = np.round(coeffs * scale)
+    while field_bound(qubo, rounded) > limit:
+        scale *= 0.999 * limit / field_bound(qubo, rounded)
+        rounded = np.round(coeffs * scale)
+    error = np.abs(rounded / scale - coeffs)
+    report = {"scale": scale, "exact": False, "max_coefficient_error": float(error.max()),
+              "energy_error_bound": float(error.sum())}
+    if error.max() > tolerance * nonzero.min():
+        return None, None, {**report, "kernel": "float32",
+                            "reason": "coefficient range too wide for int16"}
+    return rounded, scale, {**report, "kernel": "int16"}
+
+
+def acceptance_table(beta, bound):
+    """`65536 * exp(-beta * k)` floored, for integer energy increases k up to where it reaches 0."""
+    cutoff = int(ACCEPT_LOG_SCALE / beta) + 1 if beta > 0 else bound
+    k = np.arange(min(bound, cutoff) + 1)
+    return np.floor(65536 * np.exp(-beta * k)).astype(np.int32)
+
+
+def uniform16(bit_generator, shape):
+    """Uniform uint16 draws straight from the raw 64-bit generator output."""
+    count = int(np.prod(shape))
+    return bit_generator.random_raw((count + 3) // 4).view(np.uint16)[:count].reshape(shape)
+
+
+def anneal(n, order, classes, num_reads, betas, rng):
+    """0/1 states (`num_reads` rows over the original variables) after one sweep per beta."""
+    # One row per variable, so gathers copy whole rows. The extra last row
+    # stays 0 and absorbs padded neighbour slots.
+    x = np.zeros((n + 1, num_reads), dtype=np.float32)
+    x[:n] = rng.integers(0, 2, (n, num_reads))
+    gathered = np.empty((n, num_reads), dtype=np.float32)
+    sign = np.empty((n, num_reads), dtype=np.float32)
+    for beta in betas:
+        for start, stop, linear, neighbours, coupling in classes:
+            size = stop - start
+            field = np.repeat(linear, num_reads, axis=1)
+            buffer = gathered[:size]
+            for slot in range(len(neighbours)):
+                # Plain fancy indexing gathers rows faster than np.take(..., out=).
+                np.multiply(x[neighbours[slot]], coupling[slot], out=buffer)
+                field += buffer
+            current = x[start:stop]
+            # field becomes log(65536 * acceptance probability), capped at log(65536).
+            np.multiply(current, 2 * beta, out=sign[:size])
+            sign[:size] -= beta
+            field *= sign[:size]
+            np.minimum(field, 0, out=field)
+            field += ACCEPT_LOG_SCALE
+            np.exp(field, out=field)
+            flip = uniform16(rng.bit_generator, field.shape) < field
+            # |x - flip| flips the accepted bits; much cheaper than a masked ufunc.
+            np.subtract(current, flip, out=current)
+            np.abs(current, out=current)
+    states = np.empty((num_reads, n), dtype=np.int8)
+    states[:, order] = x[:n].T
+    return states
+
+
+def anneal_quantized(n, order, classes, num_reads, betas, rng, scale, bound):
+    """`anneal` on int16 state and coefficients (`classes` from an integer-scaled QUBO).
+
+    Energy increases are integers in units of 1/`scale`, no larger than `bound`.
+    """
+    x = np.zeros((n + 1, num_reads), dtype=np.int16)
+    x[:n] = rng.integers(0, 2, (n, num_reads))
+    gathered = np.empty((n, num_reads), dtype=np.int16)
+    fields = np.empty((n, num_reads), dtype=np.int16)
+    for beta in betas:
+        table = acceptance_table(beta / scale, bound)
+        top = len(table) - 1
+        for start, stop, linear, neighbours, coupling in classes:
+            size = stop - start
+            field = fields[:size]
+            buffer = gathered[:size]
+            np.copyto(field, linear)
+            for slot in range(len(neighbours)):
+                np.multiply(x[neighbours[slot]], coupling[slot], out=buffer)
+                np.add(field, buffer, out=field)
+            current = x[start:stop]
+            # Energy increase of each flip, field * (1 - 2x), clipped to the table.
+            np.multiply(current, field, out=buffer)
+            np.subtract(field, buffer, out=field)
+            np.subtract(field, buffer, out=field)
+            np.clip(field, 0, top, out=field)
+            flip = uniform16(rng.bit_generator, field.shape) < table[field]
+            np.bitwise_xor(current, flip, out=current)
+    states = np.empty((num_reads, n), dtype=np.int8)
+    states[:, order] = x[:n].T
+    return states
+
+
+class ColoredAnnealingSampler:
+    """Anneals reads in cache-sized chunks on a thread pool, one or more chunks per worker."""
+
+    def __init__(self, max_workers=None, quantize=False):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.quantize = quantize
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix="colored")
+            return self._executor
+
+    def sample(self, bqm, num_reads=100, seed=None, num_sweeps=DEFAULT_SWEEPS, beta_range=None):
+        import dimod
+        from neal.sampler import default_beta_range
+
+        qubo = CompiledQubo.from_bqm(bqm)
+        if beta_range is None:
+            beta_range = default_beta_range(bqm)
+        betas = np.geomspace(beta_range[0], beta_range[1], num_sweeps)
+        kernel, info = anneal, {}
+        if self.quantize:
+            coeffs, scale, info["quantization"] = quantize(qubo)
+            if coeffs is not None:
+                qubo = CompiledQubo(qubo.labels, qubo.rows, qubo.cols, coeffs, qubo.offset)
+                kernel = functools.partial(anneal_quantized, scale=scale, bound=int(field_bound(qubo, coeffs)))
+        dtype = np.float32 if kernel is anneal else np.int16
+        order, classes = color_classes(qubo, cached_coloring(qubo), dtype)
+        chunk = min(CHUNK_BYTES // (4 * (qubo.num_variables + 1)), -(-num_reads // self.max_workers))
+        chunk = max(chunk, MIN_CHUNK_READS)
+        sizes = [min(chunk, num_reads - start) for start in range(0, num_reads, chunk)]
+        seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+
+        def run(size, chunk_seed):
+            rng = np.random.Generator(np.random.SFC64(chunk_seed))
+            return kernel(qubo.num_variables, order, classes, size, betas, rng)
+
+        if len(sizes) == 1 or self.max_workers == 1:
+            chunks = [run(size, chunk_seed) for size, chunk_seed in zip(sizes, seeds)]
+        else:
+            chunks = list(self._pool().map(run, sizes, seeds))
+        states = np.concatenate(chunks)
+        if bqm.vartype is dimod.SPIN:
+            states = 2 * states - 1
+        return dimod.SampleSet.from_samples_bqm((states, qubo.labels), bqm, info=info).aggregate()
@@ -0,0 +1,193 @@
+"""Array form of a compiled QUBO: COO index arrays and coefficients instead of pyqubo's dicts."""
+import hashlib
+import json
+
+import numpy as np
+
+MODEL_FIELDS = ("variables", "Constraints", "Objective")
+
+
+def model_hash(data):
+    """Stable hash of the parts of a request that determine the compiled QUBO."""
+    model = {field: data.get(field) for field in MODEL_FIELDS}
+    encoded = json.dumps(model, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+class CompiledQubo:
+    """QUBO as `labels`, `rows`/`cols` (int32 indices into labels), `coeffs` and `offset`.
+
+    Diagonal entries (`rows == cols`) are the linear terms. `constraints` is
+    an optional `constraints.ConstraintSet` over the same labels.
+    """
+
+    def __init__(self, labels, rows, cols, coeffs, offset=0.0, constraints=None):
+        self.labels = list(labels)
+        self.rows = rows
+        self.cols = cols
+        self.coeffs = coeffs
+        self.offset = float(offset)
+        self.constraints = constraints
+        self._adjacency = None
+
+    @classmethod
+    def from_qubo(cls, qubo, offset=0.0):
+        index = {}
+        rows = np.empty(len(qubo), dtype=np.int32)
+        cols = np.empty(len(qubo), dtype=np.int32)
+        coeffs = np.empty(len(qubo), dtype=np.float64)
+        for k, ((a, b), value) in enumerate(qubo.items()):
+            rows[k] = index.setdefault(a, len(index))
+            cols[k] = index.setdefault(b, len(index))
+            coeffs[k] = value
+        return cls(index, rows, cols, coeffs, offset)
+
+    @classmethod
+    def combine(cls, parts):
+        """Sum of several CompiledQubos, merging their labels and adding up duplicate terms."""
+        index = {}
+        rows, cols, coeffs = [], [], []
+        offset = 0.0
+        for part in parts:
+            mapping = np.array([index.setdefault(label, len(index)) for label in part.labels], dtype=np.int64)
+            a, b = mapping[part.rows], mapping[part.cols]
+            rows.append(np.minimum(a, b))
+            cols.append(np.maximum(a, b))
+            coeffs.append(part.coeffs)
+            offset += part.offset
+
+        n = len(index)
+        rows = np.concatenate(rows) if rows else np.empty(0, dtype=np.int64)
+        cols = np.concatenate(cols) if cols else np.empty(0, dtype=np.int64)
+        coeffs = np.concatenate(coeffs) if coeffs else np.empty(0, dtype=np.float64)
+        keys, inverse = np.unique(rows * n + cols, return_inverse=True)
+        summed = np.bincount(inverse.ravel(), weights=coeffs, minlength=len(keys))
+        keep = summed != 0
+        keys = keys[keep]
+        return cls(index, (keys // n).astype(np.int32), (keys % n).astype(np.int32), summed[keep], offset)
+
+    @classmethod
+    def from_bqm(cls, bqm):
+        """Array form of a dimod BQM, converted to 0/1 variables if it is SPIN."""
+        import dimod
+
+        if bqm.vartype is dimod.SPIN:
+            bqm = bqm.change_vartype(dimod.BINARY, inplace=False)
+        labels = list(bqm.variables)
+        # Pass the order explicitly: the default one can disagree with
+        # `bqm.variables` once variables have been fixed or removed.
+        linear, (irow, icol, quadratic), offset = bqm.to_numpy_vectors(variable_order=labels)
+        diag = np.arange(len(linear), dtype=np.int32)
+        return cls(labels, np.concatenate([diag, irow.astype(np.int32)]),
+                   np.concatenate([diag, icol.astype(np.int32)]),
+                   np.concatenate([linear, quadratic]).astype(np.float64), offset)
+
+    @property
+    def num_variables(self):
+        return len(self.labels)
+
+    @property
+    def num_terms(self):
+        return len(self.coeffs)
+
+    @property
+    def nbytes(self):
+        return self.rows.nbytes + self.cols.nbytes + self.coeffs.nbytes
+
+    def to_qubo(self):
+        labels = self.labels
+        qubo = {}
+        for i, j, value in zip(self.rows.tolist(), self.cols.tolist(), self.coeffs.tolist()):
+            key = (labels[i], labels[j])
+            qubo[key] = qubo.get(key, 0.0) + value
+        return qubo, self.offset
+
+    def linear(self):
+        linear = np.zeros(self.num_variables, dtype=np.float64)
+        diag = self.rows == self.cols
+        np.add.at(linear, self.rows[diag], self.coeffs[diag])
+        return linear
+
+    def quadratic(self):
+        off = self.rows != self.cols
+        return self.rows[off], self.cols[off], self.coeffs[off]
+
+    def adjacency(self):
+        """Symmetric CSR `(indptr, indices, weights)` of the quadratic couplings, built once."""
+        if self._adjacency is None:
+            rows, cols, coeffs = self.quadratic()
+            src = np.concatenate([rows, cols])
+            dst = np.concatenate([cols, rows])
+            weights = np.concatenate([coeffs, coeffs])
+            order = np.argsort(src, kind="stable")
+            indptr = np.zeros(self.num_variables + 1, dtype=np.int64)
+            np.cumsum(np.bincount(src, minlength=self.num_variables), out=indptr[1:])
+            self._adjacency = indptr, dst[order].astype(np.int32), weights[order]
+        return self._adjacency
+
+    def local_fields(self, samples):
+        """`h_i + sum_j J_ij x_j` for each row of a 0/1 sample matrix.
+
+        Flipping variable i of a row changes its energy by `(1 - 2 x_i) * field_i`.
+        """
+        samples = np.atleast_2d(np.asarray(samples, dtype=np.float64))
+        indptr, indices, weights = self.adjacency()
+        partial = np.zeros((len(samples), len(indices) + 1))
+        np.cumsum(samples[:, indices] * weights, axis=1, out=partial[:, 1:])
+        return self.linear() + partial[:, indptr[1:]] - partial[:, indptr[:-1]]
+
+    def energies(self, samples):
+        """Energy of each row of a 0/1 sample matrix whose columns follow `labels`."""
+        samples = np.asarray(samples, dtype=np.float64)
+        return (samples[:, self.rows] * samples[:, self.cols]) @ self.coeffs + self.offset
+
+    def add_linear(self, deltas):
+        """Copy with `deltas` (`{label: value}`) added to the linear terms; constraints are kept."""
+        position = {label: i for i, label in enumerate(self.labels)}
+        index = np.array([position[label] for label in deltas], dtype=np.int32)
+        values = np.array(list(deltas.values()), dtype=np.float64)
+        combined = CompiledQubo.combine([self, CompiledQubo(self.labels, index, index, values)])
+        combined.constraints = self.constraints
+        return combined
+
+    def fix(self, assignment):
+        """Copy with the variables in `assignment` (`{label: 0 or 1}`) substituted and removed.
+
+        Couplings to a variable fixed at 1 become linear terms of the other
+        one and fully fixed terms move into the offset, so every remaining
+        state keeps its energy. Constraints are dropped, since their labels change.
+        """
+        value = np.full(self.num_variables, -1, dtype=np.int64)
+        position = {label: i for i, label in enumerate(self.labels)}
+        for label, bit in assignment.items():
+            value[position[label]] = bit
+        a, b = value[self.rows], value[self.cols]
+        fixed = (a >= 0) & (b >= 0)
+        keep = (a < 0) & (b < 0)
+        to_col = (a == 1) & (b < 0)
+        to_row = (a < 0) & (b == 1)
+        free = np.flatnonzero(value < 0)
+        remap = np.full(self.num_variables, -1, dtype=np.int64)
+        remap[free] = np.arange(len(free))
+        rows = np.concatenate([remap[self.rows[keep]], remap[self.cols[to_col]], remap[self.rows[to_row]]])
+        cols = np.concatenate([remap[self.cols[keep]], remap[self.cols[to_col]], remap[self.rows[to_row]]])
+        coeffs = np.concatenate([self.coeffs[keep], self.coeffs[to_col], self.coeffs[to_row]])
+        offset = self.offset + float(self.coeffs[fixed] @ (a[fixed] * b[fixed]))
+        return CompiledQubo.combine([CompiledQubo([self.labels[i] for i in free.tolist()], rows, cols, coeffs,
+                                                  offset)])
+
+    def release(self):
+        """Give the model back to the cache it came from (no-op when uncached)."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+    def to_bqm(self):
+        import dimod
+
+        return dimod.BinaryQuadraticModel.from_numpy_vectors(
+            self.linear(), self.quadratic(), self.offset, dimod.BINARY,
+            variable_order=self.labels)
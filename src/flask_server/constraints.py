@@ -0,0 +1,167 @@
+"""Per-constraint feasibility of returned samples, from array forms of each constraint's left-hand side."""
+import io
+
+import numpy as np
+
+from compiled_qubo import CompiledQubo
+
+COMPARISONS = {"=": 0, "<=": 1, "≤": 1, ">=": 2, "≥": 2, "!=": 3}
+COMPARISON_NAMES = ("=", "<=", ">=", "!=")
+TOLERANCE = 1e-6
+CHUNK_ELEMENTS = 1 << 22
+ARRAYS = ("index", "kind", "rhs", "constant", "linear_ptr", "linear_vars", "linear_coeffs",
+          "quadratic_ptr", "quadratic_a", "quadratic_b", "quadratic_coeffs", "ignored")
+
+
+def _segment_sums(columns, weights, indptr):
+    """Per-segment sums of `columns[i] * weights[i]` for rows laid out CSR-style by `indptr`.
+
+    Works on transposed samples (one row per term), so every gather copies
+    whole contiguous rows; a running sum handles empty segments.
+    """
+    running = np.zeros((len(weights) + 1, columns.shape[1]))
+    np.multiply(columns, weights[:, None], out=running[1:])
+    np.cumsum(running, axis=0, out=running)
+    return running[indptr[1:]] - running[indptr[:-1]]
+
+
+class ConstraintSet:
+    """Left-hand sides of a request's constraints as arrays over the model's variables.
+
+    Linear and quadratic terms are stored CSR-style: the terms of constraint c
+    are `linear_*[linear_ptr[c]:linear_ptr[c + 1]]`, and likewise for the
+    quadratic arrays. `index` is each constraint's position in the request's
+    `Constraints` list, and `ignored` lists the ones with a comparison
+    compile_model doesn't apply.
+    """
+
+    def __init__(self, **arrays):
+        for name in ARRAYS:
+            setattr(self, name, arrays[name])
+
+    @classmethod
+    def build(cls, declared, labels, ignored=()):
+        """Build from `(index, lhs, comparison, rhs)` tuples.
+
+        `lhs` is a compiled `CompiledQubo` fragment, a pyqubo expression or a number.
+        """
+        from fragments import compile_fragment
+
+        position = {label: i for i, label in enumerate(labels)}
+        kind, rhs, constant, index = [], [], [], []
+        linear, quadratic = [], []
+        for i, lhs, comparison, value in declared:
+            if not isinstance(lhs, CompiledQubo):
+                lhs = compile_fragment(lhs)
+            # Variables the model's QUBO dropped never affect the energy; read them as 0.
+            mapping = np.array([position.get(label, -1) for label in lhs.labels], dtype=np.int64)
+            a, b = mapping[lhs.rows], mapping[lhs.cols]
+            known = (a >= 0) & (b >= 0)
+            diagonal = known & (a == b)
+            off = known & (a != b)
+            linear.append((a[diagonal], lhs.coeffs[diagonal]))
+            quadratic.append((a[off], b[off], lhs.coeffs[off]))
+            index.append(i)
+            kind.append(COMPARISONS[comparison])
+            rhs.append(value)
+            constant.append(lhs.offset)
+
+        def ptr(parts):
+            return np.concatenate([[0], np.cumsum([len(part[0]) for part in parts], dtype=np.int64)])
+
+        def column(parts, k, dtype):
+            return np.concatenate([part[k] for part in parts]).astype(dtype) if parts else np.empty(0, dtype)
+
+        return cls(
+            index=np.array(index, dtype=np.int32), kind=np.array(kind, dtype=np.int8),
+            rhs=np.array(rhs, dtype=np.float64), constant=np.array(constant, dtype=np.float64),
+            linear_ptr=ptr(linear), linear_vars=column(linear, 0, np.int32),
+            linear_coeffs=column(linear, 1, np.float64),
+            quadratic_ptr=ptr(quadratic), quadratic_a=column(quadratic, 0, np.int32),
+            quadratic_b=column(quadratic, 1, np.int32), quadratic_coeffs=column(quadratic, 2, np.float64),
+            ignored=np.array(list(ignored), dtype=np.int32))
+
+    @property
+    def size(self):
+        return len(self.index)
+
+    def to_bytes(self):
+        buffer = io.BytesIO()
+        np.savez(buffer, **{name: getattr(self, name) for name in ARRAYS})
+        return buffer.getvalue()
+
+    @classmethod
+    def from_bytes(cls, data):
+        with np.load(io.BytesIO(data)) as arrays:
+            return cls(**{name: arrays[name] for name in ARRAYS})
+
+    def evaluate(self, samples):
+        """`(len(samples), size)` matrix of left-hand-side values for 0/1 rows over the model's labels."""
+        samples = np.atleast_2d(samples)
+        terms = max(len(self.linear_vars) + len(self.quadratic_a), 1)
+        chunk = max(1, CHUNK_ELEMENTS // terms)
+        lhs = np.empty((len(samples), self.size))
+        for start in range(0, len(samples), chunk):
+            x = np.ascontiguousarray(samples[start:start + chunk].T, dtype=np.float64)
+            values = _segment_sums(x[self.linear_vars], self.linear_coeffs, self.linear_ptr)
+            if len(self.quadratic_a):
+                pairs = x[self.quadratic_a] * x[self.quadratic_b]
+                values += _segment_sums(pairs, self.quadratic_coeffs, self.quadratic_ptr)
+            lhs[start:start + chunk] = values.T + self.constant
+        return lhs
+
+    def slack(self, lhs):
+        """How far each constraint is from failing; negative means violated.
+
+        For `=` this is `-|lhs - rhs|`, so it is 0 when the constraint holds.
+        For `!=` it is `|lhs - rhs|`, which must be strictly positive.
+        """
+        difference = lhs - self.rhs
+        return np.select(
+            [self.kind == 0, self.kind == 1, self.kind == 2],
+            [-np.abs(difference), -difference, difference],
+            np.abs(difference))
+
+    def satisfied(self, slack):
+        return np.where(self.kind == 3, slack > TOLERANCE, slack >= -TOLERANCE)
+
+    def violations(self, samples):
+        """Number of violated constraints in each 0/1 row over the model's labels."""
+        return (~self.satisfied(self.slack(self.evaluate(samples)))).sum(axis=1)
+
+    def check(self, samples, energies, counts, violated=None):
+        """Pick the best state and describe its constraints.
+
+        `samples` are distinct 0/1 states over the model's labels, sorted by
+        energy; `violated` is their `violations` if already known. Returns
+        `(best_index, report)`.
+        """
+        if violated is None:
+            violated = self.violations(samples)
+        best = int(np.lexsort((energies, violated))[0])
+        feasible = violated == 0
+        report = {
+            "feasible": bool(feasible[best]),
+            "violated": int(violated[best]),
+            "selected_over_lowest_energy": best != 0,
+            "feasible_reads": int(counts[feasible].sum()),
+            "feasible_fraction": float(counts[feasible].sum() / counts.sum()),
+            "constraints": self.describe(samples[best])[1],
+        }
+        if len(self.ignored):
+            report["ignored"] = self.ignored.tolist()
+        return best, report
+
+    def describe(self, sample):
+        """`(violated, per-constraint report)` for one 0/1 row over the model's labels."""
+        lhs = self.evaluate(sample)[0]
+        slack = self.slack(lhs)
+        ok = self.satisfied(slack)
+        return int((~ok).sum()), [{
+            "index": int(i),
+            "comparison": COMPARISON_NAMES[k],
+            "rhs": float(r),
+            "lhs": float(v),
+            "slack": float(s),
+            "satisfied": bool(o),
+        } for i, k, r, v, s, o in zip(self.index, self.kind, self.rhs, lhs, slack, ok)]
@@ -0,0 +1,116 @@
+"""Per-fragment memoization of model compilation, keyed on normalised source text and the variables it uses."""
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from compiled_qubo import CompiledQubo
+
+FRAGMENT_CACHE_SIZE = int(os.environ.get("QUANTUM_FRAGMENT_CACHE_SIZE", 100000))
+
+NAME = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+OPERAND_END = re.compile(r"[A-Za-z0-9_.)\]]")
+EXPONENT = re.compile(r"(?<![A-Za-z_])\d+\.?\d*[eE]$")
+
+
+def normalize(text):
+    return re.sub(r"\s+", "", str(text))
+
+
+def split_terms(expression):
+    """Split `expression` at its top-level binary `+`/`-` into terms that sum to it.
+
+    `"2*a - b*(c + d)"` gives `["2*a", "-b*(c+d)"]`. Unary signs, signs inside
+    brackets and exponents such as `1e-3` are left alone.
+    """
+    text = normalize(expression)
+    terms, depth, start = [], 0, 0
+    for i, char in enumerate(text):
+        if char in "([":
+            depth += 1
+        elif char in ")]":
+            depth -= 1
+        elif (char in "+-" and depth == 0 and i > start and OPERAND_END.match(text[i - 1])
+              and not EXPONENT.search(text[start:i])):
+            terms.append(text[start:i])
+            start = i + 1 if char == "+" else i
+    terms.append(text[start:])
+    return [term for term in terms if term]
+
+
+def definitions(variable_data):
+    """Canonical JSON of each request variable's definition, for `signature`."""
+    return {name: json.dumps(info, sort_keys=True) for name, info in variable_data.items()}
+
+
+def signature(text, defined):
+    """Definitions of the request variables `text` may refer to, as a hashable tuple.
+
+    `defined` comes from `definitions`. Array elements such as `x_3` or
+    `g_0_1` refer to their array, so every `_`-prefix of a name is checked.
+    """
+    referenced = set()
+    for name in NAME.findall(str(text)):
+        if name in defined:
+            referenced.add(name)
+        cut = name.find("_")
+        while cut > 0:
+            if name[:cut] in defined:
+                referenced.add(name[:cut])
+            cut = name.find("_", cut + 1)
+    return tuple(sorted((name, defined[name]) for name in referenced))
+
+
+def compile_fragment(expression):
+    """Compile one pyqubo expression (or plain number) into a CompiledQubo."""
+    if isinstance(expression, (int, float)):
+        empty = np.empty(0, dtype=np.int32)
+        return CompiledQubo([], empty, empty, np.empty(0, dtype=np.float64), expression)
+    qubo, offset = expression.compile().to_qubo()
+    return CompiledQubo.from_qubo(qubo, offset)
+
+
+class FragmentCache:
+    def __init__(self, max_entries=FRAGMENT_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, build):
+        """Fragment for `key`; on a miss, `build()` returns the expression to compile."""
+        with self._lock:
+            fragment = self._entries.get(key)
+            if fragment is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return fragment
+            self.misses += 1
+
+        fragment = compile_fragment(build())
+        if self.max_entries > 0:
+            with self._lock:
+                self._entries[key] = fragment
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return fragment
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            size = len(self._entries)
+        total = self.hits + self.misses
+        return {
+            "entries": size,
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / total if total else 0.0,
+        }
@@ -0,0 +1,203 @@
+"""In-process decomposition solver modelled on dwave-hybrid's Kerberos workflow, minus the QPU.
+
+Subproblems of up to EXHAUSTIVE_MAX_SIZE variables are enumerated; larger ones are annealed.
+"""
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from compiled_qubo import CompiledQubo
+from tabu_solver import tabu_search
+
+EXHAUSTIVE_MAX_SIZE = 12
+WARM_START_RATIO = 8
+ENERGY_TOLERANCE = 1e-9
+
+
+def _clamped_subproblem(qubo, state, fields, subset):
+    """Linear terms and couplings of `subset` with every other variable fixed to `state`.
+
+    `fields` are the local fields of `state`; subtracting the couplings inside
+    the subset leaves `h_i + sum_{j not in subset} J_ij x_j`.
+    """
+    position = np.full(qubo.num_variables, -1, dtype=np.int64)
+    position[subset] = np.arange(len(subset))
+    rows, cols, coeffs = qubo.quadratic()
+    inside = (position[rows] >= 0) & (position[cols] >= 0)
+    a, b, weights = position[rows[inside]], position[cols[inside]], coeffs[inside]
+
+    x = state[subset].astype(np.float64)
+    internal = np.zeros(len(subset))
+    np.add.at(internal, a, weights * x[b])
+    np.add.at(internal, b, weights * x[a])
+    return fields[subset] - internal, a, b, weights
+
+
+def _solve_exhaustive(linear, a, b, weights):
+    k = len(linear)
+    candidates = ((np.arange(1 << k)[:, None] >> np.arange(k)) & 1).astype(np.float64)
+    energies = candidates @ linear + (candidates[:, a] * candidates[:, b]) @ weights
+    return candidates[int(np.argmin(energies))].astype(np.int8)
+
+
+class HybridSampler:
+    """Refines the best `num_states` reads of one anneal with global passes and clamped subproblems."""
+
+    def __init__(self, max_workers=None):
+        self.max_workers = max_workers or min(4, os.cpu_count() or 1)
+        self._pool = None
+        self._lock = threading.Lock()
+
+    @property
+    def pool(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(self.max_workers, thread_name_prefix="hybrid")
+            return self._pool
+
+    def sample(self, bqm, num_reads=100, seed=None, num_states=4, max_iter=100, convergence=3,
+               subproblem_size=50, subproblems=None, decomposer="energy", sweeps=500,
+               sub_reads=20, time_limit=None, global_pass="anneal"):
+        """`num_reads` only sizes the initial anneal; one read comes back per refined state."""
+        import dimod
+        from neal import SimulatedAnnealingSampler
+
+        qubo = CompiledQubo.from_bqm(bqm)
+        rng = np.random.default_rng(seed)
+        annealer = SimulatedAnnealingSampler()
+        deadline = None if time_limit is None else time.monotonic() + time_limit
+        if qubo.num_variables == 0:
+            return dimod.SampleSet.from_samples_bqm((np.empty((1, 0), dtype=np.int8), []), bqm)
+
+        binary = bqm if bqm.vartype is dimod.BINARY else bqm.change_vartype(dimod.BINARY, inplace=False)
+        initial = annealer.sample(binary, num_reads=num_reads, seed=int(rng.integers(2 ** 31)))
+        columns = [initial.variables.index(label) for label in qubo.labels]
+        population = initial.record.sample[:, columns].astype(np.int8)
+        energies = qubo.energies(population)
+        _, distinct = np.unique(population, axis=0, return_index=True)
+        best = distinct[np.argsort(energies[distinct], kind="stable")][:max(1, min(num_states, num_reads))]
+
+        options = {
+            "max_iter": max_iter, "convergence": convergence, "decomposer": decomposer,
+            "size": max(1, min(subproblem_size, qubo.num_variables)), "sweeps": sweeps,
+            "count": subproblems or self.max_workers, "sub_reads": sub_reads, "deadline": deadline,
+            "global_pass": self._tabu_pass if global_pass == "tabu" else self._warm_anneal,
+        }
+        refined = [self._refine(qubo, binary, annealer, population[i].copy(), rng, options) for i in best]
+
+        states = np.array([state for state, _ in refined])
+        if bqm.vartype is dimod.SPIN:
+            states = 2 * states - 1
+        sampleset = dimod.SampleSet.from_samples_bqm((states, qubo.labels), bqm)
+        sampleset.info["hybrid"] = {"initial_reads": num_reads, "refined_states": len(states)}
+        return sampleset
+
+    def _refine(self, qubo, binary, annealer, state, rng, options):
+        energy = float(qubo.energies(state[None])[0])
+        stale = 0
+        for _ in range(options["max_iter"]):
+            if options["deadline"] is not None and time.monotonic() > options["deadline"]:
+                break
+            fields = qubo.local_fields(state)[0]
+            subsets = self._decompose(qubo, state, fields, options, rng)
+            futures = [self.pool.submit(self._solve_subproblem, qubo, state, fields, subset,
+                                        annealer, int(rng.integers(2 ** 31)), options["sub_reads"])
+                       for subset in subsets]
+            warm = self.pool.submit(options["global_pass"], qubo, binary, annealer, state,
+                                    int(rng.integers(2 ** 31)), options["sweeps"], self.max_workers)
+
+            merged, merged_energy = state.copy(), energy
+            for subset, future in zip(subsets, futures):
+                candidate = merged.copy()
+                candidate[subset] = future.result()
+                candidate_energy = float(qubo.energies(candidate[None])[0])
+                if candidate_energy < merged_energy - ENERGY_TOLERANCE:
+                    merged, merged_energy = candidate, candidate_energy
+
+            annealed, annealed_energy = warm.result()
+            if annealed_energy < merged_energy:
+                merged, merged_energy = annealed, annealed_energy
+
+            if merged_energy < energy - ENERGY_TOLERANCE:
+                state, energy, stale = merged, merged_energy, 0
+            else:
+                stale += 1
+                if stale >= options["convergence"]:
+                    break
+        return state, energy
+
+    @staticmethod
+    def _decompose(qubo, state, fields, options, rng):
+        """Disjoint subsets of variables, most energy-impactful first."""
+        size, count = options["size"], options["count"]
+        # Energy change of each single flip; ties broken randomly so repeated
+        # rounds on a plateau don't keep picking the same variables.
+        delta = (1 - 2 * state) * fields
+        order = np.lexsort((rng.random(len(delta)), delta))
+        if options["decomposer"] != "neighborhood":
+            return [order[i * size:(i + 1) * size] for i in range(count) if i * size < len(order)]
+
+        indptr, indices, _ = qubo.adjacency()
+        used = np.zeros(qubo.num_variables, dtype=bool)
+        subsets = []
+        for seed in order:
+            if len(subsets) == count:
+                break
+            if used[seed]:
+                continue
+            subset, queue = [], deque([seed])
+            used[seed] = True
+            while queue and len(subset) < size:
+                node = queue.popleft()
+                subset.append(node)
+                for neighbour in indices[indptr[node]:indptr[node + 1]]:
+                    if not used[neighbour]:
+                        used[neighbour] = True
+                        queue.append(neighbour)
+            used[list(queue)] = False
+            subsets.append(np.array(subset, dtype=np.int64))
+        return subsets
+
+    @staticmethod
+    def _solve_subproblem(qubo, state, fields, subset, annealer, seed, num_reads):
+        linear, a, b, weights = _clamped_subproblem(qubo, state, fields, subset)
+        if len(subset) <= EXHAUSTIVE_MAX_SIZE:
+            return _solve_exhaustive(linear, a, b, weights)
+
+        import dimod
+
+        sub = dimod.BinaryQuadraticModel.from_numpy_vectors(linear, (a, b, weights), 0.0, dimod.BINARY)
+        result = annealer.sample(sub, num_reads=num_reads, seed=seed, num_sweeps=200)
+        columns = [result.variables.index(i) for i in range(len(subset))]
+        return result.record.sample[np.argmin(result.record.energy)][columns].astype(np.int8)
+
+    @staticmethod
+    def _warm_anneal(qubo, binary, annealer, state, seed, sweeps, num_reads):
+        """Short anneals of the whole model starting from `state`.
+
+        They start warm enough to leave the current basin but far colder than
+        a fresh anneal, so they don't throw away the structure already found.
+        """
+        from neal.sampler import default_beta_range
+
+        _, cold = default_beta_range(binary)
+        result = annealer.sample(binary, num_reads=num_reads, seed=seed, num_sweeps=sweeps,
+                                 beta_range=(cold / WARM_START_RATIO, cold),
+                                 initial_states=(np.repeat(state[None], num_reads, axis=0), qubo.labels),
+                                 initial_states_generator="none")
+        columns = [result.variables.index(label) for label in qubo.labels]
+        best = int(np.argmin(result.record.energy))
+        annealed = result.record.sample[best, columns].astype(np.int8)
+        return annealed, float(qubo.energies(annealed[None])[0])
+
+    @staticmethod
+    def _tabu_pass(qubo, binary, annealer, state, seed, sweeps, num_reads):
+        """Tabu restarts from `state`; `sweeps` bounds how long each may go without improving."""
+        states, energies = tabu_search(qubo, np.repeat(state[None], num_reads, axis=0),
+                                       np.random.default_rng(seed), stall=sweeps)
+        best = int(np.argmin(energies))
+        return states[best], float(energies[best])
@@ -0,0 +1,97 @@
+"""Start-up import time report for the server; exits 1 when over `--budget-ms`, so it can gate CI."""
+import argparse
+import os
+import subprocess
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+HEALTH_SNIPPET = """
+import time
+start = time.perf_counter()
+import server
+response = server.app.test_client().get('/health')
+assert response.status_code == 200, response.status_code
+print(time.perf_counter() - start)
+"""
+
+
+def parse_importtime(stderr):
+    """Return `(module, depth, self_us, cumulative_us)` rows in import order."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip(" "))) // 2
+        rows.append((name.strip(), depth, int(self_us), int(cumulative_us)))
+    return rows
+
+
+def measure_imports(module="server"):
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=HERE, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr}")
+    return parse_importtime(result.stderr)
+
+
+def measure_health():
+    result = subprocess.run([sys.executable, "-c", HEALTH_SNIPPET],
+                            cwd=HERE, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"/health check failed:\n{result.stderr}")
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def build_report(rows, module="server", top=15):
+    total = next(cum for name, depth, _, cum in rows if name == module and depth == 0)
+
+    # Children of `module` are the rows at depth 1 that precede it in the output.
+    end = next(i for i, (name, depth, _, _) in enumerate(rows) if name == module and depth == 0)
+    start = end
+    while start > 0 and rows[start - 1][1] > 0:
+        start -= 1
+    children = [row for row in rows[start:end] if row[1] == 1]
+    children.sort(key=lambda row: row[3], reverse=True)
+    heaviest = sorted(rows, key=lambda row: row[2], reverse=True)[:top]
+
+    lines = [f"import {module}: {total / 1000:.1f} ms cumulative", "",
+             "Direct imports by cumulative time:"]
+    lines += [f"  {cum / 1000:8.1f} ms  {name}" for name, _, _, cum in children[:top]]
+    lines += ["", "Modules by self time:"]
+    lines += [f"  {self_us / 1000:8.1f} ms  {name}" for name, _, self_us, _ in heaviest]
+    return total / 1000, "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--module", default="server")
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--budget-ms", type=float, default=800,
+                        help="maximum cumulative import time of --module")
+    parser.add_argument("--health-budget-ms", type=float, default=1000,
+                        help="maximum time from interpreter start to a /health response")
+    parser.add_argument("--output", help="also write the report to this file")
+    args = parser.parse_args(argv)
+
+    import_ms, report = build_report(measure_imports(args.module), args.module, args.top)
+    health_ms = measure_health() * 1000
+    report += f"\n\nFirst /health response after cold import: {health_ms:.1f} ms\n"
+
+    over = []
+    if import_ms > args.budget_ms:
+        over.append(f"import {args.module} took {import_ms:.1f} ms (budget {args.budget_ms:.0f} ms)")
+    if health_ms > args.health_budget_ms:
+        over.append(f"/health took {health_ms:.1f} ms (budget {args.health_budget_ms:.0f} ms)")
+    report += "".join(f"OVER BUDGET: {line}\n" for line in over) or "Within budget.\n"
+
+    print(report, end="")
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report)
+    return 1 if over else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,137 @@
+"""Integer variables with a choice of binary encodings: binary, one-hot, domain-wall, unary or auto."""
+ENCODINGS = ("binary", "one-hot", "domain-wall", "unary")
+AUTO_DOMAIN_WALL_MAX_SPAN = 7
+PENALTY_STRENGTH = 10
+
+
+def resolve_encoding(encoding, span):
+    if encoding == "auto":
+        return "domain-wall" if span <= AUTO_DOMAIN_WALL_MAX_SPAN else "binary"
+    return encoding
+
+
+def parse_spec(name, info):
+    """Validated `(lower, upper, encoding, max_coefficient)` of an `Integer` variable."""
+    lower, upper = info.get("lower"), info.get("upper")
+    if isinstance(lower, bool) or isinstance(upper, bool) or not isinstance(lower, int) \
+            or not isinstance(upper, int) or lower > upper:
+        raise ValueError(f"Integer variable '{name}' needs integer 'lower' <= 'upper'.")
+    encoding = resolve_encoding(info.get("encoding", "auto"), upper - lower)
+    if encoding not in ENCODINGS:
+        raise ValueError(f"Unknown encoding '{encoding}' for '{name}'. "
+                         f"Use auto or one of: {', '.join(ENCODINGS)}")
+    max_coefficient = info.get("max_coefficient")
+    if max_coefficient is not None and (isinstance(max_coefficient, bool) or not isinstance(max_coefficient, int)
+                                        or max_coefficient < 1):
+        raise ValueError(f"'max_coefficient' of '{name}' must be a positive integer.")
+    return lower, upper, encoding, max_coefficient
+
+
+def _binary_powers(span, max_coefficient):
+    """Powers of two 1, 2, 4, ... that fit under `span` and the cap, and their sum."""
+    powers, total, weight = [], 0, 1
+    while total + weight <= span and (max_coefficient is None or weight <= max_coefficient):
+        powers.append(weight)
+        total += weight
+        weight *= 2
+    return powers, total
+
+
+def binary_coefficients(span, max_coefficient=None):
+    """Weights whose subset sums cover exactly 0..span."""
+    coefficients, total = _binary_powers(span, max_coefficient)
+    if max_coefficient is not None:
+        top = coefficients[-1] if coefficients else 1
+        repeats = (span - total) // top
+        coefficients += [top] * repeats
+        total += top * repeats
+    if total < span:
+        coefficients.append(span - total)
+    return coefficients
+
+
+def encoded_size(span, encoding, max_coefficient=None):
+    """`(bits, penalty quadratic terms)` of an encoding, without building it."""
+    if encoding == "binary":
+        powers, total = _binary_powers(span, max_coefficient)
+        bits = len(powers)
+        if max_coefficient is not None:
+            top = powers[-1] if powers else 1
+            bits += (span - total) // top
+            total += top * ((span - total) // top)
+        return bits + (total < span), 0
+    if encoding == "one-hot":
+        return span + 1, span * (span + 1) // 2
+    if encoding == "domain-wall":
+        return span, max(span - 1, 0)
+    return span, 0
+
+
+class IntegerEncoding:
+    """Bits `name#0`, `name#1`, ... whose weighted sum plus `lower` is the integer."""
+
+    def __init__(self, name, lower, upper, encoding="auto", max_coefficient=None):
+        encoding = resolve_encoding(encoding, upper - lower)
+        self.name = name
+        self.lower = lower
+        self.upper = upper
+        self.encoding = encoding
+        span = upper - lower
+        if encoding == "binary":
+            self.coefficients = binary_coefficients(span, max_coefficient)
+        elif encoding == "one-hot":
+            self.coefficients = list(range(span + 1))
+        else:
+            self.coefficients = [1] * span
+        self.labels = [f"{name}#{i}" for i in range(len(self.coefficients))]
+
+    @classmethod
+    def from_spec(cls, name, info):
+        return cls(name, *parse_spec(name, info))
+
+    @property
+    def num_bits(self):
+        return len(self.labels)
+
+    @property
+    def has_penalty(self):
+        return self.encoding in ("one-hot", "domain-wall") and self.num_bits > 1
+
+    def value(self, bits):
+        """Expression for the integer, given pyqubo expressions for `labels`."""
+        return self.lower + sum(c * bit for c, bit in zip(self.coefficients, bits))
+
+    def penalty(self, bits, strength=PENALTY_STRENGTH):
+        """Expression that is 0 exactly on valid assignments, or 0 if all are valid."""
+        if self.encoding == "one-hot":
+            return strength * (sum(bits) - 1) ** 2
+        if self.encoding == "domain-wall":
+            return sum(strength * (1 - a) * b for a, b in zip(bits, bits[1:]))
+        return 0
+
+    def decode(self, values):
+        """The integer a sample represents; `values` maps labels to 0/1."""
+        bits = [int(values.get(label, 0)) for label in self.labels]
+        if self.encoding == "one-hot":
+            return self.lower + (bits.index(1) if 1 in bits else 0)
+        if self.encoding == "domain-wall":
+            # Count leading ones, like the Unary decoder.
+            count = 0
+            for bit in bits:
+                if not bit:
+                    break
+                count += 1
+            return self.lower + count
+        return self.lower + sum(c * b for c, b in zip(self.coefficients, bits))
+
+
+def integer_encodings(variable_data):
+    """IntegerEncoding for every well-formed `Integer` variable in a request."""
+    encodings = {}
+    for name, info in (variable_data or {}).items():
+        if isinstance(info, dict) and info.get("type") == "Integer":
+            try:
+                encodings[name] = IntegerEncoding.from_spec(name, info)
+            except ValueError:
+                continue
+    return encodings
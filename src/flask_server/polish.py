@@ -0,0 +1,76 @@
+"""Steepest-descent polishing of the best samples by single and coupled pair flips."""
+import numpy as np
+
+from aggregate import AggregatedSamples
+
+POLISH_TOP_K = 10
+ENERGY_TOLERANCE = 1e-9
+
+
+def descend(qubo, samples, max_rounds=None):
+    """Polish each row of a 0/1 matrix whose columns follow `qubo.labels`.
+
+    Returns `(states, energies, flips)`, where `flips` counts the bits changed per row.
+    """
+    x = np.array(samples, dtype=np.int8)
+    energies = qubo.energies(x)
+    flips = np.zeros(len(x), dtype=np.int64)
+    rows, cols, coeffs = qubo.quadratic()
+    active = np.arange(len(x))
+
+    for _ in range(max_rounds or 2 * qubo.num_variables):
+        if not len(active):
+            break
+        direction = 1 - 2 * x[active]
+        gains = direction * qubo.local_fields(x[active])
+        index = np.arange(len(active))
+
+        single = gains.argmin(axis=1)
+        gain = gains[index, single]
+        pair_gain = np.full(len(active), np.inf)
+        pair = np.zeros(len(active), dtype=np.int64)
+        if len(coeffs):
+            pairs = gains[:, rows] + gains[:, cols] + coeffs * direction[:, rows] * direction[:, cols]
+            pair = pairs.argmin(axis=1)
+            pair_gain = pairs[index, pair]
+
+        use_pair = pair_gain < gain
+        gain = np.where(use_pair, pair_gain, gain)
+        improving = gain < -ENERGY_TOLERANCE
+        if not improving.any():
+            break
+
+        target = active[improving]
+        singles = improving & ~use_pair
+        doubles = improving & use_pair
+        x[active[singles], single[singles]] ^= 1
+        x[active[doubles], rows[pair[doubles]]] ^= 1
+        x[active[doubles], cols[pair[doubles]]] ^= 1
+        energies[target] += gain[improving]
+        flips[target] += np.where(use_pair[improving], 2, 1)
+        active = target
+
+    return x, qubo.energies(x), flips
+
+
+def polish_samples(samples, qubo, top_k=POLISH_TOP_K):
+    """Polish the `top_k` lowest-energy states of an `AggregatedSamples`.
+
+    Returns the re-aggregated samples and a summary of what changed.
+    """
+    k = min(top_k, samples.num_distinct)
+    if not k:
+        return samples, {"polished": 0, "improved": 0, "flips": 0}
+
+    position = {label: i for i, label in enumerate(qubo.labels)}
+    order = np.array([position[label] for label in samples.labels], dtype=np.int64)
+    polished, energies, flips = descend(qubo, samples.aligned(qubo.labels, slice(0, k)))
+
+    merged = polished[:, order]
+    rest = samples.unpacked(slice(k, None))
+    result = AggregatedSamples.from_arrays(
+        samples.labels, np.vstack([merged, rest]),
+        np.concatenate([energies, samples.energies[k:]]), samples.counts)
+    result.info = samples.info
+    improved = int((energies < samples.energies[:k] - ENERGY_TOLERANCE).sum())
+    return result, {"polished": k, "improved": improved, "flips": int(flips.sum())}
@@ -0,0 +1,200 @@
+"""Opt-in sampling profiles of /quantum requests, stored as collapsed stacks.
+
+At most QUANTUM_PROFILE_PER_MINUTE profiles start per process, so random sampling is safe in production.
+"""
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+
+PROFILE_DIR = os.environ.get("QUANTUM_PROFILE_DIR", "profiles")
+PROFILE_RATE = float(os.environ.get("QUANTUM_PROFILE_RATE", 0))
+PROFILE_PER_MINUTE = float(os.environ.get("QUANTUM_PROFILE_PER_MINUTE", 6))
+PROFILE_INTERVAL = float(os.environ.get("QUANTUM_PROFILE_INTERVAL", 0.005))
+PROFILE_KEEP = int(os.environ.get("QUANTUM_PROFILE_KEEP", 200))
+PROFILE_HEADER = os.environ.get("QUANTUM_PROFILE_HEADER", "") not in ("", "0")
+
+PROFILE_ID = re.compile(r"^[0-9a-f]{32}$")
+
+
+def frame_name(frame):
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{getattr(code, 'co_qualname', code.co_name)}"
+
+
+class StackSampler:
+    """Samples one thread's Python stack from a background thread."""
+
+    def __init__(self, thread_id, interval=PROFILE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return self.stacks
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            names = []
+            while frame is not None:
+                names.append(frame_name(frame))
+                frame = frame.f_back
+            self.stacks[";".join(reversed(names))] += 1
+            self.samples += 1
+
+
+class Profile:
+    """One profiled request: its stack samples and stage timings."""
+
+    def __init__(self, reason, interval=PROFILE_INTERVAL):
+        self.id = uuid.uuid4().hex
+        self.reason = reason
+        self.created = time.time()
+        self.stages = {}
+        self._start = time.perf_counter()
+        self._sampler = StackSampler(threading.get_ident(), interval).start()
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - start
+
+    def finish(self, **details):
+        """Stop sampling and return the stored record."""
+        stacks = self._sampler.stop()
+        return {
+            "id": self.id,
+            "reason": self.reason,
+            "created": self.created,
+            "total_seconds": time.perf_counter() - self._start,
+            "interval_seconds": self._sampler.interval,
+            "samples": self._sampler.samples,
+            "stages": {name: round(seconds, 6) for name, seconds in self.stages.items()},
+            **details,
+            "collapsed": "".join(f"{stack} {count}\n" for stack, count in stacks.most_common()),
+        }
+
+
+class Profiler:
+    def __init__(self, directory=PROFILE_DIR, rate=PROFILE_RATE, per_minute=PROFILE_PER_MINUTE,
+                 allow_header=PROFILE_HEADER, interval=PROFILE_INTERVAL, keep=PROFILE_KEEP):
+        self.directory = directory
+        self.rate = rate
+        self.per_minute = per_minute
+        self.allow_header = allow_header
+        self.interval = interval
+        self.keep = keep
+        self._lock = threading.Lock()
+        self._tokens = per_minute
+        self._refilled = time.monotonic()
+        self.counts = {"profiled": 0, "rate_limited": 0}
+
+    def reason(self, data, headers):
+        """Why this request should be profiled, or None."""
+        if data.get("profile") is True:
+            return "requested"
+        if self.allow_header and headers.get("X-Quantum-Profile", "") not in ("", "0"):
+            return "header"
+        if self.rate and random.random() < self.rate:
+            return "sampled"
+        return None
+
+    def _take_token(self):
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.per_minute, self._tokens + (now - self._refilled) * self.per_minute / 60)
+            self._refilled = now
+            if self._tokens < 1:
+                self.counts["rate_limited"] += 1
+                return False
+            self._tokens -= 1
+            self.counts["profiled"] += 1
+            return True
+
+    def begin(self, data, headers):
+        """`(profile, reason)`; `profile` is None when not wanted or rate-limited."""
+        reason = self.reason(data, headers)
+        if reason is None or not self._take_token():
+            return None, reason
+        return Profile(reason, self.interval), reason
+
+    @contextmanager
+    def stage(self, profile, name):
+        """Time a stage of `profile`; a no-op when the request isn't profiled."""
+        if profile is None:
+            yield
+            return
+        with profile.stage(name):
+            yield
+
+    def describe(self, profile, reason):
+        """What a /quantum response says about its profile."""
+        if profile is not None:
+            return {"id": profile.id, "url": f"/profiles/{profile.id}", "reason": reason}
+        if reason is not None:
+            return {"reason": reason, "rate_limited": True}
+        return None
+
+    def save(self, record):
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"{record['id']}.json")
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, "w") as f:
+            json.dump(record, f)
+        os.replace(temporary, path)
+        self._prune()
+
+    def _prune(self):
+        # Another worker may be pruning the same profiles.
+        aged = []
+        try:
+            with os.scandir(self.directory) as entries:
+                for entry in entries:
+                    if entry.name.endswith(".json"):
+                        try:
+                            aged.append((entry.stat().st_mtime, entry.path))
+                        except OSError:
+                            pass
+        except OSError:
+            return
+        aged.sort()
+        for _, path in aged[:max(len(aged) - self.keep, 0)]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def load(self, profile_id):
+        """Stored record for `profile_id`, or None."""
+        if not PROFILE_ID.match(profile_id):
+            return None
+        try:
+            with open(os.path.join(self.directory, f"{profile_id}.json")) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def stats(self):
+        with self._lock:
+            return {"rate": self.rate, "per_minute": self.per_minute, **self.counts}
@@ -0,0 +1,143 @@
+"""Reading and writing compiled QUBOs as .npz, qbsolv .qubo or dimod .bqm files, chosen by extension."""
+import io
+import json
+import os
+import zipfile
+
+import numpy as np
+
+from compiled_qubo import CompiledQubo
+
+FORMATS = ("npz", "qubo", "bqm")
+NPZ_ARRAYS = ("rows", "cols", "coeffs")
+
+
+def file_format(path):
+    extension = os.path.splitext(path)[1].lstrip(".").lower()
+    if extension not in FORMATS:
+        raise ValueError(f"Unknown QUBO format '{extension}'. Use one of: {', '.join(FORMATS)}")
+    return extension
+
+
+def dumps(compiled, fmt):
+    """The bytes of `compiled` in format `fmt`."""
+    buffer = io.BytesIO()
+    if fmt == "npz":
+        arrays = {"rows": compiled.rows, "cols": compiled.cols, "coeffs": compiled.coeffs,
+                  "labels": np.array(json.dumps(compiled.labels)), "offset": np.array(compiled.offset)}
+        if compiled.constraints is not None:
+            arrays["constraints"] = np.frombuffer(compiled.constraints.to_bytes(), dtype=np.uint8)
+        np.savez(buffer, **arrays)
+    elif fmt == "qubo":
+        buffer.write(_qubo_text(compiled).encode("utf-8"))
+    elif fmt == "bqm":
+        with compiled.to_bqm().to_file() as f:
+            buffer.write(f.read())
+    else:
+        raise ValueError(f"Unknown QUBO format '{fmt}'. Use one of: {', '.join(FORMATS)}")
+    return buffer.getvalue()
+
+
+def save(compiled, path):
+    data = dumps(compiled, file_format(path))
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def load(path, mmap=False):
+    """CompiledQubo from `path`; with `mmap`, .npz coefficient arrays are memory-mapped."""
+    fmt = file_format(path)
+    if fmt == "npz":
+        return _load_npz(path, mmap)
+    if fmt == "qubo":
+        with open(path, encoding="utf-8") as f:
+            return _parse_qubo_text(f)
+    import dimod
+
+    with open(path, "rb") as f:
+        return CompiledQubo.from_bqm(dimod.BinaryQuadraticModel.from_file(f))
+
+
+def loads(data, fmt):
+    """CompiledQubo from bytes produced by `dumps`."""
+    if fmt == "npz":
+        return _load_npz(io.BytesIO(data), mmap=False)
+    if fmt == "qubo":
+        return _parse_qubo_text(data.decode("utf-8").splitlines())
+    if fmt == "bqm":
+        import dimod
+
+        return CompiledQubo.from_bqm(dimod.BinaryQuadraticModel.from_file(io.BytesIO(data)))
+    raise ValueError(f"Unknown QUBO format '{fmt}'. Use one of: {', '.join(FORMATS)}")
+
+
+def _qubo_text(compiled):
+    rows, cols = np.minimum(compiled.rows, compiled.cols), np.maximum(compiled.rows, compiled.cols)
+    diagonal = rows == cols
+    order = np.lexsort((cols, rows, ~diagonal))
+    lines = [f"c offset {compiled.offset!r}"]
+    lines += [f"c label {i} {json.dumps(label)}" for i, label in enumerate(compiled.labels)]
+    lines.append(f"p qubo 0 {compiled.num_variables} {int(diagonal.sum())} {int((~diagonal).sum())}")
+    lines += [f"{i} {j} {value!r}" for i, j, value in
+              zip(rows[order].tolist(), cols[order].tolist(), compiled.coeffs[order].tolist())]
+    return "\n".join(lines) + "\n"
+
+
+def _parse_qubo_text(lines):
+    offset, labels, entries, nodes = 0.0, {}, [], None
+    for line in lines:
+        if line.startswith("c"):
+            parts = line.split(None, 3)
+            if len(parts) == 3 and parts[1] == "offset":
+                offset = float(parts[2])
+            elif len(parts) == 4 and parts[1] == "label":
+                labels[int(parts[2])] = json.loads(parts[3])
+        elif line.startswith("p"):
+            nodes = int(line.split()[3])
+        elif line.strip():
+            entries.append(line)
+    if nodes is None:
+        raise ValueError("Missing 'p qubo' line")
+    table = np.array(" ".join(entries).split(), dtype=np.float64).reshape(-1, 3)
+    names = [labels.get(i, i) for i in range(nodes)]
+    return CompiledQubo(names, table[:, 0].astype(np.int32), table[:, 1].astype(np.int32),
+                        np.ascontiguousarray(table[:, 2]), offset)
+
+
+def _load_npz(path, mmap):
+    with np.load(path) as arrays:
+        labels = json.loads(arrays["labels"].item())
+        offset = float(arrays["offset"])
+        constraints = None
+        if "constraints" in arrays.files:
+            from constraints import ConstraintSet
+
+            constraints = ConstraintSet.from_bytes(arrays["constraints"].tobytes())
+        if mmap:
+            data = _mapped_members(path, NPZ_ARRAYS)
+        if not mmap or data is None:
+            data = {name: arrays[name] for name in NPZ_ARRAYS}
+    return CompiledQubo(labels, data["rows"], data["cols"], data["coeffs"], offset, constraints)
+
+
+def _mapped_members(path, names):
+    """Read-only memmaps of the `.npy` members of an .npz, or None if any can't be mapped."""
+    mapped = {}
+    with open(path, "rb") as f, zipfile.ZipFile(f) as archive:
+        for name in names:
+            info = archive.getinfo(f"{name}.npy")
+            if info.compress_type != zipfile.ZIP_STORED:
+                return None
+            # Local file header: 30 fixed bytes, then the name and extra field.
+            f.seek(info.header_offset + 26)
+            name_length, extra_length = np.frombuffer(f.read(4), dtype="<u2")
+            f.seek(info.header_offset + 30 + int(name_length) + int(extra_length))
+            version = np.lib.format.read_magic(f)
+            read_header = (np.lib.format.read_array_header_1_0 if version == (1, 0)
+                           else np.lib.format.read_array_header_2_0)
+            shape, fortran, dtype = read_header(f)
+            if not np.prod(shape):
+                return None  # empty arrays can't be mapped
+            mapped[name] = np.memmap(f.name, dtype=dtype, mode="r", offset=f.tell(), shape=shape,
+                                     order="F" if fortran else "C")
+    return mapped
@@ -0,0 +1,217 @@
+"""Open-loop replay of capture.py traces as a load test, against a server or the app in-process."""
+import argparse
+import glob
+import json
+import os
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from capture import read_trace
+
+
+def load_records(sources, path_filter=None):
+    paths = []
+    for source in sources:
+        if os.path.isdir(source):
+            paths.extend(sorted(glob.glob(os.path.join(source, "*.ndjson.gz"))))
+        else:
+            paths.append(source)
+    records = [r for r in read_trace(paths) if r.get("payload") is not None
+               and (path_filter is None or r.get("path") == path_filter)]
+    records.sort(key=lambda r: r["ts"])
+    return records
+
+
+def schedule(records, speed=1.0, multiply=1, rate=None):
+    """Return `(offset_seconds, record)` pairs sorted by offset."""
+    if not records:
+        return []
+    if rate:
+        times = [i / rate for i in range(len(records) * multiply)]
+        return list(zip(times, [r for r in records for _ in range(multiply)]))
+    start = records[0]["ts"]
+    return [((r["ts"] - start) / speed, r) for r in records for _ in range(multiply)]
+
+
+class HttpTarget:
+    def __init__(self, url, timeout=60):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+
+    def send(self, path, payload):
+        """POST `payload`; returns `(status, body)`, the body parsed only for session creates."""
+        body = json.dumps(payload).encode("utf-8")
+        req = urllib.request.Request(self.url + path, data=body, method="POST",
+                                     headers={"Content-Type": "application/json"})
+        try:
+            with urllib.request.urlopen(req, timeout=self.timeout) as response:
+                content = response.read()
+                return response.status, json.loads(content) if path == "/session" else None
+        except urllib.error.HTTPError as e:
+            return e.code, None
+
+
+class InProcessTarget:
+    """Sends requests to the Flask app directly; one test client per thread."""
+
+    def __init__(self):
+        from server import app
+
+        self.app = app
+        self.local = threading.local()
+
+    def send(self, path, payload):
+        client = getattr(self.local, "client", None)
+        if client is None:
+            client = self.local.client = self.app.test_client()
+        response = client.post(path, json=payload)
+        return response.status_code, response.get_json(silent=True) if path == "/session" else None
+
+
+class SessionMap:
+    """Recorded session id -> the id its replayed create returned.
+
+    Keyed by `(recorded id, copy)` so `--multiply` replays each copy of a
+    session separately. A turn waits until its session's create has answered.
+    """
+
+    def __init__(self, expected):
+        self.expected = set(expected)
+        self._ids = {}
+        self._cond = threading.Condition()
+
+    def created(self, key, session_id):
+        with self._cond:
+            self._ids[key] = session_id
+            self._cond.notify_all()
+
+    def resolve(self, key):
+        """The replayed id for `key`, or None if it has no create or the create failed."""
+        if key not in self.expected:
+            return None
+        with self._cond:
+            self._cond.wait_for(lambda: key in self._ids)
+            return self._ids[key]
+
+
+def percentile(sorted_values, q):
+    index = min(len(sorted_values) - 1, max(0, round(q / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def replay(plan, target, concurrency=32):
+    latencies = []
+    statuses = {}
+    errors = skipped = 0
+    lock = threading.Lock()
+
+    # Number each record's copies, so --multiply's duplicates of a session stay apart.
+    copies, keyed = {}, []
+    for offset, record in plan:
+        copy = copies[id(record)] = copies.get(id(record), -1) + 1
+        keyed.append((offset, record, (record.get("session"), copy)))
+    sessions = SessionMap(key for _, record, key in keyed if record.get("path") == "/session" and key[0])
+
+    def run(due, record, key):
+        nonlocal errors, skipped
+        path = record.get("path", "/quantum")
+        creates = path == "/session" and key[0] is not None
+        if key[0] is not None and not creates:
+            session_id = sessions.resolve(key)
+            if session_id is None:
+                with lock:
+                    skipped += 1
+                return
+            path = path.replace(f"/session/{key[0]}/", f"/session/{session_id}/", 1)
+        try:
+            status, body = target.send(path, record["payload"])
+        except Exception:
+            status, body = "exception", None
+        if creates:
+            sessions.created(key, (body or {}).get("session") if status == 200 else None)
+        latency = time.perf_counter() - due
+        with lock:
+            latencies.append(latency)
+            statuses[status] = statuses.get(status, 0) + 1
+            if status == "exception" or not 200 <= status < 300:
+                errors += 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        for offset, record, key in keyed:
+            due = start + offset
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(run, due, record, key)
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    latency_ms = {}
+    if latencies:
+        latency_ms = {f"p{q}": round(percentile(latencies, q) * 1000, 2) for q in (50, 90, 95, 99)}
+        latency_ms["max"] = round(latencies[-1] * 1000, 2)
+    offered = len(plan) / plan[-1][0] if plan and plan[-1][0] > 0 else None
+    return {
+        "requests": len(plan),
+        "errors": errors,
+        "error_rate": errors / len(plan) if plan else 0.0,
+        "skipped": skipped,
+        "statuses": {str(k): v for k, v in sorted(statuses.items(), key=str)},
+        "elapsed_seconds": round(elapsed, 3),
+        "offered_rps": round(offered, 2) if offered else None,
+        "achieved_rps": round(len(plan) / elapsed, 2) if elapsed else None,
+        "latency_ms": latency_ms,
+    }
+
+
+def sweep(records, target, speeds, multiply=1, concurrency=32):
+    """Replay at each speed; the saturation point is the first speed where the
+    server falls behind the offered rate or p99 latency more than doubles."""
+    results = []
+    saturation = None
+    for speed in speeds:
+        result = replay(schedule(records, speed, multiply), target, concurrency)
+        result["speed"] = speed
+        results.append(result)
+        if saturation is None and len(results) > 1:
+            behind = result["offered_rps"] and result["achieved_rps"] < 0.9 * result["offered_rps"]
+            slower = result["latency_ms"]["p99"] > 2 * results[0]["latency_ms"]["p99"]
+            if behind or slower or result["error_rate"] > 0.01:
+                saturation = speed
+    return {"runs": results, "saturation_speed": saturation}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay captured /quantum and session traffic.")
+    parser.add_argument("traces", nargs="+", help="trace files or directories of *.ndjson.gz")
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--url", default="http://127.0.0.1:8000")
+    target.add_argument("--in-process", action="store_true", help="call the Flask app directly")
+    parser.add_argument("--path", help="only replay requests to this path")
+    parser.add_argument("--speed", type=float, default=1.0, help="timeline speed-up factor")
+    parser.add_argument("--multiply", type=int, default=1, help="send each request N times")
+    parser.add_argument("--rate", type=float, help="fixed requests/second instead of recorded timing")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--sweep", help="comma-separated speeds to find the saturation point")
+    args = parser.parse_args(argv)
+
+    records = load_records(args.traces, args.path)
+    if not records:
+        parser.error("no captured requests found")
+    target = InProcessTarget() if args.in_process else HttpTarget(args.url)
+
+    if args.sweep:
+        speeds = [float(s) for s in args.sweep.split(",")]
+        report = sweep(records, target, speeds, args.multiply, args.concurrency)
+    else:
+        plan = schedule(records, args.speed, args.multiply, args.rate)
+        report = replay(plan, target, args.concurrency)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""TTL + LRU cache of solve results, keyed on the model hash and the solve options."""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+RESULT_CACHE_SIZE = int(os.environ.get("QUANTUM_RESULT_CACHE_SIZE", 4096))
+RESULT_CACHE_TTL = float(os.environ.get("QUANTUM_RESULT_CACHE_TTL", 300))
+RESULT_CACHE_UNSEEDED = os.environ.get("QUANTUM_RESULT_CACHE_UNSEEDED", "") not in ("", "0")
+
+
+class ResultCache:
+    def __init__(self, max_entries=RESULT_CACHE_SIZE, ttl=RESULT_CACHE_TTL, unseeded=RESULT_CACHE_UNSEEDED):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.unseeded = unseeded
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0
+
+    def caches(self, seed):
+        """Whether a solve with this `seed` (None when unseeded) is looked up and stored."""
+        return self.enabled and (seed is not None or self.unseeded)
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] < now:
+                del self._entries[key]
+                self.expired += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, value):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            size = len(self._entries)
+        return {
+            "entries": size,
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "unseeded": self.unseeded,
+            "hits": self.hits,
+            "misses": self.misses,
+            "expired": self.expired,
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,79 @@
+"""Sample a compiled QUBO and build the best-result dict, without importing server.py."""
+from contextlib import nullcontext
+
+from aggregate import AggregatedSamples
+from backends import get_backend
+from polish import polish_samples
+
+
+def sample_compiled(compiled, solver="neal", num_reads=1000, seed=None, meter=None, polish=0,
+                    ticket=None, per_read=None, scheduler=None):
+    """Sample a CompiledQubo; returns `(samples, polish_stats, feasibility)`.
+
+    With a `scheduler`, each batch of reads waits for a solver slot under
+    `ticket`, and `per_read` (estimated seconds per read) time-slices them.
+    Seeded solves are never sliced: the slice plan follows the live calibration,
+    so it would make a seed's samples differ between workers and over time.
+    """
+    bqm = compiled.to_bqm()
+    backend = get_backend(solver)
+    samplesets = []
+    slices = [num_reads]
+    if scheduler is not None and seed is None:
+        slices = scheduler.slice_reads(num_reads, per_read)
+    for reads in slices:
+        params = {"num_reads": reads}
+        if seed is not None:
+            params["seed"] = seed
+        cost = per_read * reads if per_read else None
+        with scheduler.slot(ticket, cost) if scheduler is not None else nullcontext():
+            samplesets.append(backend.sample(bqm, **params))
+    samples = AggregatedSamples.from_samplesets(samplesets)
+    if meter is not None:
+        meter.checkpoint("sample")
+    stats = None
+    if polish:
+        samples, stats = polish_samples(samples, compiled, polish)
+        if meter is not None:
+            meter.checkpoint("polish")
+    feasibility = None
+    if compiled.constraints is not None:
+        feasibility = check_constraints(samples, compiled.labels, compiled.constraints)
+    return samples, stats, feasibility
+
+
+def check_constraints(samples, labels, constraints):
+    """Feasibility check of `samples` over `labels`; also records each state's violations."""
+    aligned = samples.aligned(labels)
+    samples.violations = constraints.violations(aligned)
+    return constraints.check(aligned, samples.energies, samples.counts, samples.violations)
+
+
+def best_result(samples, offset, polish_stats=None, feasibility=None, top_k=1, min_distance=1):
+    """Best state plus a compact summary of all reads, without a dict per read.
+
+    With a feasibility check, the best state is the lowest-energy one that
+    satisfies every constraint rather than simply the lowest-energy one. With
+    `top_k` above 1, `solutions` lists that many distinct low-energy states,
+    each at least `min_distance` flips from the ones before it.
+    """
+    best, report = feasibility or (0, None)
+    result = {
+        'sample': samples.sample(best),
+        'energy': float(samples.energies[best]),
+        'offset': offset,
+        'distribution': samples.summary(),
+        'polish': polish_stats,
+        'feasibility': report,
+        'solver_info': samples.info or None
+    }
+    if top_k > 1:
+        picked, distances = samples.diverse(top_k, min_distance)
+        result['solutions'] = [{
+            'sample': samples.sample(i),
+            'energy': float(samples.energies[i]),
+            'num_occurrences': int(samples.counts[i]),
+            'distance': distance,
+            **({'feasible': bool(samples.violations[i] == 0)} if samples.violations is not None else {}),
+        } for i, distance in zip(picked, distances)]
+    return result
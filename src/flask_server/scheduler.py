@@ -0,0 +1,122 @@
+"""Priority-aware, per-client fair scheduling of solver work by self-clocked weighted fair queueing."""
+import heapq
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+PRIORITIES = {"interactive": 16.0, "normal": 4.0, "batch": 1.0}
+DEFAULT_PRIORITY = "normal"
+SOLVER_SLOTS = int(os.environ.get("QUANTUM_SOLVER_SLOTS", os.cpu_count() or 1))
+SLICE_SECONDS = float(os.environ.get("QUANTUM_SLICE_SECONDS", 0.1))
+MIN_SLICE_READS = 10
+MIN_COST = 1e-3
+
+
+class Ticket:
+    """Identifies whose work a unit is; one per request."""
+
+    __slots__ = ("priority", "client", "weight")
+
+    def __init__(self, priority, client, weight):
+        self.priority = priority
+        self.client = client
+        self.weight = weight
+
+
+class _Waiter:
+    __slots__ = ("event", "finish")
+
+    def __init__(self, finish):
+        self.event = threading.Event()
+        self.finish = finish
+
+
+class SolveScheduler:
+    def __init__(self, slots=SOLVER_SLOTS, weights=None):
+        self.slots = slots
+        self.weights = dict(weights or PRIORITIES)
+        self._lock = threading.Lock()
+        self._queue = []
+        self._seq = 0
+        self._busy = 0
+        self._virtual = 0.0
+        self._finish = {}
+        self._stats = {name: {"granted": 0, "waiting": 0, "wait_seconds": 0.0, "max_wait_seconds": 0.0}
+                       for name in self.weights}
+
+    def ticket(self, priority=DEFAULT_PRIORITY, client=None):
+        if priority not in self.weights:
+            raise ValueError(f"Unknown priority '{priority}'. Use one of: {', '.join(self.weights)}")
+        return Ticket(priority, client, self.weights[priority])
+
+    @contextmanager
+    def slot(self, ticket, cost=None):
+        """Hold a solver slot for one unit of work estimated to take `cost` seconds."""
+        if ticket is None:
+            yield
+            return
+        queued = time.monotonic()
+        waiter = self._enqueue(ticket, max(cost or MIN_COST, MIN_COST))
+        if waiter is not None:
+            waiter.event.wait()
+        self._record(ticket, time.monotonic() - queued, waiter is not None)
+        try:
+            yield
+        finally:
+            self._release()
+
+    def _enqueue(self, ticket, cost):
+        flow = (ticket.priority, ticket.client)
+        with self._lock:
+            finish = max(self._virtual, self._finish.get(flow, 0.0)) + cost / ticket.weight
+            self._finish[flow] = finish
+            if self._busy < self.slots and not self._queue:
+                self._busy += 1
+                self._virtual = finish
+                return None
+            waiter = _Waiter(finish)
+            heapq.heappush(self._queue, (finish, self._seq, waiter))
+            self._seq += 1
+            self._stats[ticket.priority]["waiting"] += 1
+            return waiter
+
+    def _release(self):
+        with self._lock:
+            if self._queue and self._busy <= self.slots:
+                # Hand the slot straight to the next unit in finish-tag order.
+                _, _, waiter = heapq.heappop(self._queue)
+                self._virtual = waiter.finish
+                waiter.event.set()
+            else:
+                self._busy -= 1
+            if len(self._finish) > 10000:
+                self._finish = {flow: f for flow, f in self._finish.items() if f > self._virtual}
+
+    def _record(self, ticket, waited, queued):
+        with self._lock:
+            stats = self._stats[ticket.priority]
+            stats["granted"] += 1
+            if queued:
+                stats["waiting"] -= 1
+            stats["wait_seconds"] += waited
+            stats["max_wait_seconds"] = max(stats["max_wait_seconds"], waited)
+
+    def slice_reads(self, num_reads, seconds_per_read):
+        """Split `num_reads` into batches of about SLICE_SECONDS each."""
+        if not seconds_per_read:
+            return [num_reads]
+        size = max(MIN_SLICE_READS, int(SLICE_SECONDS / seconds_per_read))
+        return [min(size, num_reads - start) for start in range(0, num_reads, size)]
+
+    def stats(self):
+        with self._lock:
+            classes = {
+                name: {
+                    "granted": s["granted"],
+                    "waiting": s["waiting"],
+                    "mean_wait_ms": round(1000 * s["wait_seconds"] / s["granted"], 2) if s["granted"] else 0.0,
+                    "max_wait_ms": round(1000 * s["max_wait_seconds"], 2),
+                } for name, s in self._stats.items()
+            }
+            return {"slots": self.slots, "busy": self._busy, "queued": len(self._queue), "classes": classes}
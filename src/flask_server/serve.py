@@ -0,0 +1,179 @@
+"""Pre-forked production launcher: warms the solver stack once, then forks the workers (POSIX only)."""
+import argparse
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+from socketserver import ThreadingMixIn
+
+from werkzeug.serving import BaseWSGIServer
+
+# Small model that touches every variable type the warm-up needs to exercise:
+# compile, unary encoding, constraint penalties, sampling and return decoding.
+WARMUP_MODEL = {
+    "variables": {
+        "x0": {"type": "Binary"},
+        "x1": {"type": "Binary"},
+        "n": {"type": "Unary", "lower": 0, "upper": 2},
+    },
+    "Constraints": [{"lhs": "x0 + x1", "comparison": "=", "rhs": 1}],
+    "Objective": "-2 * x0 - x1 + n",
+    "Return": "x0 + n",
+}
+
+
+class BoundedThreadedWSGIServer(ThreadingMixIn, BaseWSGIServer):
+    """Threaded WSGI server that caps the number of in-flight requests.
+
+    When every slot is busy the accept loop blocks, which leaves new
+    connections in the shared listen queue for a less busy worker.
+    """
+
+    multithread = True
+    daemon_threads = True
+
+    def __init__(self, host, port, app, threads, fd=None):
+        self.slots = threading.BoundedSemaphore(threads)
+        super().__init__(host, port, app, fd=fd)
+
+    def process_request(self, request, client_address):
+        self.slots.acquire()
+        try:
+            super().process_request(request, client_address)
+        except Exception:
+            self.slots.release()
+            raise
+
+    def process_request_thread(self, request, client_address):
+        try:
+            super().process_request_thread(request, client_address)
+        finally:
+            self.slots.release()
+
+
+def warm_up(app, rounds=2):
+    """Run the full /quantum path on a dummy model so imports and JIT happen now."""
+    client = app.test_client()
+    elapsed = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        response = client.post("/quantum", json=WARMUP_MODEL)
+        elapsed.append(time.perf_counter() - start)
+        if response.status_code != 200:
+            raise RuntimeError(f"Warm-up request failed: {response.get_json()}")
+    return elapsed
+
+
+def bind_socket(host, port, backlog):
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def run_worker(app, sock, host, port, threads):
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    server = BoundedThreadedWSGIServer(host, port, app, threads, fd=sock.fileno())
+    server.serve_forever()
+
+
+def spawn_worker(app, sock, args):
+    pid = os.fork()
+    if pid == 0:
+        status = 0
+        try:
+            run_worker(app, sock, args.host, args.port, args.threads)
+        except BaseException:
+            status = 1
+        finally:
+            os._exit(status)
+    return pid
+
+
+def serve(args):
+    from backends import preload
+    from server import app, broker, scheduler, sessions
+
+    # Load pyqubo and the samplers before any worker is forked.
+    preload(background=False)
+
+    # With a broker, a warm-up solve would wait for a solver worker to pick it up.
+    if not args.no_warmup and broker is None:
+        timings = warm_up(app)
+        print(f"Solver warm-up: {', '.join(f'{t * 1000:.1f} ms' for t in timings)}")
+
+    if "QUANTUM_SOLVER_SLOTS" not in os.environ:
+        # Share the cores between workers instead of giving each one all of them.
+        scheduler.slots = max(1, (os.cpu_count() or 1) // args.workers)
+    if "QUANTUM_SESSION_STREAMS" not in os.environ:
+        # Leave at least half of each worker's request threads for solves.
+        sessions.max_streams = args.threads // 2
+
+    sock = bind_socket(args.host, args.port, args.backlog)
+    workers = {}
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    for _ in range(args.workers):
+        pid = spawn_worker(app, sock, args)
+        workers[pid] = time.monotonic()
+
+    print(f"Serving on http://{args.host}:{args.port} with {args.workers} workers "
+          f"x {args.threads} threads (pid {os.getpid()})")
+
+    while workers:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        started = workers.pop(pid, None)
+        if started is None or stopping:
+            continue
+        print(f"Worker {pid} exited with status {status}, restarting", file=sys.stderr)
+        # Back off if workers are crashing straight after start-up.
+        if time.monotonic() - started < 1:
+            time.sleep(1)
+        workers[spawn_worker(app, sock, args)] = time.monotonic()
+
+    sock.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the quantum server with pre-forked workers.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="number of worker processes (default: CPU count)")
+    parser.add_argument("--threads", type=int, default=4,
+                        help="concurrent requests handled by each worker")
+    parser.add_argument("--backlog", type=int, default=1024,
+                        help="listen queue length shared by all workers")
+    parser.add_argument("--no-warmup", action="store_true",
+                        help="skip solving the warm-up model before forking")
+    args = parser.parse_args(argv)
+    if args.workers < 1 or args.threads < 1:
+        parser.error("--workers and --threads must be at least 1")
+    serve(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""Game sessions: compile a model once, then solve each turn from a delta.
+
+State and per-turn results live in files under SESSION_DIR, so any worker can take a turn.
+"""
+import json
+import os
+import re
+import threading
+import time
+import uuid
+
+SESSION_DIR = os.environ.get("QUANTUM_SESSION_DIR", "sessions")
+SESSION_TTL = float(os.environ.get("QUANTUM_SESSION_TTL", 1800))
+# Each open event stream holds a request thread until the client leaves.
+MAX_STREAMS = int(os.environ.get("QUANTUM_SESSION_STREAMS", 2))
+POLL_INTERVAL = 0.05
+KEEPALIVE_SECONDS = 15
+
+SESSION_ID = re.compile(r"^[0-9a-f]{32}$")
+
+
+class SessionStore:
+    def __init__(self, directory=SESSION_DIR, ttl=SESSION_TTL, max_streams=MAX_STREAMS):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_streams = max_streams
+        self._streams = 0
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def _path(self, session_id, suffix):
+        return os.path.join(self.directory, f"{session_id}{suffix}")
+
+    def create(self, state):
+        """Store a new session's state and return its id."""
+        os.makedirs(self.directory, exist_ok=True)
+        self._prune()
+        session_id = uuid.uuid4().hex
+        open(self._path(session_id, ".events"), "w").close()
+        self.save(session_id, state)
+        return session_id
+
+    def load(self, session_id):
+        """State of `session_id`, or None if it doesn't exist or has expired."""
+        if not SESSION_ID.match(session_id):
+            return None
+        path = self._path(session_id, ".json")
+        try:
+            if time.time() - os.path.getmtime(path) > self.ttl:
+                self.delete(session_id)
+                return None
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def save(self, session_id, state):
+        path = self._path(session_id, ".json")
+        temporary = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temporary, "w") as f:
+            json.dump(state, f)
+        os.replace(temporary, path)
+
+    def lock(self, session_id):
+        """Process-local lock serializing the turns of `session_id`."""
+        with self._lock:
+            return self._locks.setdefault(session_id, threading.Lock())
+
+    def publish(self, session_id, turn, result):
+        # A single O_APPEND write per record, so followers never see half a line.
+        line = json.dumps({"turn": turn, "result": result}, separators=(",", ":")) + "\n"
+        fd = os.open(self._path(session_id, ".events"), os.O_WRONLY | os.O_APPEND)
+        try:
+            os.write(fd, line.encode("utf-8"))
+        finally:
+            os.close(fd)
+
+    def open_stream(self):
+        """Claim one of this process's event stream slots; False when all are taken."""
+        with self._lock:
+            if self._streams >= self.max_streams:
+                return False
+            self._streams += 1
+            return True
+
+    def close_stream(self):
+        with self._lock:
+            self._streams -= 1
+
+    def follow(self, session_id, after=0, keepalive=KEEPALIVE_SECONDS):
+        """Yield `(turn, result_json)` for turns after `after` as they are published.
+
+        Yields `(None, None)` every `keepalive` seconds without news and stops
+        once the session is deleted.
+        """
+        path = self._path(session_id, ".events")
+        position, quiet = 0, time.monotonic()
+        while True:
+            try:
+                with open(path, "rb") as f:
+                    f.seek(position)
+                    chunk = f.read()
+            except OSError:
+                return
+            complete = chunk[:chunk.rfind(b"\n") + 1]
+            position += len(complete)
+            for line in complete.splitlines():
+                record = json.loads(line)
+                if record["turn"] > after:
+                    quiet = time.monotonic()
+                    yield record["turn"], json.dumps(record["result"], separators=(",", ":"))
+            if time.monotonic() - quiet > keepalive:
+                quiet = time.monotonic()
+                yield None, None
+            time.sleep(POLL_INTERVAL)
+
+    def delete(self, session_id):
+        for suffix in (".json", ".events"):
+            try:
+                os.remove(self._path(session_id, suffix))
+            except OSError:
+                pass
+        with self._lock:
+            self._locks.pop(session_id, None)
+
+    def _prune(self):
+        now = time.time()
+        try:
+            with os.scandir(self.directory) as entries:
+                expired = [entry.name[:-5] for entry in entries if entry.name.endswith(".json")
+                           and now - entry.stat().st_mtime > self.ttl]
+        except OSError:
+            return
+        for session_id in expired:
+            self.delete(session_id)
+
+    def stats(self):
+        streams = {"streams": self._streams, "max_streams": self.max_streams}
+        try:
+            with os.scandir(self.directory) as entries:
+                return {"active": sum(entry.name.endswith(".json") for entry in entries), "ttl": self.ttl, **streams}
+        except OSError:
+            return {"active": 0, "ttl": self.ttl, **streams}
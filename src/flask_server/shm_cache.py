@@ -0,0 +1,320 @@
+"""Cross-process cache of compiled QUBOs, one shared memory segment per model.
+
+Entries in use are reference counted per process; unused ones are evicted least recently used first.
+"""
+import atexit
+import json
+import multiprocessing
+import os
+import secrets
+import time
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+from compiled_qubo import CompiledQubo
+from constraints import ConstraintSet
+
+SHM_CACHE_BYTES = int(os.environ.get("QUBO_SHM_CACHE_BYTES", 256 * 1024 * 1024))
+SHM_CACHE_SLOTS = int(os.environ.get("QUBO_SHM_CACHE_SLOTS", 1024))
+# Distinct processes that can hold references to one entry at the same time.
+SHM_CACHE_HOLDERS = int(os.environ.get("QUBO_SHM_CACHE_HOLDERS", 32))
+
+SLOT_DTYPE = np.dtype([
+    ("key", "S64"),
+    ("segment", "S32"),
+    ("nbytes", np.int64),
+    ("last_used", np.float64),
+    ("holders", np.int32, (SHM_CACHE_HOLDERS,)),
+    ("holds", np.int32, (SHM_CACHE_HOLDERS,)),
+])
+GENERATION_DTYPE = np.dtype(np.int64)
+HEADER_DTYPE = np.dtype([
+    ("n_vars", np.int64),
+    ("n_terms", np.int64),
+    ("labels_nbytes", np.int64),
+    ("constraints_nbytes", np.int64),
+    ("offset", np.float64),
+])
+
+
+def _untrack(shm):
+    # Segments outlive the process that created them; only the cache owner
+    # unlinks them, so keep the resource tracker from doing it at exit.
+    try:
+        resource_tracker.unregister(shm._name, "shared_memory")
+    except Exception:
+        pass
+
+
+def _unlink(shm):
+    # SharedMemory.unlink() unregisters the segment from the resource tracker,
+    # so register it again first to keep the tracker's bookkeeping balanced.
+    resource_tracker.register(shm._name, "shared_memory")
+    shm.unlink()
+
+
+def _attach(name):
+    shm = shared_memory.SharedMemory(name=name)
+    _untrack(shm)
+    return shm
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class CachedQubo(CompiledQubo):
+    """A CompiledQubo whose arrays are views into a shared memory segment."""
+
+    def __init__(self, cache, key, shm):
+        header = np.ndarray((), dtype=HEADER_DTYPE, buffer=shm.buf)
+        n_vars, n_terms = int(header["n_vars"]), int(header["n_terms"])
+        pos = HEADER_DTYPE.itemsize
+        rows = np.ndarray(n_terms, dtype=np.int32, buffer=shm.buf, offset=pos)
+        pos += rows.nbytes
+        cols = np.ndarray(n_terms, dtype=np.int32, buffer=shm.buf, offset=pos)
+        pos += cols.nbytes
+        coeffs = np.ndarray(n_terms, dtype=np.float64, buffer=shm.buf, offset=pos)
+        pos += coeffs.nbytes
+        labels_nbytes = int(header["labels_nbytes"])
+        labels = json.loads(bytes(shm.buf[pos:pos + labels_nbytes]))
+        if len(labels) != n_vars:
+            raise ValueError(f"Corrupt cache segment {shm.name}")
+        pos += labels_nbytes
+        constraints_nbytes = int(header["constraints_nbytes"])
+        constraints = None
+        if constraints_nbytes:
+            constraints = ConstraintSet.from_bytes(bytes(shm.buf[pos:pos + constraints_nbytes]))
+        super().__init__(labels, rows, cols, coeffs, float(header["offset"]), constraints)
+        self.key = key
+        self._cache = cache
+
+    def release(self):
+        if self._cache is not None:
+            self._cache.release(self.key)
+            self._cache = None
+
+
+class SharedQuboCache:
+    def __init__(self, max_bytes=SHM_CACHE_BYTES, slots=SHM_CACHE_SLOTS):
+        self.max_bytes = max_bytes
+        self.lock = multiprocessing.Lock()
+        self._index_shm = shared_memory.SharedMemory(
+            create=True, size=GENERATION_DTYPE.itemsize + slots * SLOT_DTYPE.itemsize)
+        _untrack(self._index_shm)
+        self.generation = np.ndarray((), dtype=GENERATION_DTYPE, buffer=self._index_shm.buf)
+        self.generation[()] = 0
+        self.index = np.ndarray(slots, dtype=SLOT_DTYPE, buffer=self._index_shm.buf,
+                                offset=GENERATION_DTYPE.itemsize)
+        self.index[:] = np.zeros(slots, dtype=SLOT_DTYPE)
+        self._owner = os.getpid()
+        # Segment name -> (SharedMemory, key) for the segments this process has mapped.
+        self._local = {}
+        self._seen_generation = 0
+        self.hits = 0
+        self.misses = 0
+        atexit.register(self.close)
+
+    def _find(self, key):
+        matches = np.flatnonzero(self.index["key"] == key.encode("ascii"))
+        return int(matches[0]) if len(matches) else None
+
+    def _segment(self, name, key):
+        entry = self._local.get(name)
+        if entry is None:
+            entry = self._local[name] = (_attach(name), key)
+        return entry[0]
+
+    def _forget_local(self):
+        # Caller holds the lock.
+        generation = int(self.generation)
+        if generation == self._seen_generation:
+            return
+        used = self.index["key"] != b""
+        live = dict(zip(self.index["segment"][used].tolist(), self.index["key"][used].tolist()))
+        stale = False
+        for name, (shm, key) in list(self._local.items()):
+            if live.get(name.encode("ascii")) != key.encode("ascii"):
+                try:
+                    shm.close()
+                except BufferError:
+                    # Views handed out earlier are still alive; retry on the next lookup.
+                    stale = True
+                    continue
+                del self._local[name]
+        if not stale:
+            self._seen_generation = generation
+
+    def _reap(self):
+        # Caller holds the lock. Drops the references of processes that have exited.
+        held = self.index["holds"] > 0
+        for pid in np.unique(self.index["holders"][held]).tolist():
+            if not _alive(pid):
+                dead = held & (self.index["holders"] == pid)
+                self.index["holds"][dead] = 0
+                self.index["holders"][dead] = 0
+
+    def _checkout(self, key):
+        pid = os.getpid()
+        with self.lock:
+            self._forget_local()
+            slot = self._find(key)
+            if slot is None:
+                return None
+            entry = self.index[slot]
+            mine = np.flatnonzero((entry["holders"] == pid) & (entry["holds"] > 0))
+            if not len(mine):
+                mine = np.flatnonzero(entry["holds"] == 0)
+                if not len(mine):
+                    # Too many processes share this entry; serve this one a miss.
+                    return None
+                entry["holders"][mine[0]] = pid
+            entry["holds"][mine[0]] += 1
+            entry["last_used"] = time.time()
+            name = entry["segment"].decode("ascii")
+        try:
+            return CachedQubo(self, key, self._segment(name, key))
+        except Exception:
+            self.release(key)
+            raise
+
+    def get(self, key):
+        """Return the cached model for `key` with its refcount taken, or None."""
+        model = self._checkout(key)
+        if model is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return model
+
+    def put(self, key, compiled):
+        """Store `compiled` and return it as a CachedQubo (refcount taken).
+
+        Returns `compiled` unchanged if it cannot fit under the memory cap.
+        """
+        labels = json.dumps(compiled.labels, ensure_ascii=False).encode("utf-8")
+        constraints = compiled.constraints.to_bytes() if compiled.constraints is not None else b""
+        n_terms = compiled.num_terms
+        size = HEADER_DTYPE.itemsize + 8 * n_terms + 8 * n_terms + len(labels) + len(constraints)
+
+        with self.lock:
+            if self._find(key) is None:
+                if not self._make_room(size):
+                    return compiled
+                name = "qubo_" + secrets.token_hex(8)
+                shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+                _untrack(shm)
+                header = np.ndarray((), dtype=HEADER_DTYPE, buffer=shm.buf)
+                header["n_vars"] = compiled.num_variables
+                header["n_terms"] = n_terms
+                header["labels_nbytes"] = len(labels)
+                header["constraints_nbytes"] = len(constraints)
+                header["offset"] = compiled.offset
+                pos = HEADER_DTYPE.itemsize
+                for array, dtype in ((compiled.rows, np.int32), (compiled.cols, np.int32),
+                                     (compiled.coeffs, np.float64)):
+                    view = np.ndarray(n_terms, dtype=dtype, buffer=shm.buf, offset=pos)
+                    view[:] = array
+                    pos += view.nbytes
+                shm.buf[pos:pos + len(labels)] = labels
+                pos += len(labels)
+                shm.buf[pos:pos + len(constraints)] = constraints
+                del header, view
+                self._local[name] = (shm, key)
+
+                slot = int(np.flatnonzero(self.index["key"] == b"")[0])
+                entry = self.index[slot]
+                entry["key"] = key.encode("ascii")
+                entry["segment"] = name.encode("ascii")
+                entry["nbytes"] = size
+                entry["last_used"] = time.time()
+
+        cached = self._checkout(key)
+        return compiled if cached is None else cached
+
+    def _make_room(self, size):
+        # Caller holds the lock.
+        if size > self.max_bytes:
+            return False
+        self._reap()
+        used = self.index["key"] != b""
+        free_slots = len(self.index) - int(used.sum())
+        total = int(self.index["nbytes"][used].sum())
+        candidates = np.flatnonzero(used & (self.index["holds"].sum(axis=1) == 0))
+        candidates = candidates[np.argsort(self.index["last_used"][candidates])]
+        for slot in candidates:
+            if total + size <= self.max_bytes and free_slots > 0:
+                break
+            total -= int(self.index["nbytes"][slot])
+            free_slots += 1
+            self._evict(int(slot))
+        if total + size > self.max_bytes or free_slots == 0:
+            return False
+        self._forget_local()
+        return True
+
+    def _evict(self, slot):
+        name = self.index["segment"][slot].decode("ascii")
+        key = self.index["key"][slot].decode("ascii")
+        self.index[slot] = np.zeros((), dtype=SLOT_DTYPE)
+        self.generation[()] += 1
+        shm, _ = self._local.pop(name, (None, None))
+        try:
+            shm = shm or _attach(name)
+            _unlink(shm)
+            shm.close()
+        except FileNotFoundError:
+            pass
+        except BufferError:
+            self._local[name] = (shm, key)
+
+    def release(self, key):
+        with self.lock:
+            slot = self._find(key)
+            if slot is None:
+                return
+            entry = self.index[slot]
+            mine = np.flatnonzero((entry["holders"] == os.getpid()) & (entry["holds"] > 0))
+            if len(mine):
+                entry["holds"][mine[0]] -= 1
+                if entry["holds"][mine[0]] == 0:
+                    entry["holders"][mine[0]] = 0
+
+    def stats(self):
+        with self.lock:
+            self._reap()
+            used = self.index["key"] != b""
+            return {
+                "entries": int(used.sum()),
+                "bytes": int(self.index["nbytes"][used].sum()),
+                "max_bytes": self.max_bytes,
+                "in_use": int((self.index["holds"][used].sum(axis=1) > 0).sum()),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+    def close(self):
+        """Unlink every segment. Only the process that created the cache does this."""
+        if os.getpid() != self._owner or self._index_shm is None:
+            return
+        with self.lock:
+            for slot in np.flatnonzero(self.index["key"] != b""):
+                self._evict(int(slot))
+        for shm, _ in self._local.values():
+            try:
+                shm.close()
+            except BufferError:
+                pass
+        self._local.clear()
+        self.index = None
+        self.generation = None
+        self._index_shm.close()
+        _unlink(self._index_shm)
+        self._index_shm = None
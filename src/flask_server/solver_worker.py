@@ -0,0 +1,122 @@
+"""Stateless solver worker: pulls jobs from a broker and samples them."""
+import argparse
+import multiprocessing
+import os
+import socket
+import threading
+import time
+import traceback
+import uuid
+from collections import OrderedDict
+
+from broker import LEASE_SECONDS, connect
+
+HEARTBEAT_SECONDS = LEASE_SECONDS / 3
+IDLE_SECONDS = 0.2
+PAYLOAD_CACHE_SIZE = 32
+
+
+class SolverWorker:
+    def __init__(self, broker, worker_id=None, payload_cache_size=PAYLOAD_CACHE_SIZE):
+        self.broker = broker
+        self.id = worker_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self.payload_cache_size = payload_cache_size
+        self._payloads = OrderedDict()
+        self.completed = 0
+        self.failed = 0
+
+    def _compiled(self, key):
+        from qubo_io import loads
+
+        compiled = self._payloads.get(key)
+        if compiled is not None:
+            self._payloads.move_to_end(key)
+            return compiled
+        data = self.broker.get_payload(key)
+        if data is None:
+            raise LookupError(f"Payload {key} not found on the broker")
+        compiled = self._payloads[key] = loads(data, "npz")
+        while len(self._payloads) > self.payload_cache_size:
+            self._payloads.popitem(last=False)
+        return compiled
+
+    def _solve(self, job):
+        from admission import ResourceMeter
+        from sampling import best_result, sample_compiled
+
+        compiled = self._compiled(job["payload"])
+        params = job["params"]
+        meter = ResourceMeter()
+        samples, stats, feasibility = sample_compiled(
+            compiled, params["solver"], params["num_reads"], params.get("seed"), meter,
+            params.get("polish", 0))
+        best = best_result(samples, compiled.offset, stats, feasibility, params.get("top_k", 1),
+                           params.get("min_distance", 1))
+        # Read back by the server to calibrate admission; not part of the response.
+        best["worker_timings"] = meter.timings
+        return best
+
+    def run_one(self):
+        """Claim and run one job; returns False when the queue was empty."""
+        job = self.broker.claim(self.id)
+        if job is None:
+            return False
+        done = threading.Event()
+
+        def keep_lease():
+            while not done.wait(HEARTBEAT_SECONDS):
+                if not self.broker.heartbeat(self.id, job["id"]):
+                    return  # re-queued elsewhere; our result will be ignored
+
+        threading.Thread(target=keep_lease, name="worker-heartbeat", daemon=True).start()
+        try:
+            result = self._solve(job)
+        except Exception as e:
+            self.failed += 1
+            self.broker.fail(job["id"], self.id, f"{type(e).__name__}: {e}")
+            traceback.print_exc()
+        else:
+            self.completed += self.broker.complete(job["id"], self.id, result)
+        finally:
+            done.set()
+        return True
+
+    def run(self, max_jobs=None):
+        info = {"host": socket.gethostname(), "pid": os.getpid()}
+        last_heartbeat = 0.0
+        while max_jobs is None or self.completed + self.failed < max_jobs:
+            if time.monotonic() - last_heartbeat > HEARTBEAT_SECONDS:
+                self.broker.heartbeat(self.id, info=info)
+                last_heartbeat = time.monotonic()
+            if not self.run_one():
+                time.sleep(IDLE_SECONDS)
+
+
+def run_process(target):
+    SolverWorker(connect(target)).run()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run solver workers that pull jobs from a broker.")
+    parser.add_argument("--broker", default=os.environ.get("QUANTUM_BROKER", "queue.db"),
+                        help="broker URL or SQLite path")
+    parser.add_argument("--processes", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    from backends import preload
+
+    # Import the solver stack once, before forking the workers.
+    preload(background=False)
+    if args.processes == 1:
+        run_process(args.broker)
+        return
+    processes = [multiprocessing.Process(target=run_process, args=(args.broker,), daemon=True)
+                 for _ in range(args.processes)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""Canonical forms of board models under grid rotations and reflections, so symmetric positions share a solve."""
+import hashlib
+
+import numpy as np
+
+from compiled_qubo import CompiledQubo
+
+MODES = ("auto", "mirror", "none")
+
+_MASK = np.uint64(0xFFFFFFFFFFFFFFFF)
+
+
+def grid_transforms(variable_data, mode="auto"):
+    """Label maps (`{label: label}`) of the symmetry group, identity first.
+
+    Empty when the request has no Array variables or `mode` is "none".
+    """
+    if mode == "none":
+        return []
+    grids, lines = {}, {}
+    for name, info in (variable_data or {}).items():
+        if not isinstance(info, dict) or info.get("type") != "Array":
+            continue
+        shape = info.get("shape")
+        if isinstance(shape, int) and shape > 1:
+            lines[name] = shape
+        elif isinstance(shape, (list, tuple)) and len(shape) == 2 and all(isinstance(s, int) for s in shape):
+            if shape[0] * shape[1] > 1:
+                grids[name] = tuple(shape)
+    if not grids and not lines:
+        return []
+
+    square = all(rows == cols for rows, cols in grids.values())
+    elements = [(transpose, flip_rows, flip_cols)
+                for transpose in (False, True) for flip_rows in (False, True) for flip_cols in (False, True)
+                if (not transpose or (grids and square)) and (not flip_rows or grids)]
+    if mode == "mirror":
+        elements = [(False, False, False), (False, False, True)]
+
+    transforms, seen = [], set()
+    for transpose, flip_rows, flip_cols in elements:
+        mapping = {}
+        for name, (rows, cols) in grids.items():
+            for i in range(rows):
+                for j in range(cols):
+                    a = rows - 1 - i if flip_rows else i
+                    b = cols - 1 - j if flip_cols else j
+                    if transpose:
+                        a, b = b, a
+                    mapping[f"{name}_{i}_{j}"] = f"{name}_{a}_{b}"
+        for name, size in lines.items():
+            for i in range(size):
+                mapping[f"{name}_{i}"] = f"{name}_{size - 1 - i if flip_cols else i}"
+        signature = tuple(sorted(mapping.items()))
+        if signature not in seen:
+            seen.add(signature)
+            transforms.append(mapping)
+    return transforms if len(transforms) > 1 else []
+
+
+def _mix(values):
+    """splitmix64 finalizer over a uint64 array (wrapping arithmetic)."""
+    with np.errstate(over="ignore"):
+        z = values * np.uint64(0x9E3779B97F4A7C15)
+        z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        return (z ^ (z >> np.uint64(31))) & _MASK
+
+
+def _segment_hashes(term_hashes, indptr):
+    """Order-independent hash of each CSR segment: the wrapping sum of its terms."""
+    running = np.zeros(len(term_hashes) + 1, dtype=np.uint64)
+    np.cumsum(term_hashes, out=running[1:])
+    with np.errstate(over="ignore"):
+        return running[indptr[1:]] - running[indptr[:-1]]
+
+
+def _constraint_fingerprint(constraints, rank):
+    """Sorted per-constraint hashes, so the fingerprint ignores constraint order."""
+    def term(*columns):
+        h = np.zeros(len(columns[0]), dtype=np.uint64)
+        for column in columns:
+            h = _mix(h ^ column.astype(np.uint64))
+        return h
+
+    linear = term(rank[constraints.linear_vars], constraints.linear_coeffs.view(np.uint64))
+    a = rank[constraints.quadratic_a]
+    b = rank[constraints.quadratic_b]
+    quadratic = term(np.minimum(a, b), np.maximum(a, b), constraints.quadratic_coeffs.view(np.uint64))
+    with np.errstate(over="ignore"):
+        combined = (_segment_hashes(linear, constraints.linear_ptr)
+                    + _mix(_segment_hashes(quadratic, constraints.quadratic_ptr)))
+    combined = term(combined, constraints.kind, constraints.rhs.view(np.uint64),
+                    constraints.constant.view(np.uint64))
+    return np.sort(combined).tobytes() + constraints.ignored.size.to_bytes(4, "little")
+
+
+def certificate(compiled, labels):
+    """Hash of `compiled` relabelled to `labels`, independent of variable and term order."""
+    order = np.argsort(np.array(labels, dtype=str), kind="stable")
+    rank = np.empty(len(labels), dtype=np.int64)
+    rank[order] = np.arange(len(labels))
+    rows, cols = rank[compiled.rows], rank[compiled.cols]
+    low, high = np.minimum(rows, cols), np.maximum(rows, cols)
+    terms = np.lexsort((high, low))
+    digest = hashlib.sha256()
+    digest.update("\0".join(labels[i] for i in order.tolist()).encode("utf-8"))
+    digest.update(low[terms].tobytes() + high[terms].tobytes())
+    digest.update(np.ascontiguousarray(compiled.coeffs[terms], dtype=np.float64).tobytes())
+    digest.update(np.float64(compiled.offset).tobytes())
+    if compiled.constraints is not None:
+        digest.update(_constraint_fingerprint(compiled.constraints, rank))
+    return digest.hexdigest()
+
+
+class Canonical:
+    """A model relabelled to its canonical form.
+
+    `compiled` is a standalone copy of the QUBO under canonical labels, `key`
+    its certificate, and `restore` maps a best-result dict solved in
+    canonical labels back to the original model.
+    """
+
+    def __init__(self, original, mapping, key):
+        self.key = key
+        self.mapping = mapping
+        self.labels = list(original.labels)
+        self.constraints = original.constraints
+        self.compiled = CompiledQubo([mapping.get(label, label) for label in self.labels],
+                                     np.array(original.rows), np.array(original.cols),
+                                     np.array(original.coeffs), original.offset, original.constraints)
+
+    def relabel(self, canonical):
+        """A `{label: value}` sample in canonical labels, keyed by the original labels."""
+        return {label: canonical[self.mapping.get(label, label)] for label in self.labels
+                if self.mapping.get(label, label) in canonical}
+
+    def restore(self, best):
+        sample = self.relabel(best["sample"])
+        restored = {**best, "sample": sample}
+        if best.get("distribution"):
+            restored["distribution"] = {**best["distribution"], "top": [
+                {**state, "sample": self.relabel(state["sample"])} for state in best["distribution"]["top"]]}
+        if best.get("solutions"):
+            restored["solutions"] = [{**option, "sample": self.relabel(option["sample"])}
+                                     for option in best["solutions"]]
+        if best.get("feasibility") is not None and self.constraints is not None:
+            x = np.array([[sample.get(label, 0) for label in self.labels]], dtype=np.float64)
+            violated, report = self.constraints.describe(x)
+            restored["feasibility"] = {**best["feasibility"], "feasible": violated == 0,
+                                       "violated": violated, "constraints": report}
+        return restored
+
+
+def canonicalize(compiled, transforms):
+    """The `Canonical` form of `compiled` over `transforms` (from `grid_transforms`)."""
+    best = None
+    for mapping in transforms:
+        key = certificate(compiled, [mapping.get(label, label) for label in compiled.labels])
+        if best is None or key < best[0]:
+            best = (key, mapping)
+    return Canonical(compiled, best[1], best[0])
@@ -0,0 +1,41 @@
+import itertools
+import os
+import sys
+
+import numpy as np
+import pytest
+
+# The server's modules are flat files imported by name, as serve.py runs them.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from compiled_qubo import CompiledQubo  # noqa: E402
+
+
+@pytest.fixture
+def random_qubo():
+    """Factory for CompiledQubos over labels x0..x{n-1} with random linear and quadratic terms."""
+    def make(n, density=0.5, seed=0, offset=1.5):
+        rng = np.random.default_rng(seed)
+        rows, cols = np.triu_indices(n)
+        keep = (rows == cols) | (rng.random(len(rows)) < density)
+        return CompiledQubo([f"x{i}" for i in range(n)], rows[keep].astype(np.int32),
+                            cols[keep].astype(np.int32), rng.normal(size=int(keep.sum())), offset)
+
+    return make
+
+
+@pytest.fixture
+def qubo(random_qubo):
+    return random_qubo(8)
+
+
+@pytest.fixture
+def brute_force():
+    """Exact `(energy, states)` minimum of a small CompiledQubo, every minimizing state included."""
+    def solve(qubo):
+        states = np.array(list(itertools.product((0, 1), repeat=qubo.num_variables)), dtype=np.int8)
+        energies = qubo.energies(states)
+        best = energies.min()
+        return float(best), states[energies <= best + 1e-9]
+
+    return solve
@@ -0,0 +1,114 @@
+import pytest
+
+from admission import AdmissionController, Calibration
+
+
+def model(n):
+    return {"variables": {"x": {"type": "Array", "shape": n}},
+            "Objective": " + ".join(f"x_{i}" for i in range(n)),
+            "Constraints": [{"lhs": " + ".join(f"x_{i}" for i in range(n)), "comparison": "=", "rhs": 1}]}
+
+
+@pytest.fixture
+def controller():
+    return AdmissionController(Calibration(), max_variables=1000, request_budget=10, inflight_budget=1.0)
+
+
+def test_assess_does_not_charge(controller):
+    decision = controller.assess(model(20), 100)
+    assert decision.admitted
+    assert decision.charge == 0
+    assert controller.inflight_seconds == 0
+
+
+def test_reserve_and_release_balance(controller):
+    decision = controller.reserve(controller.assess(model(20), 100))
+    assert decision.charge > 0
+    assert controller.inflight_seconds == pytest.approx(decision.charge)
+    controller.release(decision)
+    assert controller.inflight_seconds == 0
+    assert decision.charge == 0
+    assert controller.stats()["admitted"] == 1
+
+
+def test_first_request_always_fits_then_busy(controller):
+    big = controller.reserve(controller.assess(model(200), 1000))
+    assert big.admitted
+    assert big.charge > controller.inflight_budget
+    busy = controller.reserve(controller.assess(model(20), 100))
+    assert busy.status == 429
+    assert controller.stats()["rejected_load"] == 1
+    controller.release(big)
+    assert controller.reserve(controller.assess(model(20), 100)).admitted
+
+
+def test_too_many_variables_is_413_without_charge(controller):
+    decision = controller.admit(model(2000), 10)
+    assert decision.status == 413
+    assert controller.inflight_seconds == 0
+    assert controller.stats()["rejected_size"] == 1
+
+
+def test_expensive_request_is_downgraded(controller):
+    decision = controller.assess(model(200), 10000)
+    assert decision.admitted
+    assert decision.downgraded
+    assert decision.num_reads < 10000
+    assert decision.estimate.sample_seconds_per_read * decision.num_reads <= controller.request_budget
+    assert decision.to_dict(10000)["downgraded"]
+
+
+def test_shared_requests_are_counted_but_not_charged(controller):
+    controller.shared()
+    assert controller.stats()["shared"] == 1
+    assert controller.inflight_seconds == 0
+
+
+def test_tabu_has_its_own_sampling_rate():
+    calibration = Calibration()
+    controller = AdmissionController(calibration)
+    neal_estimate = controller.assess(model(50), 1).estimate
+    tabu_estimate = controller.assess(model(50), 1, "tabu").estimate
+    assert tabu_estimate.solver == "tabu"
+    assert tabu_estimate.sample_seconds_per_read != neal_estimate.sample_seconds_per_read
+
+    # Feedback from a slow tabu solve raises tabu's rate and leaves neal's alone.
+    neal_rate = calibration.rate("sample_per_unit")
+    tabu_rate = calibration.rate("sample_per_unit:tabu")
+    calibration.observe(tabu_estimate, 10, sample_seconds=100.0)
+    assert calibration.rate("sample_per_unit:tabu") > tabu_rate
+    assert calibration.rate("sample_per_unit") == neal_rate
+
+
+def test_hybrid_pays_for_refinement_whatever_its_reads():
+    calibration = Calibration()
+    controller = AdmissionController(calibration)
+    neal_estimate = controller.assess(model(50), 100).estimate
+    hybrid = controller.assess(model(50), 100, "hybrid")
+    assert hybrid.estimate.sample_seconds_per_read == neal_estimate.sample_seconds_per_read
+    assert hybrid.estimate.sample_seconds_base > 0
+    assert hybrid.estimate.sample_seconds(1) > neal_estimate.sample_seconds(50)
+    assert controller.reserve(hybrid).charge == pytest.approx(
+        hybrid.estimate.compile_seconds + hybrid.estimate.sample_seconds(100))
+
+    # A slow refinement raises hybrid's own rate, not neal's per-read rate.
+    neal_rate = calibration.rate("sample_per_unit")
+    refine_rate = calibration.rate("refine_per_unit:hybrid")
+    calibration.observe(hybrid.estimate, 100, sample_seconds=30.0)
+    assert calibration.rate("refine_per_unit:hybrid") > refine_rate
+    assert calibration.rate("sample_per_unit") == neal_rate
+
+
+def test_hybrid_refinement_counts_against_the_request_budget():
+    controller = AdmissionController(Calibration(refine_priors={"hybrid": 1.0}), request_budget=10)
+    assert controller.assess(model(50), 100).admitted
+    decision = controller.assess(model(50), 100, "hybrid")
+    assert decision.status == 413
+
+
+def test_rates_never_drop_below_priors():
+    calibration = Calibration()
+    estimate = AdmissionController(calibration).assess(model(50), 1).estimate
+    calibration.observe(estimate, 1000, compile_seconds=0.0, sample_seconds=0.0)
+    assert calibration.rate("sample_per_unit") == calibration.priors["sample_per_unit"]
+    assert calibration.rate("compile_per_term") == calibration.priors["compile_per_term"]
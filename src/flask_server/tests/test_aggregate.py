@@ -0,0 +1,95 @@
+import numpy as np
+import pytest
+
+from aggregate import AggregatedSamples
+
+
+def reads(seed=0, n=11, count=200):
+    # 11 variables, so packed rows span two bytes with padding.
+    rng = np.random.default_rng(seed)
+    samples = rng.integers(0, 2, (count, n)).astype(np.int8)
+    samples[::3] = samples[0]
+    return [f"v{i}" for i in range(n)], samples, samples @ rng.normal(size=n)
+
+
+def test_identical_reads_are_merged_with_their_counts():
+    labels, samples, energies = reads()
+    aggregated = AggregatedSamples.from_arrays(labels, samples, energies)
+    distinct = np.unique(samples, axis=0)
+    assert aggregated.num_distinct == len(distinct)
+    assert aggregated.total_reads == len(samples)
+    assert aggregated.states.shape == (len(distinct), 2)
+    assert sorted(map(tuple, aggregated.unpacked())) == sorted(map(tuple, distinct))
+    for row, count in zip(aggregated.unpacked(), aggregated.counts):
+        assert count == (samples == row).all(axis=1).sum()
+
+
+def test_states_are_sorted_by_energy():
+    labels, samples, energies = reads(1)
+    aggregated = AggregatedSamples.from_arrays(labels, samples, energies)
+    assert np.all(np.diff(aggregated.energies) >= 0)
+    first = aggregated.sample(0)
+    assert first == dict(zip(labels, samples[np.argmin(energies)].tolist()))
+
+
+def test_counts_are_added_across_samplesets():
+    dimod = pytest.importorskip("dimod")
+    bqm = dimod.BQM({"a": 1.0, "b": -1.0}, {("a", "b"): 2.0}, 0.0, dimod.BINARY)
+    one = dimod.SampleSet.from_samples_bqm([{"a": 0, "b": 1}, {"a": 0, "b": 1}], bqm)
+    # The same variables in another order.
+    other = dimod.SampleSet.from_samples_bqm(([[1, 0], [0, 0]], ["b", "a"]), bqm)
+    aggregated = AggregatedSamples.from_samplesets([one, other])
+    assert aggregated.total_reads == 4
+    assert aggregated.sample(0) == {"a": 0, "b": 1}
+    assert aggregated.counts[0] == 3
+    assert aggregated.energies.tolist() == [-1.0, 0.0]
+
+
+def test_aligned_reorders_columns_and_zero_fills():
+    aggregated = AggregatedSamples.from_arrays(["a", "b", "c"], [[1, 0, 1]], [0.0])
+    assert aggregated.aligned(["c", "x", "a"]).tolist() == [[1, 0, 1]]
+
+
+def test_distances_are_hamming_distances():
+    labels, samples, energies = reads(2)
+    aggregated = AggregatedSamples.from_arrays(labels, samples, energies)
+    rows = aggregated.unpacked().astype(int)
+    expected = np.abs(rows - rows[3]).sum(axis=1)
+    assert aggregated.distances(3).tolist() == expected.tolist()
+
+
+def test_summary():
+    aggregated = AggregatedSamples.from_arrays(["a", "b"], [[0, 1], [0, 1], [1, 1], [0, 0]], [-1.0, -1.0, 0.5, 0.0])
+    summary = aggregated.summary(top_k=2, bins=4)
+    assert summary["num_reads"] == 4
+    assert summary["distinct_states"] == 3
+    assert summary["ground_state_probability"] == 0.5
+    assert [entry["num_occurrences"] for entry in summary["top"]] == [2, 1]
+    assert sum(summary["energy_histogram"]["counts"]) == 4
+
+
+@pytest.mark.parametrize("min_distance", [1, 2, 3, 5])
+def test_diverse_states_are_min_distance_apart(min_distance):
+    labels, samples, energies = reads(3, n=11, count=400)
+    aggregated = AggregatedSamples.from_arrays(labels, samples, energies)
+    picked, distances = aggregated.diverse(8, min_distance)
+    assert picked[0] == 0 and distances[0] is None
+    assert len(set(picked)) == len(picked)
+    for j, i in enumerate(picked):
+        nearest = min((int(aggregated.distances(i)[p]) for p in picked[:j]), default=None)
+        assert nearest == distances[j]
+        assert j == 0 or nearest >= min_distance
+    # Greedy in energy order: the energies of the picks never decrease.
+    assert np.all(np.diff(aggregated.energies[picked]) >= 0)
+
+
+def test_diverse_stops_when_nothing_is_far_enough():
+    aggregated = AggregatedSamples.from_arrays(["a", "b", "c"], [[0, 0, 0], [1, 0, 0], [1, 1, 0]], [0.0, 1.0, 2.0])
+    assert aggregated.diverse(3, 2) == ([0, 2], [None, 2])
+    assert aggregated.diverse(5, 1)[0] == [0, 1, 2]
+
+
+def test_diverse_prefers_fewer_violations():
+    aggregated = AggregatedSamples.from_arrays(["a", "b"], [[0, 0], [1, 0], [1, 1]], [0.0, 1.0, 2.0])
+    aggregated.violations = np.array([1, 0, 0])
+    assert aggregated.diverse(3)[0] == [1, 2, 0]
@@ -0,0 +1,133 @@
+import pytest
+
+import broker as broker_module
+from broker import JobFailed, SqliteBroker, broker_app, wait
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(broker_module.time, "time", clock.time)
+    return clock
+
+
+@pytest.fixture
+def broker(tmp_path, clock):
+    broker = SqliteBroker(str(tmp_path / "queue.db"), lease_seconds=30, max_attempts=2, payload_ttl=600)
+    broker.put_payload("model", b"npz bytes")
+    return broker
+
+
+def test_submit_needs_a_stored_payload(broker):
+    assert broker.submit("unknown", {}) is None
+    assert broker.submit("model", {"num_reads": 5}) is not None
+
+
+def test_claim_runs_highest_priority_first(broker, clock):
+    low = broker.submit("model", {}, priority=1.0)
+    clock.now += 1
+    high = broker.submit("model", {}, priority=16.0)
+    assert broker.claim("w1")["id"] == high
+    job = broker.claim("w2")
+    assert job == {"id": low, "payload": "model", "params": {}}
+    assert broker.claim("w3") is None
+
+
+def test_complete_and_collect(broker):
+    job = broker.submit("model", {})
+    broker.claim("w1")
+    assert broker.complete(job, "w1", {"energy": -1.0})
+    assert wait(broker, job, timeout=1) == {"energy": -1.0}
+    assert broker.status(job) is None
+
+
+def test_only_the_lease_holder_can_complete(broker):
+    job = broker.submit("model", {})
+    broker.claim("w1")
+    assert not broker.complete(job, "w2", {})
+    assert not broker.heartbeat("w2", job)
+
+
+def test_expired_lease_is_requeued_then_failed(broker, clock):
+    job = broker.submit("model", {})
+    broker.claim("w1")
+    clock.now += 31
+    # The dead worker's job goes to the next claimant, which also dies.
+    assert broker.claim("w2")["id"] == job
+    assert broker.status(job)["attempts"] == 2
+    clock.now += 31
+    assert broker.claim("w3") is None
+    assert broker.status(job)["status"] == "failed"
+    with pytest.raises(JobFailed):
+        wait(broker, job, timeout=1)
+
+
+def test_heartbeat_extends_the_lease(broker, clock):
+    job = broker.submit("model", {})
+    broker.claim("w1")
+    clock.now += 20
+    assert broker.heartbeat("w1", job)
+    clock.now += 20
+    assert broker.claim("w2") is None
+    assert broker.complete(job, "w1", {})
+
+
+def test_failed_job_is_retried_until_out_of_attempts(broker):
+    job = broker.submit("model", {})
+    broker.claim("w1")
+    broker.fail(job, "w1", "boom")
+    assert broker.status(job)["status"] == "queued"
+    broker.claim("w1")
+    broker.fail(job, "w1", "boom")
+    assert broker.status(job) == {"id": job, "status": "failed", "attempts": 2, "error": "boom"}
+
+
+def test_idle_unreferenced_payloads_expire(broker, clock):
+    broker.put_payload("other", b"x")
+    job = broker.submit("model", {})
+    clock.now += 601
+    broker.forget("nothing")
+    # "other" was idle and unused; "model" is still referenced by a queued job.
+    assert not broker.has_payload("other")
+    assert broker.has_payload("model")
+
+    # Once its job is collected, nothing holds it and it was last used over the TTL ago.
+    broker.claim("w1")
+    broker.complete(job, "w1", {})
+    broker.forget(job)
+    assert not broker.has_payload("model")
+    assert broker.stats()["payloads"] == 0
+
+
+def test_submit_keeps_a_payload_alive(broker, clock):
+    clock.now += 500
+    job = broker.submit("model", {})
+    broker.claim("w1")
+    broker.complete(job, "w1", {})
+    clock.now += 200
+    broker.forget(job)
+    assert broker.has_payload("model")
+
+
+def test_abandoned_finished_jobs_are_pruned(broker, clock):
+    job = broker.submit("model", {})
+    broker.claim("w1")
+    broker.complete(job, "w1", {})
+    clock.now += 601
+    broker.forget("nothing")
+    assert broker.status(job) is None
+
+
+def test_http_submit_without_payload_is_409(broker):
+    client = broker_app(broker).test_client()
+    assert client.post("/jobs", json={"payload": "unknown", "params": {}}).status_code == 409
+    client.put("/payloads/new", data=b"bytes")
+    assert client.post("/jobs", json={"payload": "new", "params": {}}).status_code == 200
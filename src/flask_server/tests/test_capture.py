@@ -0,0 +1,190 @@
+import itertools
+import os
+
+from flask import Flask, jsonify, request
+
+from capture import install_capture, read_trace
+import replay
+
+
+def toy_app(directory, rate=1.0):
+    app = Flask(__name__)
+    ids = itertools.count()
+
+    @app.route("/quantum", methods=["POST"])
+    def quantum():
+        return jsonify({"energy": 0.0})
+
+    @app.route("/session", methods=["POST"])
+    def create():
+        if request.get_json(force=True).get("fail"):
+            return jsonify({"error": "busy"}), 429
+        return jsonify({"session": f"s{next(ids)}", "turn": 1})
+
+    @app.route("/session/<session_id>/turn", methods=["POST"])
+    def turn(session_id):
+        return jsonify({"session": session_id})
+
+    writer = install_capture(app, str(directory), rate)
+    return app, writer
+
+
+def records(directory):
+    return list(read_trace(sorted(str(p) for p in directory.glob("*.ndjson.gz"))))
+
+
+def test_sessions_are_captured_with_their_id(tmp_path):
+    app, writer = toy_app(tmp_path)
+    client = app.test_client()
+    client.post("/quantum", json={"Objective": "x"})
+    # Browsers send sessions as text/plain to skip the CORS preflight.
+    client.post("/session", data='{"Objective": "x"}', content_type="text/plain")
+    client.post("/session/s0/turn", json={"fixed": {"x": 1}})
+    client.post("/session", json={"fail": True})
+    writer.flush()
+
+    captured = records(tmp_path)
+    assert [(r["path"], r.get("session")) for r in captured] == [
+        ("/quantum", None), ("/session", "s0"), ("/session/s0/turn", "s0"), ("/session", None)]
+    assert captured[1]["payload"] == {"Objective": "x"}
+
+
+def test_sampled_sessions_keep_all_their_turns(tmp_path):
+    app, writer = toy_app(tmp_path, rate=0.5)
+    client = app.test_client()
+    for _ in range(40):
+        session = client.post("/session", json={}).get_json()["session"]
+        for _ in range(3):
+            client.post(f"/session/{session}/turn", json={})
+    writer.flush()
+
+    counts = {}
+    for record in records(tmp_path):
+        counts[record["session"]] = counts.get(record["session"], 0) + 1
+    assert 0 < len(counts) < 40
+    assert set(counts.values()) == {4}
+
+
+class FakeTarget:
+    def __init__(self):
+        self.sent = []
+        self.ids = itertools.count(100)
+
+    def send(self, path, payload):
+        self.sent.append(path)
+        if path == "/session":
+            if payload.get("fail"):
+                return 429, {"error": "busy"}
+            return 200, {"session": f"r{next(self.ids)}"}
+        return 200, None
+
+
+def test_replay_sends_turns_to_the_replayed_session():
+    trace = [
+        {"ts": 0.0, "path": "/session", "session": "a", "payload": {}},
+        {"ts": 0.01, "path": "/session/a/turn", "session": "a", "payload": {}},
+        {"ts": 0.02, "path": "/session/missing/turn", "session": "missing", "payload": {}},
+        {"ts": 0.03, "path": "/session", "session": "b", "payload": {"fail": True}},
+        {"ts": 0.04, "path": "/session/b/turn", "session": "b", "payload": {}},
+        {"ts": 0.05, "path": "/quantum", "payload": {}},
+    ]
+    target = FakeTarget()
+    report = replay.replay(replay.schedule(trace, speed=10, multiply=2), target, concurrency=4)
+
+    turns = sorted(path for path in target.sent if path.endswith("/turn"))
+    assert len(turns) == 2 and turns[0] != turns[1]
+    assert all(path.startswith("/session/r1") for path in turns)
+    assert report["skipped"] == 4
+    assert report["statuses"] == {"200": 6, "429": 2}
+
+
+def test_each_flush_is_a_readable_gzip_member(tmp_path):
+    from capture import TraceWriter
+
+    writer = TraceWriter(str(tmp_path), flush_records=2, flush_seconds=60)
+    for i in range(5):
+        writer.write({"ts": float(i), "path": "/quantum", "payload": {"i": i}})
+    # Two complete members are on disk before the last record is flushed.
+    assert [r["payload"]["i"] for r in records(tmp_path)] == [0, 1, 2, 3]
+    writer.flush()
+    assert [r["payload"]["i"] for r in records(tmp_path)] == [0, 1, 2, 3, 4]
+
+
+def test_trace_files_rotate(tmp_path):
+    from capture import TraceWriter
+
+    writer = TraceWriter(str(tmp_path), max_bytes=1, flush_records=1, flush_seconds=60)
+    for i in range(3):
+        writer.write({"ts": float(i), "path": "/quantum", "payload": {"i": i}})
+    assert len(list(tmp_path.glob(f"trace-{os.getpid()}-*.ndjson.gz"))) == 3
+    assert sorted(r["payload"]["i"] for r in records(tmp_path)) == [0, 1, 2]
+
+
+def test_only_posts_to_captured_paths_are_recorded(tmp_path):
+    app, writer = toy_app(tmp_path)
+
+    @app.route("/health")
+    def health():
+        return jsonify({})
+
+    client = app.test_client()
+    client.get("/health")
+    client.post("/quantum", json={"n": 1})
+    writer.flush()
+    captured = records(tmp_path)
+    assert [r["path"] for r in captured] == ["/quantum"]
+    assert captured[0]["status"] == 200 and captured[0]["pid"] == os.getpid()
+
+
+def test_load_records_sorts_and_filters(tmp_path):
+    from capture import TraceWriter
+
+    writer = TraceWriter(str(tmp_path))
+    for ts, path in ((3.0, "/quantum"), (1.0, "/quantum/evaluate"), (2.0, "/quantum")):
+        writer.write({"ts": ts, "path": path, "payload": {}})
+    writer.write({"ts": 0.0, "path": "/quantum", "payload": None})
+    writer.flush()
+    assert [r["ts"] for r in replay.load_records([str(tmp_path)])] == [1.0, 2.0, 3.0]
+    assert [r["ts"] for r in replay.load_records([str(tmp_path)], "/quantum")] == [2.0, 3.0]
+
+
+def test_schedule():
+    trace = [{"ts": 10.0}, {"ts": 12.0}, {"ts": 13.0}]
+    assert [offset for offset, _ in replay.schedule(trace)] == [0.0, 2.0, 3.0]
+    assert [offset for offset, _ in replay.schedule(trace, speed=2)] == [0.0, 1.0, 1.5]
+    assert [offset for offset, _ in replay.schedule(trace, multiply=2)] == [0.0, 0.0, 2.0, 2.0, 3.0, 3.0]
+    assert [offset for offset, _ in replay.schedule(trace, rate=4)] == [0.0, 0.25, 0.5]
+    assert replay.schedule([]) == []
+
+
+def test_replay_reports_statuses_and_latency():
+    class Target:
+        def send(self, path, payload):
+            if payload.get("fail"):
+                raise ConnectionError
+            return payload["status"], None
+
+    trace = [{"ts": i * 0.001, "path": "/quantum", "payload": {"status": status}}
+             for i, status in enumerate([200, 200, 429, 200])]
+    trace.append({"ts": 0.005, "path": "/quantum", "payload": {"fail": True}})
+    report = replay.replay(replay.schedule(trace), Target(), concurrency=2)
+    assert report["requests"] == 5
+    assert report["statuses"] == {"200": 3, "429": 1, "exception": 1}
+    assert report["errors"] == 2 and report["error_rate"] == 0.4
+    assert set(report["latency_ms"]) == {"p50", "p90", "p95", "p99", "max"}
+
+
+def test_sweep_finds_where_errors_start():
+    class Target:
+        calls = 0
+
+        def send(self, path, payload):
+            # Healthy for the first run, overloaded from the second on.
+            self.calls += 1
+            return (200 if self.calls <= 10 else 503), None
+
+    trace = [{"ts": i * 0.002, "path": "/quantum", "payload": {}} for i in range(10)]
+    result = replay.sweep(trace, Target(), [1, 2, 4])
+    assert [run["speed"] for run in result["runs"]] == [1, 2, 4]
+    assert result["runs"][0]["errors"] == 0
+    assert result["saturation_speed"] == 2
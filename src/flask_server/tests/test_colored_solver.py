@@ -0,0 +1,94 @@
+import numpy as np
+import pytest
+
+from colored_solver import (INT16_LIMIT, ColoredAnnealingSampler, acceptance_table, field_bound,
+                            greedy_coloring, quantize)
+from compiled_qubo import CompiledQubo
+
+
+def ring(coeffs, n=4):
+    """A cycle over n variables: linear terms then the n couplings, from `coeffs`."""
+    rows = np.array(list(range(n)) + list(range(n)), dtype=np.int32)
+    cols = np.array(list(range(n)) + [(i + 1) % n for i in range(n)], dtype=np.int32)
+    low, high = np.minimum(rows, cols), np.maximum(rows, cols)
+    return CompiledQubo([f"x{i}" for i in range(n)], low, high, np.array(coeffs, dtype=float), 0.0)
+
+
+def test_decimal_weights_get_an_exact_scale():
+    coeffs, scale, report = quantize(ring([0.5, -0.25, 1.0, 0.75, 0.5, -1.25, 0.25, 2.0]))
+    assert scale == 4 and report["exact"] and report["kernel"] == "int16"
+    assert coeffs.tolist() == [2, -1, 4, 3, 2, -5, 1, 8]
+
+
+def test_integer_weights_keep_scale_one():
+    coeffs, scale, report = quantize(ring([3, -2, 1, 4, -5, 6, 7, -8]))
+    assert scale == 1 and report["energy_error_bound"] == 0.0
+    assert coeffs.tolist() == [3, -2, 1, 4, -5, 6, 7, -8]
+
+
+def test_inexact_weights_are_scaled_to_fill_int16(random_qubo):
+    qubo = random_qubo(10, seed=2)
+    coeffs, scale, report = quantize(qubo)
+    assert not report["exact"] and report["kernel"] == "int16"
+    assert field_bound(qubo, coeffs) <= INT16_LIMIT
+    assert field_bound(qubo, coeffs) > 0.9 * INT16_LIMIT
+    error = np.abs(coeffs / scale - qubo.coeffs)
+    assert report["max_coefficient_error"] == pytest.approx(error.max())
+    assert report["max_coefficient_error"] <= 0.01 * np.abs(qubo.coeffs).min()
+
+
+def test_wide_ranges_fall_back_to_float32():
+    coeffs, scale, report = quantize(ring([1e-3, 1e4, 1, 1, 1, 1, 1, 1]))
+    assert coeffs is None and scale is None
+    assert report["kernel"] == "float32" and "reason" in report
+
+
+def test_acceptance_table():
+    table = acceptance_table(0.5, 1000)
+    assert table[0] == 65536
+    assert table[1:5].tolist() == np.floor(65536 * np.exp(-0.5 * np.arange(1, 5))).tolist()
+    # It ends once a step is less likely than 1 in 65536.
+    assert table[-1] == 0 and table[-2] > 0
+    assert len(acceptance_table(0.0, 7)) == 8
+    assert len(acceptance_table(100.0, 1000)) == 2
+
+
+def test_coloring_separates_neighbours(random_qubo):
+    qubo = random_qubo(30, density=0.2, seed=4)
+    indptr, indices, _ = qubo.adjacency()
+    colors = greedy_coloring(indptr, indices)
+    for v in range(30):
+        neighbours = indices[indptr[v]:indptr[v + 1]]
+        assert colors[v] not in colors[neighbours[neighbours != v]]
+
+
+@pytest.mark.parametrize("quantized", [False, True])
+@pytest.mark.parametrize("seed", range(3))
+def test_samplers_reach_the_brute_force_optimum(random_qubo, brute_force, quantized, seed):
+    pytest.importorskip("neal")
+    qubo = random_qubo(12, density=0.4, seed=seed)
+    sampler = ColoredAnnealingSampler(max_workers=2, quantize=quantized)
+    sampleset = sampler.sample(qubo.to_bqm(), num_reads=64, seed=seed, num_sweeps=200)
+    assert sampleset.first.energy == pytest.approx(brute_force(qubo)[0])
+    assert sampleset.record.num_occurrences.sum() == 64
+    # Energies come from the exact model, not the rounded one.
+    states = np.array([[sample[f"x{i}"] for i in range(12)] for sample in sampleset.samples()])
+    assert np.allclose(sampleset.record.energy, qubo.energies(states))
+    assert ("quantization" in sampleset.info) == quantized
+
+
+def test_quantized_sampler_reports_the_float32_fallback():
+    pytest.importorskip("neal")
+    qubo = ring([1e-3, 1e4, 1, 1, 1, 1, 1, 1])
+    sampleset = ColoredAnnealingSampler(quantize=True).sample(qubo.to_bqm(), num_reads=8, seed=0, num_sweeps=50)
+    assert sampleset.info["quantization"]["kernel"] == "float32"
+    assert len(sampleset) > 0
+
+
+def test_same_seed_same_samples(random_qubo):
+    pytest.importorskip("neal")
+    bqm = random_qubo(16, seed=1).to_bqm()
+    sampler = ColoredAnnealingSampler(max_workers=4, quantize=True)
+    first = sampler.sample(bqm, num_reads=200, seed=9, num_sweeps=50)
+    second = sampler.sample(bqm, num_reads=200, seed=9, num_sweeps=50)
+    assert first.record.sample.tolist() == second.record.sample.tolist()
@@ -0,0 +1,90 @@
+import numpy as np
+import pytest
+
+import constraints
+from compiled_qubo import CompiledQubo
+from constraints import ConstraintSet
+
+LABELS = ["a", "b", "c", "d"]
+
+
+def fragment(terms, offset=0.0):
+    """CompiledQubo from `{(u, v): coeff}`, with u == v for linear terms."""
+    labels = sorted({label for pair in terms for label in pair})
+    position = {label: i for i, label in enumerate(labels)}
+    rows = np.array([position[u] for u, _ in terms], dtype=np.int32)
+    cols = np.array([position[v] for _, v in terms], dtype=np.int32)
+    return CompiledQubo(labels, rows, cols, np.array(list(terms.values()), dtype=np.float64), offset)
+
+
+def direct(terms, offset, row):
+    value = dict(zip(LABELS, row))
+    return offset + sum(coeff * value.get(u, 0) * value.get(v, 0) for (u, v), coeff in terms.items())
+
+
+DECLARED = [
+    ({("a", "a"): 1, ("b", "b"): 1, ("c", "c"): 1}, 0.0, "=", 1),
+    ({("a", "b"): 2, ("d", "d"): -1}, 0.5, "<=", 0.5),
+    ({("c", "c"): 3, ("ghost", "ghost"): 5, ("ghost", "a"): 1}, 0.0, ">=", 3),
+    ({}, 2.0, "!=", 2),
+]
+
+
+@pytest.fixture
+def constraint_set():
+    declared = [(i, fragment(terms, offset), comparison, rhs)
+                for i, (terms, offset, comparison, rhs) in enumerate(DECLARED)]
+    return ConstraintSet.build(declared, LABELS)
+
+
+def all_rows():
+    return ((np.arange(16)[:, None] >> np.arange(4)) & 1).astype(np.int8)
+
+
+def test_evaluate_matches_a_direct_sum(constraint_set):
+    rows = all_rows()
+    expected = [[direct(terms, offset, row) for terms, offset, _, _ in DECLARED] for row in rows]
+    assert np.allclose(constraint_set.evaluate(rows), expected)
+
+
+def test_evaluate_in_small_chunks(constraint_set, monkeypatch):
+    monkeypatch.setattr(constraints, "CHUNK_ELEMENTS", 3)
+    rows = all_rows()
+    expected = [[direct(terms, offset, row) for terms, offset, _, _ in DECLARED] for row in rows]
+    assert np.allclose(constraint_set.evaluate(rows), expected)
+
+
+def test_comparisons(constraint_set):
+    lhs = np.array([[1.0, 0.5, 3.0, 2.0], [2.0, 0.6, 2.9, 2.5]])
+    assert constraint_set.satisfied(constraint_set.slack(lhs)).tolist() == [
+        [True, True, True, False], [False, False, False, True]]
+    assert constraint_set.slack(lhs)[1].tolist() == pytest.approx([-1.0, -0.1, -0.1, 0.5])
+
+
+def test_violations_count_each_constraint(constraint_set):
+    rows = all_rows()
+    lhs = [[direct(terms, offset, row) for terms, offset, _, _ in DECLARED] for row in rows]
+    expected = [int(row[0] != 1) + int(row[1] > 0.5 + 1e-6) + int(row[2] < 3 - 1e-6) + 1 for row in lhs]
+    assert constraint_set.violations(rows).tolist() == expected
+
+
+def test_check_prefers_feasible_then_fewest_violations():
+    declared = [(0, fragment({("a", "a"): 1, ("b", "b"): 1}), "=", 1),
+                (1, fragment({("c", "c"): 1}), "=", 0)]
+    constraint_set = ConstraintSet.build(declared, LABELS, ignored=[2])
+    states = np.array([[1, 1, 0, 0], [1, 0, 1, 0], [0, 1, 0, 0]], dtype=np.int8)
+    best, report = constraint_set.check(states, np.array([-3.0, -2.0, -1.0]), np.array([5, 3, 2]))
+    assert best == 2
+    assert report["feasible"] and report["selected_over_lowest_energy"]
+    assert report["feasible_reads"] == 2 and report["feasible_fraction"] == 0.2
+    assert report["ignored"] == [2]
+    assert [c["satisfied"] for c in report["constraints"]] == [True, True]
+
+    best, report = constraint_set.check(states[:2], np.array([-3.0, -2.0]), np.array([1, 1]))
+    assert best == 0 and not report["feasible"] and report["violated"] == 1
+
+
+def test_round_trips_through_bytes(constraint_set):
+    restored = ConstraintSet.from_bytes(constraint_set.to_bytes())
+    assert np.array_equal(restored.evaluate(all_rows()), constraint_set.evaluate(all_rows()))
+    assert restored.size == 4
@@ -0,0 +1,95 @@
+import numpy as np
+import pytest
+
+from fragments import FragmentCache, compile_fragment, definitions, signature, split_terms
+
+
+@pytest.mark.parametrize("expression, terms", [
+    ("", []),
+    ("   ", []),
+    ("a", ["a"]),
+    ("3 * x_0 * x_1", ["3*x_0*x_1"]),
+    ("2*a - b*(c + d)", ["2*a", "-b*(c+d)"]),
+    ("-a + b", ["-a", "b"]),
+    ("+a", ["+a"]),
+    ("a * -b + c", ["a*-b", "c"]),
+    ("(a - b) ** 2 - c", ["(a-b)**2", "-c"]),
+    ("x[1] - x[2]", ["x[1]", "-x[2]"]),
+    ("1e-3 * a + 2.5E+2 * b - c", ["1e-3*a", "2.5E+2*b", "-c"]),
+    ("e - 3", ["e", "-3"]),
+    ("x_e - 1", ["x_e", "-1"]),
+])
+def test_split_terms(expression, terms):
+    assert split_terms(expression) == terms
+
+
+def test_signature_covers_arrays_and_ignores_unrelated_names():
+    defined = definitions({
+        "x": {"type": "Array", "shape": 4},
+        "g": {"type": "Array", "shape": [2, 2]},
+        "my_var": {"type": "Binary"},
+        "unused": {"type": "Binary"},
+    })
+    sig = signature("x_3 + g_0_1 * my_var", defined)
+    assert [name for name, _ in sig] == ["g", "my_var", "x"]
+    assert signature("2 * 3", defined) == ()
+
+    resized = definitions({"x": {"type": "Array", "shape": 5}, "unused": {"type": "Spin"}})
+    assert signature("x_3", resized) != signature("x_3", defined)
+    assert signature("x_3", {**defined, "unused": resized["unused"]}) == signature("x_3", defined)
+
+
+def test_cache_builds_each_fragment_once():
+    cache = FragmentCache(max_entries=2)
+    builds = []
+
+    def build(value):
+        builds.append(value)
+        return value
+
+    first = cache.get("a", lambda: build(1.0))
+    assert cache.get("a", lambda: build(2.0)) is first
+    assert builds == [1.0]
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+    cache.get("b", lambda: build(2.0))
+    cache.get("c", lambda: build(3.0))
+    assert cache.stats()["entries"] == 2
+    cache.get("a", lambda: build(4.0))
+    assert builds == [1.0, 2.0, 3.0, 4.0]
+
+
+def test_zero_size_cache_stores_nothing():
+    cache = FragmentCache(max_entries=0)
+    cache.get("a", lambda: 1)
+    cache.get("a", lambda: 1)
+    assert cache.stats()["misses"] == 2 and cache.stats()["entries"] == 0
+
+
+def test_numbers_compile_to_an_offset():
+    fragment = compile_fragment(2.5)
+    assert fragment.num_variables == 0 and fragment.offset == 2.5
+
+
+def test_editing_one_constraint_recompiles_only_it(monkeypatch):
+    pytest.importorskip("pyqubo")
+    import server
+
+    monkeypatch.setattr(server, "fragment_cache", FragmentCache())
+    model = {"variables": {"x": {"type": "Array", "shape": 6}},
+             "Objective": "x_0 + 2 * x_1 - x_2",
+             "Constraints": [{"lhs": f"x_{i} + x_{i + 1}", "comparison": "<=", "rhs": 1} for i in range(5)]}
+    whole = server.compile_model(model)
+    misses = server.fragment_cache.stats()["misses"]
+
+    model["Constraints"][2] = {"lhs": "x_2 + x_3", "comparison": "=", "rhs": 1}
+    edited = server.compile_model(model)
+    assert server.fragment_cache.stats()["misses"] - misses == 1
+    assert edited.labels == whole.labels
+
+    # The memoized model matches compiling the whole thing from scratch.
+    monkeypatch.setattr(server, "fragment_cache", FragmentCache(max_entries=0))
+    fresh = server.compile_model(model)
+    assert fresh.labels == edited.labels
+    x = np.random.default_rng(0).integers(0, 2, (32, edited.num_variables))
+    assert np.allclose(edited.energies(x), fresh.energies(x))
@@ -0,0 +1,20 @@
+import importtime_report
+
+
+def test_server_starts_within_budget(tmp_path, capsys):
+    report = tmp_path / "importtime.txt"
+    status = importtime_report.main(["--output", str(report)])
+    assert status == 0, capsys.readouterr().out
+    assert "Within budget." in report.read_text()
+
+
+def test_solver_libraries_are_not_imported_with_server():
+    imported = {name.split(".")[0] for name, *_ in importtime_report.measure_imports()}
+    assert not imported & {"pyqubo", "neal", "dimod"}
+
+
+def test_report_breaks_down_direct_imports():
+    rows = [("numpy", 1, 500, 40000), ("flask", 1, 800, 90000), ("server", 0, 2000, 132000)]
+    total_ms, report = importtime_report.build_report(rows)
+    assert total_ms == 132.0
+    assert report.index("flask") < report.index("numpy")
@@ -0,0 +1,76 @@
+import itertools
+
+import pytest
+
+from integer_encoding import (IntegerEncoding, binary_coefficients, encoded_size, integer_encodings,
+                              parse_spec)
+
+CASES = [(0, 0), (0, 1), (0, 5), (3, 10), (-4, 4), (0, 13)]
+
+
+@pytest.mark.parametrize("lower, upper", CASES)
+@pytest.mark.parametrize("encoding", ["binary", "one-hot", "domain-wall", "unary"])
+def test_valid_assignments_decode_to_exactly_the_range(lower, upper, encoding):
+    enc = IntegerEncoding("v", lower, upper, encoding)
+    decoded = set()
+    for bits in itertools.product((0, 1), repeat=enc.num_bits):
+        if enc.penalty(list(bits)) != 0:
+            continue
+        value = enc.decode(dict(zip(enc.labels, bits)))
+        # The decoder agrees with the expression the model is built from.
+        assert value == enc.value(list(bits))
+        decoded.add(value)
+    assert decoded == set(range(lower, upper + 1))
+
+
+@pytest.mark.parametrize("encoding", ["one-hot", "domain-wall"])
+def test_invalid_assignments_are_penalised(encoding):
+    enc = IntegerEncoding("v", 0, 4, encoding)
+    invalid = [0, 1, 0, 1, 0] if encoding == "one-hot" else [0, 1, 0, 0]
+    assert enc.penalty(invalid) > 0
+
+
+@pytest.mark.parametrize("span", range(0, 40))
+@pytest.mark.parametrize("max_coefficient", [None, 1, 4])
+def test_binary_coefficients_cover_the_span(span, max_coefficient):
+    coefficients = binary_coefficients(span, max_coefficient)
+    assert sum(coefficients) == span
+    if max_coefficient is not None:
+        assert max(coefficients, default=0) <= max_coefficient
+    sums = {0}
+    for c in coefficients:
+        sums |= {s + c for s in sums}
+    assert sums == set(range(span + 1))
+
+
+@pytest.mark.parametrize("lower, upper", CASES)
+@pytest.mark.parametrize("encoding", ["binary", "one-hot", "domain-wall", "unary"])
+def test_encoded_size_matches_the_encoding(lower, upper, encoding):
+    enc = IntegerEncoding("v", lower, upper, encoding)
+    assert encoded_size(upper - lower, encoding)[0] == enc.num_bits
+
+
+def test_auto_picks_domain_wall_then_binary():
+    assert IntegerEncoding("v", 0, 7).encoding == "domain-wall"
+    assert IntegerEncoding("v", 0, 100).encoding == "binary"
+    assert IntegerEncoding("v", 0, 100).num_bits == 7
+
+
+@pytest.mark.parametrize("info", [
+    {"lower": 5, "upper": 1},
+    {"lower": 0, "upper": 3, "encoding": "gray"},
+    {"lower": 0.5, "upper": 3},
+    {"lower": 0, "upper": 3, "max_coefficient": 0},
+])
+def test_bad_specs_are_rejected(info):
+    with pytest.raises(ValueError):
+        parse_spec("v", info)
+
+
+def test_integer_encodings_skips_other_types_and_bad_specs():
+    encodings = integer_encodings({
+        "a": {"type": "Integer", "lower": 0, "upper": 3},
+        "b": {"type": "Unary", "lower": 0, "upper": 3},
+        "c": {"type": "Integer", "lower": 3, "upper": 0},
+    })
+    assert list(encodings) == ["a"]
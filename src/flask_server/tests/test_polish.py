@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from aggregate import AggregatedSamples
+from compiled_qubo import CompiledQubo
+from polish import descend, polish_samples
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_polished_states_are_local_minima(random_qubo, seed):
+    qubo = random_qubo(10, density=0.4, seed=seed)
+    start = np.random.default_rng(seed).integers(0, 2, (6, 10))
+    states, energies, flips = descend(qubo, start)
+    assert np.all(energies <= qubo.energies(start) + 1e-9)
+    assert np.allclose(energies, qubo.energies(states))
+    assert np.all(flips >= (states != start).sum(axis=1))
+    for state, energy in zip(states, energies):
+        # No single flip, nor a flip of two coupled variables, lowers the energy any further.
+        n = len(state)
+        singles = np.repeat(state[None], n, axis=0)
+        singles[np.arange(n), np.arange(n)] ^= 1
+        assert qubo.energies(singles).min() >= energy - 1e-9
+        rows, cols, _ = qubo.quadratic()
+        pairs = np.repeat(state[None], len(rows), axis=0)
+        pairs[np.arange(len(rows)), rows] ^= 1
+        pairs[np.arange(len(rows)), cols] ^= 1
+        assert len(rows) == 0 or qubo.energies(pairs).min() >= energy - 1e-9
+
+
+def test_pair_flip_fixes_a_one_hot_group():
+    # (a + b - 1) ** 2 - 0.5 * b: the state a=1, b=0 is only improved by flipping both bits.
+    qubo = CompiledQubo(["a", "b"], np.array([0, 1, 0]), np.array([0, 1, 1]), np.array([-1.0, -1.5, 2.0]), 1.0)
+    states, energies, flips = descend(qubo, [[1, 0]])
+    assert states.tolist() == [[0, 1]]
+    assert energies.tolist() == [-0.5]
+    assert flips.tolist() == [2]
+
+
+def test_polish_samples_keeps_counts_and_labels(random_qubo):
+    qubo = random_qubo(8, seed=2)
+    rng = np.random.default_rng(2)
+    rows = rng.integers(0, 2, (30, 8))
+    # Samples over the same labels in another order.
+    labels = qubo.labels[::-1]
+    samples = AggregatedSamples.from_arrays(labels, rows[:, ::-1], qubo.energies(rows))
+    polished, stats = polish_samples(samples, qubo, top_k=4)
+    assert polished.labels == labels
+    assert polished.total_reads == samples.total_reads
+    assert stats["polished"] == 4
+    assert polished.energies[0] <= samples.energies[0]
+    assert np.allclose(polished.energies, qubo.energies(polished.aligned(qubo.labels)))
+
+
+def test_polishing_nothing():
+    qubo = CompiledQubo(["a"], np.array([0]), np.array([0]), np.array([1.0]), 0.0)
+    empty = AggregatedSamples.from_arrays(["a"], np.empty((0, 1), dtype=np.int8), [])
+    assert polish_samples(empty, qubo)[1] == {"polished": 0, "improved": 0, "flips": 0}
@@ -0,0 +1,91 @@
+import os
+import time
+
+import pytest
+
+import profiler as profiler_module
+from profiler import Profile, Profiler
+
+
+def busy(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def test_reasons():
+    profiler = Profiler(rate=0, allow_header=False)
+    assert profiler.reason({"profile": True}, {}) == "requested"
+    assert profiler.reason({"profile": "yes"}, {}) is None
+    assert profiler.reason({}, {"X-Quantum-Profile": "1"}) is None
+    assert Profiler(rate=0, allow_header=True).reason({}, {"X-Quantum-Profile": "1"}) == "header"
+    assert Profiler(rate=1).reason({}, {}) == "sampled"
+
+
+def test_profiles_are_rate_limited(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr(profiler_module.time, "monotonic", lambda: now[0])
+    profiler = Profiler(per_minute=2, interval=1)
+    started = [profiler.begin({"profile": True}, {}) for _ in range(3)]
+    assert [profile is not None for profile, _ in started] == [True, True, False]
+    assert profiler.describe(*started[2]) == {"reason": "requested", "rate_limited": True}
+    for profile, _ in started[:2]:
+        profile.finish()
+
+    # One token comes back every 30 seconds.
+    now[0] += 30
+    profile, _ = profiler.begin({"profile": True}, {})
+    assert profile is not None
+    profile.finish()
+    assert profiler.stats()["profiled"] == 3 and profiler.stats()["rate_limited"] == 1
+
+
+def test_profile_samples_the_request_thread():
+    profile = Profile("requested", interval=0.001)
+    with profile.stage("solve"):
+        busy(0.1)
+    record = profile.finish(model="abc")
+    assert record["samples"] > 10
+    assert record["model"] == "abc"
+    assert record["stages"]["solve"] >= 0.1
+    assert "test_profiler.py:busy" in record["collapsed"]
+    stack, count = record["collapsed"].splitlines()[0].rsplit(" ", 1)
+    assert int(count) > 0 and ";" in stack
+
+
+def test_saved_profiles_are_pruned_to_the_newest(tmp_path):
+    profiler = Profiler(directory=str(tmp_path), keep=2)
+    records = []
+    for i in range(3):
+        record = Profile("requested", interval=1).finish()
+        profiler.save(record)
+        os.utime(tmp_path / f"{record['id']}.json", (i, i))
+        records.append(record)
+    profiler.save(records[-1])
+    assert profiler.load(records[0]["id"]) is None
+    assert profiler.load(records[2]["id"])["id"] == records[2]["id"]
+    assert len(list(tmp_path.glob("*.json"))) == 2
+
+
+def test_load_rejects_bad_ids(tmp_path):
+    profiler = Profiler(directory=str(tmp_path))
+    assert profiler.load("../../etc/passwd") is None
+    assert profiler.load("0" * 32) is None
+
+
+def test_quantum_profile_round_trip(monkeypatch, tmp_path):
+    pytest.importorskip("pyqubo")
+    import server
+
+    monkeypatch.setattr(server, "profiler", Profiler(directory=str(tmp_path), interval=0.001))
+    client = server.app.test_client()
+    payload = {"variables": {"x": {"type": "Binary"}}, "Objective": "x", "Return": "x", "profile": True,
+               "num_reads": 50}
+    result = client.post("/quantum", json=payload).get_json()
+    url = result["profile"]["url"]
+    record = client.get(url).get_json()
+    assert record["reason"] == "requested"
+    assert "solve" in record["stages"]
+    collapsed = client.get(url + "?format=collapsed")
+    assert collapsed.mimetype == "text/plain" and collapsed.get_data(as_text=True) == record["collapsed"]
+    assert client.get("/profiles/" + "0" * 32).status_code == 404
@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+
+import qubo_io
+from compiled_qubo import CompiledQubo
+from constraints import ConstraintSet
+
+
+def same_energies(a, b, seed=1):
+    """True when `b` assigns every state of `a`'s labels the same energy."""
+    x = np.random.default_rng(seed).integers(0, 2, (64, a.num_variables), dtype=np.int8)
+    position = {label: i for i, label in enumerate(a.labels)}
+    y = x[:, [position[label] for label in b.labels]]
+    np.testing.assert_allclose(a.energies(x), b.energies(y))
+    return True
+
+
+@pytest.mark.parametrize("fmt", qubo_io.FORMATS)
+def test_round_trip_through_bytes(fmt, qubo):
+    loaded = qubo_io.loads(qubo_io.dumps(qubo, fmt), fmt)
+    assert sorted(loaded.labels) == sorted(qubo.labels)
+    assert loaded.offset == pytest.approx(qubo.offset)
+    assert same_energies(qubo, loaded)
+
+
+@pytest.mark.parametrize("fmt", qubo_io.FORMATS)
+@pytest.mark.parametrize("mmap", [False, True])
+def test_round_trip_through_files(tmp_path, fmt, mmap, qubo):
+    path = str(tmp_path / f"model.{fmt}")
+    qubo_io.save(qubo, path)
+    assert same_energies(qubo, qubo_io.load(path, mmap=mmap))
+
+
+def test_npz_keeps_labels_order_and_constraints(random_qubo):
+    compiled = random_qubo(5)
+    lhs = CompiledQubo(compiled.labels, np.arange(5), np.arange(5), np.ones(5))
+    compiled.constraints = ConstraintSet.build([(0, lhs, "<=", 2)], compiled.labels)
+    loaded = qubo_io.loads(qubo_io.dumps(compiled, "npz"), "npz")
+    assert loaded.labels == compiled.labels
+    x = np.array([[1, 1, 0, 0, 0], [1, 1, 1, 0, 0]], dtype=np.int8)
+    np.testing.assert_array_equal(loaded.constraints.violations(x), [0, 1])
+
+
+def test_qubo_text_without_labels_gets_integer_labels():
+    text = "c a plain qbsolv file\np qubo 0 2 2 1\n0 0 1.0\n1 1 -1.0\n0 1 2.5\n"
+    loaded = qubo_io.loads(text.encode("utf-8"), "qubo")
+    assert loaded.labels == [0, 1]
+    np.testing.assert_allclose(loaded.energies(np.array([[1, 1]])), [2.5])
+
+
+def test_unknown_format_is_rejected():
+    with pytest.raises(ValueError):
+        qubo_io.file_format("model.txt")
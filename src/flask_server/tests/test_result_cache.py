@@ -0,0 +1,61 @@
+import result_cache
+from result_cache import ResultCache
+
+
+def test_hit_and_miss():
+    cache = ResultCache(max_entries=4, ttl=60)
+    assert cache.get("a") is None
+    cache.put("a", {"energy": 1.0})
+    assert cache.get("a") == {"energy": 1.0}
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(result_cache.time, "monotonic", lambda: now[0])
+    cache = ResultCache(max_entries=4, ttl=10)
+    cache.put("a", 1)
+    now[0] += 9.9
+    assert cache.get("a") == 1
+    now[0] += 0.2
+    assert cache.get("a") is None
+    assert cache.stats()["expired"] == 1
+    assert cache.stats()["entries"] == 0
+
+
+def test_put_refreshes_ttl(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr(result_cache.time, "monotonic", lambda: now[0])
+    cache = ResultCache(max_entries=4, ttl=10)
+    cache.put("a", 1)
+    now[0] = 8
+    cache.put("a", 2)
+    now[0] = 15
+    assert cache.get("a") == 2
+
+
+def test_least_recently_used_is_evicted():
+    cache = ResultCache(max_entries=2, ttl=60)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_zero_size_disables_cache():
+    cache = ResultCache(max_entries=0, ttl=60)
+    assert not cache.enabled
+    cache.put("a", 1)
+    assert cache.get("a") is None
+
+
+def test_only_seeded_requests_are_cached_by_default():
+    assert ResultCache(max_entries=4).caches(7)
+    assert not ResultCache(max_entries=4).caches(None)
+    assert ResultCache(max_entries=4, unseeded=True).caches(None)
+    assert not ResultCache(max_entries=0).caches(7)
@@ -0,0 +1,25 @@
+import pytest
+
+pytest.importorskip("neal")
+
+from sampling import sample_compiled  # noqa: E402
+from scheduler import SolveScheduler  # noqa: E402
+
+
+@pytest.mark.parametrize("per_read", [None, 1e-3, 3e-3])
+def test_seeded_samples_do_not_depend_on_the_calibration(qubo, per_read):
+    scheduler = SolveScheduler(slots=1)
+    ticket = scheduler.ticket("normal", "a")
+    unsliced, _, _ = sample_compiled(qubo, num_reads=120, seed=7)
+    sliced, _, _ = sample_compiled(qubo, num_reads=120, seed=7, ticket=ticket, per_read=per_read,
+                                   scheduler=scheduler)
+    assert sliced.summary() == unsliced.summary()
+    assert scheduler.stats()["classes"]["normal"]["granted"] == 1
+
+
+def test_unseeded_solves_are_sliced(qubo):
+    scheduler = SolveScheduler(slots=1)
+    samples, _, _ = sample_compiled(qubo, num_reads=120, ticket=scheduler.ticket("normal", "a"),
+                                    per_read=0.01, scheduler=scheduler)
+    assert int(samples.counts.sum()) == 120
+    assert scheduler.stats()["classes"]["normal"]["granted"] == 12
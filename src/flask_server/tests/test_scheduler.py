@@ -0,0 +1,80 @@
+import threading
+import time
+
+import pytest
+
+import scheduler as scheduler_module
+from scheduler import MIN_SLICE_READS, SolveScheduler
+
+
+def grant_order(scheduler, units):
+    """Queue `(name, ticket, cost)` units behind a held slot, then return the order they ran in."""
+    order = []
+    holder = scheduler.ticket("normal", "holder")
+    with scheduler.slot(holder, 1.0):
+        threads = []
+        for name, ticket, cost in units:
+            def run(name=name, ticket=ticket, cost=cost):
+                with scheduler.slot(ticket, cost):
+                    order.append(name)
+
+            thread = threading.Thread(target=run)
+            thread.start()
+            threads.append(thread)
+            # Enqueue one at a time, so ties are broken in submission order.
+            while scheduler.stats()["queued"] < len(threads):
+                time.sleep(0.001)
+    for thread in threads:
+        thread.join()
+    return order
+
+
+def test_tenants_share_a_class_fairly():
+    scheduler = SolveScheduler(slots=1)
+    a, b = scheduler.ticket("normal", "a"), scheduler.ticket("normal", "b")
+    units = [(f"a{i}", a, 1.0) for i in range(6)] + [(f"b{i}", b, 1.0) for i in range(2)]
+    assert grant_order(scheduler, units) == ["a0", "b0", "a1", "b1", "a2", "a3", "a4", "a5"]
+
+
+def test_interactive_work_overtakes_batch_work():
+    scheduler = SolveScheduler(slots=1)
+    batch, interactive = scheduler.ticket("batch", "grader"), scheduler.ticket("interactive", "player")
+    units = [(f"batch{i}", batch, 1.0) for i in range(3)] + [("move", interactive, 1.0)]
+    assert grant_order(scheduler, units)[0] == "move"
+
+
+def test_cheap_units_go_before_expensive_ones_of_another_tenant():
+    scheduler = SolveScheduler(slots=1)
+    big, small = scheduler.ticket("normal", "big"), scheduler.ticket("normal", "small")
+    units = [("big", big, 10.0)] + [(f"small{i}", small, 1.0) for i in range(3)]
+    assert grant_order(scheduler, units) == ["small0", "small1", "small2", "big"]
+
+
+def test_free_slots_are_granted_without_queueing():
+    scheduler = SolveScheduler(slots=2)
+    ticket = scheduler.ticket("normal", "a")
+    with scheduler.slot(ticket), scheduler.slot(ticket):
+        assert scheduler.stats()["busy"] == 2
+    stats = scheduler.stats()
+    assert stats["busy"] == 0 and stats["classes"]["normal"]["granted"] == 2
+
+
+def test_work_without_a_ticket_is_not_scheduled():
+    scheduler = SolveScheduler(slots=1)
+    with scheduler.slot(None):
+        assert scheduler.stats()["busy"] == 0
+
+
+def test_unknown_priority_is_rejected():
+    with pytest.raises(ValueError):
+        SolveScheduler().ticket("urgent")
+
+
+def test_slice_reads(monkeypatch):
+    monkeypatch.setattr(scheduler_module, "SLICE_SECONDS", 0.1)
+    scheduler = SolveScheduler()
+    assert scheduler.slice_reads(1000, None) == [1000]
+    assert scheduler.slice_reads(1000, 1e-3) == [100] * 10
+    assert scheduler.slice_reads(250, 1e-3) == [100, 100, 50]
+    # Slow reads still go in batches of at least MIN_SLICE_READS.
+    assert scheduler.slice_reads(25, 1.0) == [MIN_SLICE_READS, MIN_SLICE_READS, 5]
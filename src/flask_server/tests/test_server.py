@@ -0,0 +1,235 @@
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("pyqubo")
+pytest.importorskip("neal")
+
+import backends  # noqa: E402
+import server  # noqa: E402
+from admission import AdmissionController  # noqa: E402
+from result_cache import ResultCache  # noqa: E402
+from sessions import SessionStore  # noqa: E402
+from singleflight import SingleFlight  # noqa: E402
+
+
+def line(n, rhs=1, **options):
+    return {"variables": {"x": {"type": "Array", "shape": n}}, "symmetry": "none",
+            "Objective": " + ".join(f"{(i % 5) - 2} * x_{i}" for i in range(n)),
+            "Constraints": [{"lhs": " + ".join(f"x_{i}" for i in range(n)), "comparison": "=", "rhs": rhs}],
+            "Return": "x_0", "num_reads": 50, **options}
+
+
+def grid(**options):
+    cells = [f"q_{i}_{j}" for i in range(3) for j in range(3)]
+    return {"variables": {"q": {"type": "Array", "shape": [3, 3]}},
+            "Objective": " + ".join(f"{k} * {cell}" for k, cell in enumerate(cells)),
+            "Constraints": [{"lhs": " + ".join(cells), "comparison": "=", "rhs": 1}],
+            "Return": "q_0_0", "num_reads": 20, "seed": 1, **options}
+
+
+@pytest.fixture
+def client(monkeypatch, tmp_path):
+    monkeypatch.setattr(server, "admission", AdmissionController())
+    monkeypatch.setattr(server, "result_cache", ResultCache())
+    monkeypatch.setattr(server, "solve_flight", SingleFlight())
+    monkeypatch.setattr(server, "sessions", SessionStore(str(tmp_path / "sessions")))
+    return server.app.test_client()
+
+
+def test_identical_burst_is_charged_once(client):
+    payload = line(100, seed=5)
+    barrier = threading.Barrier(12)
+    statuses = []
+
+    def post():
+        local = server.app.test_client()
+        barrier.wait()
+        statuses.append(local.post("/quantum", json=payload).status_code)
+
+    threads = [threading.Thread(target=post) for _ in range(12)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert statuses == [200] * 12
+    stats = server.admission.stats()
+    assert stats["admitted"] == 1
+    assert stats["shared"] == 11
+    assert stats["inflight_seconds"] == 0
+
+
+def test_cached_result_skips_the_busy_check(client):
+    assert client.post("/quantum", json=line(10, seed=1)).status_code == 200
+    server.admission.inflight_seconds = server.admission.inflight_budget * 10
+    cached = client.post("/quantum", json=line(10, seed=1))
+    assert cached.status_code == 200 and cached.get_json()["cached"]
+    busy = client.post("/quantum", json=line(10, seed=2))
+    assert busy.status_code == 429 and busy.headers["Retry-After"] == "1"
+
+
+def test_mirror_image_is_served_from_the_canonical_solve(client):
+    first = client.post("/quantum", json=grid()).get_json()
+    cells = [f"q_{i}_{2 - j}" for i in range(3) for j in range(3)]
+    mirrored = grid(Objective=" + ".join(f"{k} * {cell}" for k, cell in enumerate(cells)))
+    second = client.post("/quantum", json=mirrored).get_json()
+    assert second["cached"]
+    assert second["energy"] == first["energy"]
+    assert second["sample"]["q_0_2"] == 1
+
+
+def test_oversized_session_is_rejected_before_compiling(client, monkeypatch):
+    monkeypatch.setattr(server, "admission", AdmissionController(max_variables=50))
+    entries = server.qubo_cache.stats()["entries"]
+    response = client.post("/session", json=line(60))
+    assert response.status_code == 413
+    assert server.qubo_cache.stats()["entries"] == entries
+
+
+def test_session_turn_with_every_variable_fixed(client):
+    session = client.post("/session", json=grid()).get_json()
+    fixed = {f"q_{i}_{j}": int((i, j) == (1, 1)) for i in range(3) for j in range(3)}
+    turn = client.post(f"/session/{session['session']}/turn", json={"fixed": fixed})
+    assert turn.status_code == 200
+    result = turn.get_json()
+    assert result["turn"] == 2
+    assert result["energy"] == 4.0
+    assert result["sample"] == fixed
+    assert result["feasibility"]["feasible"]
+
+
+def test_rejected_turn_leaves_the_session_unchanged(client):
+    session_id = client.post("/session", json=grid()).get_json()["session"]
+    server.admission.inflight_seconds = server.admission.inflight_budget * 10
+    turn = client.post(f"/session/{session_id}/turn", json={"weights": {"q_0_0": 50.0}, "fixed": {"q_1_1": 1}})
+    assert turn.status_code == 429
+    state = server.sessions.load(session_id)
+    assert (state["turn"], state["weights"], state["fixed"]) == (1, {}, {})
+
+
+def test_invalid_turn_is_a_400(client):
+    session_id = client.post("/session", json=grid()).get_json()["session"]
+    assert client.post(f"/session/{session_id}/turn", json={"fixed": {"q_0_0": 2}}).status_code == 400
+    assert client.post(f"/session/{session_id}/turn", json={"weights": {"nope": 1}}).status_code == 400
+    assert client.post("/session/0123/turn", json={}).status_code == 404
+
+
+@pytest.mark.parametrize("assignments, label", [
+    ([{"x_0": 1, "x_1": 0.6}], "x_1"),
+    ([{"x_0": 1.5}], "x_0"),
+    ([{"x_2": "1"}], "x_2"),
+    ([{"x_0": True}], "x_0"),
+    ({"labels": ["x_0", "x_1"], "rows": [[1, 0], [0, 2]]}, "x_1"),
+    ({"labels": ["x_0", "x_1"], "rows": [[0.0, 1]]}, "x_0"),
+])
+def test_evaluate_rejects_non_bits(client, assignments, label):
+    response = client.post("/quantum/evaluate", json={**line(4), "assignments": assignments})
+    assert response.status_code == 400
+    assert f"'{label}'" in response.get_json()["error"]
+
+
+def test_evaluate_accepts_every_form(client):
+    rows = [[1, 0, 0, 0], [0, 1, 1, 0]]
+    labels = ["x_0", "x_1", "x_2", "x_3"]
+    forms = [
+        [dict(zip(labels, row)) for row in rows],
+        {"labels": labels, "rows": rows},
+        {"labels": labels, "count": 2, "packed": "gGA="},
+    ]
+    results = [client.post("/quantum/evaluate", json={**line(4), "assignments": form}).get_json() for form in forms]
+    assert results[0]["energies"] == results[1]["energies"] == results[2]["energies"]
+    assert results[0]["feasible"] == [True, False]
+    assert client.post("/quantum/evaluate", json={**line(4), "assignments": {"labels": labels, "rows": [[1]]}}).status_code == 400
+
+
+def test_event_streams_are_capped_per_worker(client):
+    server.sessions.max_streams = 1
+    session_id = client.post("/session", json=grid()).get_json()["session"]
+    first = client.get(f"/session/{session_id}/events", buffered=False)
+    assert first.status_code == 200
+    assert next(first.response) == b"retry: 1000\n\n"
+    busy = client.get(f"/session/{session_id}/events")
+    assert busy.status_code == 503 and busy.headers["Retry-After"] == "5"
+    first.close()
+    assert server.sessions.stats()["streams"] == 0
+    again = client.get(f"/session/{session_id}/events", buffered=False)
+    assert again.status_code == 200
+    again.close()
+
+
+@pytest.mark.parametrize("solver", ["colored", "quantized"])
+def test_colored_solves_are_not_sliced(client, monkeypatch, solver):
+    sizes = []
+    sampler = backends.get_backend(solver)
+    original = sampler.sample
+
+    def sample(bqm, **params):
+        sizes.append(params["num_reads"])
+        return original(bqm, **params)
+
+    monkeypatch.setattr(sampler, "sample", sample)
+    assert client.post("/quantum", json=line(12, solver=solver, num_reads=1000)).status_code == 200
+    assert sizes == [1000]
+
+
+def test_broker_solves_feed_the_calibration(client, monkeypatch, tmp_path):
+    from broker import SqliteBroker
+    from solver_worker import SolverWorker
+
+    queue = SqliteBroker(str(tmp_path / "queue.db"))
+    monkeypatch.setattr(server, "broker", queue)
+    worker = SolverWorker(queue)
+    stop = threading.Event()
+    observed = []
+    monkeypatch.setattr(server.admission.calibration, "observe",
+                        lambda estimate, num_reads, compile_seconds, sample_seconds, rss: observed.append(sample_seconds))
+
+    def work():
+        while not stop.is_set():
+            if not worker.run_one():
+                time.sleep(0.01)
+
+    thread = threading.Thread(target=work, daemon=True)
+    thread.start()
+    try:
+        for payload in (line(60, seed=3), grid(Objective="q_0_0 + 2 * q_1_1")):
+            response = client.post("/quantum", json=payload)
+            assert response.status_code == 200
+            assert "worker_timings" not in response.get_json()
+    finally:
+        stop.set()
+        thread.join()
+    assert len(observed) == 2 and all(seconds > 0 for seconds in observed)
+    assert server.admission.stats()["inflight_seconds"] == 0
+
+
+def test_unseeded_requests_are_solved_afresh(client):
+    payload = line(10)
+    first = client.post("/quantum", json=payload).get_json()
+    second = client.post("/quantum", json=payload).get_json()
+    assert not first["cached"] and not second["cached"]
+    assert server.result_cache.stats()["entries"] == 0
+
+
+def test_top_k_returns_distinct_solutions(client):
+    payload = {"variables": {"x": {"type": "Array", "shape": 8}}, "symmetry": "none",
+               # Its ground states are the path's largest independent sets, several of them.
+               "Objective": " + ".join([f"-1 * x_{i}" for i in range(8)] + [f"2 * x_{i} * x_{i + 1}" for i in range(7)]),
+               "Return": "x_0",
+               "num_reads": 200, "seed": 4, "top_k": 5, "min_distance": 2}
+    result = client.post("/quantum", json=payload).get_json()
+    solutions = result["solutions"]
+    assert len(solutions) == 5
+    assert solutions[0]["sample"] == result["sample"] and solutions[0]["distance"] is None
+    rows = [[solution["sample"][f"x_{i}"] for i in range(8)] for solution in solutions]
+    for j, row in enumerate(rows):
+        nearest = min((sum(a != b for a, b in zip(row, other)) for other in rows[:j]), default=None)
+        assert nearest == solutions[j]["distance"]
+        assert j == 0 or nearest >= 2
+    assert [solution["energy"] for solution in solutions] == sorted(solution["energy"] for solution in solutions)
+    assert all("return" in solution for solution in solutions)
+
+    single = client.post("/quantum", json={**payload, "top_k": 1}).get_json()
+    assert not single["cached"] and single["solutions"] is None
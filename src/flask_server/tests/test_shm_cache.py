@@ -0,0 +1,112 @@
+import os
+
+import numpy as np
+import pytest
+
+from compiled_qubo import CompiledQubo
+from shm_cache import SharedQuboCache
+
+
+def chain(n):
+    return CompiledQubo([f"x{i}" for i in range(n)], np.arange(n), np.arange(n), np.ones(n), 0.5)
+
+
+def entry_size(n):
+    cache = SharedQuboCache(max_bytes=1 << 20, slots=1)
+    try:
+        cache.put("probe", chain(n)).release()
+        return cache.stats()["bytes"]
+    finally:
+        cache.close()
+
+
+@pytest.fixture
+def cache():
+    # Room for exactly three 50-variable models.
+    cache = SharedQuboCache(max_bytes=3 * entry_size(50), slots=8)
+    yield cache
+    cache.close()
+
+
+def in_child(fn):
+    """Run `fn` in a forked process (as a serve.py worker would) and return its exit status."""
+    pid = os.fork()
+    if pid == 0:
+        try:
+            fn()
+        finally:
+            os._exit(0)
+    return os.waitpid(pid, 0)[1]
+
+
+def test_round_trip(cache):
+    original = chain(50)
+    with cache.put("a", original) as stored:
+        assert stored.labels == original.labels
+        assert stored.offset == original.offset
+        np.testing.assert_array_equal(stored.coeffs, original.coeffs)
+    with cache.get("a") as fetched:
+        np.testing.assert_array_equal(fetched.rows, original.rows)
+    assert cache.get("missing") is None
+    assert cache.stats()["hits"] == 1
+
+
+def test_least_recently_used_entry_is_evicted(cache):
+    for key in "abc":
+        cache.put(key, chain(50)).release()
+    cache.get("a").release()
+    cache.put("d", chain(50)).release()
+    assert cache.get("b") is None
+    for key in "acd":
+        cache.get(key).release()
+
+
+def test_entries_in_use_are_never_evicted(cache):
+    held = [cache.put(key, chain(50)) for key in "abc"]
+    overflow = chain(50)
+    assert cache.put("d", overflow) is overflow
+    assert cache.stats()["in_use"] == 3
+    for model in held:
+        model.release()
+    assert cache.stats()["in_use"] == 0
+    cache.put("d", chain(50)).release()
+    assert cache.stats()["entries"] == 3
+
+
+def test_references_are_counted_per_holder(cache):
+    first = cache.put("a", chain(50))
+    second = cache.get("a")
+    first.release()
+    assert cache.stats()["in_use"] == 1
+    second.release()
+    assert cache.stats()["in_use"] == 0
+
+
+def test_dead_workers_references_are_reclaimed(cache):
+    cache.put("a", chain(50)).release()
+    # The child checks the model out and exits without releasing it.
+    assert in_child(lambda: cache.get("a")) == 0
+    assert cache.stats()["in_use"] == 0
+    for key in "bcd":
+        cache.put(key, chain(50)).release()
+    assert cache.get("a") is None
+
+
+def test_stale_mappings_are_dropped_on_lookup(cache):
+    cache.put("a", chain(50)).release()
+    assert len(cache._local) == 1
+
+    def evict_everything():
+        for key in "bcd":
+            cache.put(key, chain(50)).release()
+
+    # Another worker evicts "a"; this process drops its mapping on its next lookup.
+    assert in_child(evict_everything) == 0
+    assert cache.get("zzz") is None
+    assert cache._local == {}
+
+
+def test_oversized_model_is_not_cached(cache):
+    big = chain(1000)
+    assert cache.put("big", big) is big
+    assert cache.stats()["entries"] == 0
@@ -0,0 +1,95 @@
+import threading
+import time
+
+import pytest
+
+from singleflight import SingleFlight
+
+
+def run_together(flight, key, fn, count, release):
+    """Call `flight.do(key, fn)` from `count` threads, setting `release` once all have attached."""
+    results, errors = [], []
+
+    def call():
+        try:
+            results.append(flight.do(key, fn))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=call) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    deadline = time.monotonic() + 5
+    while flight.stats()["waiting"] < count - 1 and time.monotonic() < deadline:
+        time.sleep(0.001)
+    release.set()
+    for thread in threads:
+        thread.join()
+    return results, errors
+
+
+def blocking(release, value=None, error=None):
+    calls = []
+
+    def fn():
+        calls.append(1)
+        release.wait()
+        if error is not None:
+            raise error
+        return value
+
+    return fn, calls
+
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight()
+    release = threading.Event()
+    fn, calls = blocking(release, {"energy": -1.0})
+    results, errors = run_together(flight, "k", fn, 8, release)
+    assert not errors
+    assert len(calls) == 1
+    assert sorted(shared for _, shared in results) == [False] + [True] * 7
+    assert all(result is results[0][0] for result, _ in results)
+    stats = flight.stats()
+    assert (stats["executed"], stats["coalesced"], stats["in_flight"]) == (1, 7, 0)
+
+
+def test_errors_are_shared_too():
+    flight = SingleFlight()
+    release = threading.Event()
+    fn, calls = blocking(release, error=RuntimeError("solver crashed"))
+    results, errors = run_together(flight, "k", fn, 4, release)
+    assert not results and len(calls) == 1
+    assert len(errors) == 4 and all(str(e) == "solver crashed" for e in errors)
+
+
+def test_finished_calls_are_not_reused():
+    flight = SingleFlight()
+    assert flight.do("k", lambda: 1) == (1, False)
+    assert flight.do("k", lambda: 2) == (2, False)
+    with pytest.raises(ValueError):
+        flight.do("k", lambda: int("x"))
+    assert flight.do("k", lambda: 3) == (3, False)
+
+
+def test_different_keys_run_separately():
+    flight = SingleFlight()
+    release = threading.Event()
+    started = []
+
+    def fn(key):
+        started.append(key)
+        release.wait()
+        return key
+
+    threads = [threading.Thread(target=flight.do, args=(key, lambda key=key: fn(key))) for key in "ab"]
+    for thread in threads:
+        thread.start()
+    deadline = time.monotonic() + 5
+    while len(started) < 2 and time.monotonic() < deadline:
+        time.sleep(0.001)
+    assert sorted(started) == ["a", "b"]
+    assert flight.stats()["in_flight"] == 2
+    release.set()
+    for thread in threads:
+        thread.join()
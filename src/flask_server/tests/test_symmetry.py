@@ -0,0 +1,91 @@
+import numpy as np
+import pytest
+
+from compiled_qubo import CompiledQubo
+from constraints import ConstraintSet
+from symmetry import Canonical, canonicalize, certificate, grid_transforms
+
+
+def board(weights, rows=3, cols=3):
+    """A grid model with the given per-cell linear weights and a one-hot constraint."""
+    labels = [f"q_{i}_{j}" for i in range(rows) for j in range(cols)]
+    n = len(labels)
+    index = np.arange(n)
+    compiled = CompiledQubo(labels, index, index, np.asarray(weights, dtype=np.float64), 2.0)
+    lhs = CompiledQubo(labels, index, index, np.ones(n))
+    compiled.constraints = ConstraintSet.build([(0, lhs, "=", 1)], labels)
+    return compiled
+
+
+def mirrored(weights, rows=3, cols=3):
+    return np.asarray(weights).reshape(rows, cols)[:, ::-1].ravel()
+
+
+VARIABLES = {"q": {"type": "Array", "shape": [3, 3]}}
+
+
+@pytest.mark.parametrize("variables, mode, count", [
+    (VARIABLES, "auto", 8),
+    ({"q": {"type": "Array", "shape": [2, 3]}}, "auto", 4),
+    (VARIABLES, "mirror", 2),
+    (VARIABLES, "none", 0),
+    ({"x": {"type": "Binary"}}, "auto", 0),
+    ({"row": {"type": "Array", "shape": 4}}, "auto", 2),
+])
+def test_group_sizes(variables, mode, count):
+    assert len(grid_transforms(variables, mode)) == count
+
+
+def test_transforms_are_permutations():
+    for mapping in grid_transforms(VARIABLES):
+        assert sorted(mapping) == sorted(mapping.values())
+
+
+def test_certificate_ignores_term_order():
+    compiled = board(range(9))
+    shuffled = np.random.default_rng(0).permutation(9)
+    reordered = CompiledQubo(compiled.labels, compiled.rows[shuffled], compiled.cols[shuffled],
+                             compiled.coeffs[shuffled], compiled.offset, compiled.constraints)
+    assert certificate(compiled, compiled.labels) == certificate(reordered, reordered.labels)
+    assert certificate(compiled, compiled.labels) != certificate(board(range(1, 10)), compiled.labels)
+
+
+def test_mirror_images_share_a_canonical_key():
+    weights = [5, 1, 3, 0, 2, 7, 4, 4, 6]
+    transforms = grid_transforms(VARIABLES)
+    left = canonicalize(board(weights), transforms)
+    right = canonicalize(board(mirrored(weights)), transforms)
+    assert left.key == right.key
+    assert canonicalize(board([0] * 8 + [1]), transforms).key != left.key
+
+
+def test_restore_maps_samples_back():
+    weights = [5, 1, 3, 0, 2, 7, 4, 4, 6]
+    original = board(mirrored(weights))
+    canonical = canonicalize(original, grid_transforms(VARIABLES))
+    solved = canonical.compiled
+
+    # Best state of the canonical model: its cheapest single cell.
+    x = np.eye(9, dtype=np.int8)
+    energies = solved.energies(x)
+    best_row = x[int(np.argmin(energies))]
+    sample = dict(zip(solved.labels, best_row.tolist()))
+    best = {"sample": sample, "energy": float(energies.min()),
+            "distribution": {"top": [{"sample": sample}]},
+            "solutions": [{"sample": sample}],
+            "feasibility": {"feasible": False, "violated": 1, "constraints": []}}
+
+    restored = canonical.restore(best)
+    x = np.array([[restored["sample"][label] for label in original.labels]])
+    assert original.energies(x)[0] == pytest.approx(best["energy"])
+    assert original.energies(x)[0] == pytest.approx(original.energies(np.eye(9)).min())
+    assert restored["distribution"]["top"][0]["sample"] == restored["sample"]
+    assert restored["solutions"][0]["sample"] == restored["sample"]
+    assert restored["feasibility"]["feasible"] and restored["feasibility"]["violated"] == 0
+
+
+def test_canonical_copy_is_independent():
+    original = board(range(9))
+    canonical = Canonical(original, {}, "key")
+    canonical.compiled.coeffs[0] = 100.0
+    assert original.coeffs[0] == 0.0
@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+
+from tabu_solver import TabuSampler, default_tenure, tabu_search
+
+
+def reference_search(qubo, initial, rng, tenure, max_iter):
+    """tabu_search for one restart, recomputing every flip's energy change from scratch."""
+    x = np.array(initial, dtype=np.int8)
+    n = len(x)
+    energy = float(qubo.energies(x[None])[0])
+    best, best_energy = x.copy(), energy
+    tabu_until = np.zeros(n, dtype=np.int64)
+    for step in range(max_iter):
+        flipped = np.repeat(x[None], n, axis=0)
+        flipped[np.arange(n), np.arange(n)] ^= 1
+        delta = qubo.energies(flipped) - energy
+        allowed = (tabu_until <= step) | (energy + delta < best_energy)
+        scores = np.where(allowed, delta, np.inf) + rng.random((1, n))[0] * 1e-9
+        k = int(np.argmin(scores))
+        x[k] ^= 1
+        energy += delta[k]
+        tabu_until[k] = step + 1 + tenure
+        if energy < best_energy - 1e-9:
+            best, best_energy = x.copy(), energy
+    return best
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_incremental_deltas_match_a_full_recompute(random_qubo, seed):
+    qubo = random_qubo(12, seed=seed)
+    initial = np.random.default_rng(seed).integers(0, 2, (1, 12))
+    states, energies = tabu_search(qubo, initial, np.random.default_rng(7), tenure=3, max_iter=60, stall=10 ** 6)
+    expected = reference_search(qubo, initial[0], np.random.default_rng(7), tenure=3, max_iter=60)
+    assert states[0].tolist() == expected.tolist()
+    assert energies[0] == pytest.approx(qubo.energies(expected[None])[0])
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_restarts_reach_the_brute_force_optimum(random_qubo, brute_force, seed):
+    qubo = random_qubo(12, density=0.6, seed=seed)
+    optimum, _ = brute_force(qubo)
+    initial = np.random.default_rng(seed).integers(0, 2, (16, 12))
+    states, energies = tabu_search(qubo, initial, np.random.default_rng(seed))
+    assert energies.min() == pytest.approx(optimum)
+    assert np.allclose(energies, qubo.energies(states))
+
+
+def test_restarts_never_end_worse_than_they_start(random_qubo):
+    qubo = random_qubo(20, seed=3)
+    initial = np.random.default_rng(3).integers(0, 2, (8, 20))
+    _, energies = tabu_search(qubo, initial, np.random.default_rng(0), max_iter=5)
+    assert np.all(energies <= qubo.energies(initial) + 1e-9)
+
+
+def test_empty_model_returns_its_offset(random_qubo):
+    qubo = random_qubo(0)
+    states, energies = tabu_search(qubo, np.zeros((3, 0)), np.random.default_rng(0))
+    assert states.shape == (3, 0)
+    assert energies.tolist() == [qubo.offset] * 3
+
+
+def test_default_tenure_is_bounded():
+    assert default_tenure(2) == 1
+    assert default_tenure(40) == 10
+    assert default_tenure(1000) == 20
+
+
+def test_sampler_returns_one_read_per_restart(random_qubo, brute_force):
+    dimod = pytest.importorskip("dimod")
+    qubo = random_qubo(10, seed=1)
+    sampleset = TabuSampler().sample(qubo.to_bqm(), num_reads=70, seed=5)
+    assert sampleset.record.num_occurrences.sum() == 70
+    assert sampleset.first.energy == pytest.approx(brute_force(qubo)[0])
+
+    spin = qubo.to_bqm().change_vartype(dimod.SPIN, inplace=False)
+    assert set(np.unique(TabuSampler().sample(spin, num_reads=4, seed=5).record.sample)) <= {-1, 1}
@@ -1,5 +1,5 @@
-import React, { useState, useEffect } from 'react';
-import axios from 'axios';
+import React, { useState, useEffect, useRef } from 'react';
+import { QuantumSession } from './quantumSession';
 import './Connect4.css';
 
 const Connect4 = ({ quboCode, log }) => {
@@ -19,6 +19,13 @@ const Connect4 = ({ quboCode, log }) => {
   const [modeSelection, setModeSelection] = useState(true); 
   const [processingMove, setProcessingMove] = useState(false);
   const [quantumError, setQuantumError] = useState(null);
+  const quantumSession = useRef(null);
+  if (quantumSession.current === null) {
+    quantumSession.current = new QuantumSession();
+  }
+
+  // Release the server-side session when the game is closed
+  useEffect(() => () => quantumSession.current.close(), []);
 
   const MAX_WINS_DISPLAY = 3; 
   const MOVE_DELAY = 1000; 
@@ -57,11 +64,9 @@ const Connect4 = ({ quboCode, log }) => {
         throw new Error("QUBO model has empty variables object");
       }
       
-      // Add timeout to prevent hanging
-      const response = await axios.post('http://localhost:8000/quantum', qubo, {
-        headers: {
-          'Content-Type': 'application/json'
-        },
+      // One session per game: the model is uploaded once and later moves only
+      // send changed weights. Add timeout to prevent hanging.
+      const response = await quantumSession.current.solve(qubo, {
         timeout: 5000 // 5 seconds timeout
       });
       
@@ -435,15 +435,17 @@ javascriptGenerator.forBlock['pyqubo_power'] = function(block) {
 };
 
 // Generator for integer variables
+// "auto" lets the server pick a compact encoding (domain-wall for small ranges, binary beyond).
 javascriptGenerator.forBlock['pyqubo_integer_variable'] = function(block) {
   const name = block.getFieldValue('NAME');
   const lower = block.getFieldValue('LOWER');
   const upper = block.getFieldValue('UPPER');
   
   return `variables["${name}"] = { 
-    "type": "Unary", 
+    "type": "Integer", 
     "lower": ${lower}, 
-    "upper": ${upper} 
+    "upper": ${upper}, 
+    "encoding": "auto" 
   };\n`;
 };
 
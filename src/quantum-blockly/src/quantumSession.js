@@ -0,0 +1,138 @@
+import axios from 'axios';
+
+const SERVER_URL = 'http://localhost:8000';
+
+// Matches one term of a linear objective: "3 * x", "-2.5*q_0_1", "x" or "- x".
+const LINEAR_TERM = /^([+-]?)\s*(?:(\d+(?:\.\d*)?(?:[eE][+-]?\d+)?)\s*\*\s*)?([A-Za-z_][\w[\]]*)$/;
+
+// Per-label weights of an objective that is a plain sum of `weight * variable`
+// terms, or null when it is anything more (products, brackets, constants).
+export const linearWeights = (objective) => {
+  if (typeof objective !== 'string') {
+    return null;
+  }
+  const weights = {};
+  const terms = objective.replace(/\s+/g, ' ').trim().split(/\s*(?=[+-](?![^(]*\)))/);
+  for (const term of terms) {
+    const match = term.trim().match(LINEAR_TERM);
+    if (!match) {
+      return null;
+    }
+    const [, sign, coefficient, label] = match;
+    const weight = (sign === '-' ? -1 : 1) * (coefficient === undefined ? 1 : parseFloat(coefficient));
+    weights[label] = (weights[label] || 0) + weight;
+  }
+  return weights;
+};
+
+// Labels a session turn can re-weight: Binary variables and Binary array elements.
+export const binaryLabels = (variables) => {
+  const labels = new Set();
+  Object.entries(variables || {}).forEach(([name, info]) => {
+    if (info.type === 'Binary') {
+      labels.add(name);
+    } else if (info.type === 'Array' && (info.vartype || 'Binary').toLowerCase() !== 'spin') {
+      if (Array.isArray(info.shape)) {
+        for (let i = 0; i < info.shape[0]; i++) {
+          for (let j = 0; j < info.shape[1]; j++) {
+            labels.add(`${name}_${i}_${j}`);
+          }
+        }
+      } else {
+        for (let i = 0; i < info.shape; i++) {
+          labels.add(`${name}_${i}`);
+        }
+      }
+    }
+  });
+  return labels;
+};
+
+// Everything except the objective's weights; a change here starts a new session.
+const modelStructure = (qubo) => {
+  const { Objective, ...rest } = qubo;
+  return JSON.stringify(rest);
+};
+
+// Text bodies are "simple" CORS requests, so turns skip the preflight.
+const postText = (url, body, timeout) =>
+  axios.post(url, JSON.stringify(body), { headers: { 'Content-Type': 'text/plain' }, timeout });
+
+/**
+ * One game's connection to the server's /session endpoints.
+ *
+ * `solve(qubo)` takes the same model object as POST /quantum and resolves to
+ * an axios response with the same data. The first call uploads the model;
+ * later calls whose objective is a plain linear sum over the same variables
+ * and constraints only send the weights that changed. Anything else falls back
+ * to a new session, or to /quantum when the objective isn't linear in Binary
+ * variables.
+ */
+export class QuantumSession {
+  constructor(serverUrl = SERVER_URL) {
+    this.serverUrl = serverUrl;
+    this.id = null;
+    this.structure = null;
+    this.weights = null;
+  }
+
+  async solve(qubo, { timeout = 5000 } = {}) {
+    let weights = linearWeights(qubo.Objective);
+    if (weights !== null) {
+      const allowed = binaryLabels(qubo.variables);
+      if (!Object.keys(weights).every((label) => allowed.has(label))) {
+        weights = null;
+      }
+    }
+    if (weights === null) {
+      this.id = null;
+      return axios.post(`${this.serverUrl}/quantum`, qubo, {
+        headers: { 'Content-Type': 'application/json', 'X-Quantum-Priority': 'interactive' },
+        timeout
+      });
+    }
+
+    const structure = modelStructure(qubo);
+    if (this.id !== null && structure === this.structure) {
+      const changed = {};
+      for (const label of new Set([...Object.keys(weights), ...Object.keys(this.weights)])) {
+        if ((weights[label] || 0) !== (this.weights[label] || 0)) {
+          changed[label] = weights[label] || 0;
+        }
+      }
+      try {
+        const response = await postText(`${this.serverUrl}/session/${this.id}/turn`, { weights: changed }, timeout);
+        this.weights = weights;
+        return response;
+      } catch (error) {
+        if (error.response?.status !== 404) {
+          throw error;
+        }
+        // Session expired on the server; start over below.
+      }
+    }
+
+    const response = await postText(`${this.serverUrl}/session`, { priority: 'interactive', ...qubo }, timeout);
+    this.id = response.data.session;
+    this.structure = structure;
+    this.weights = weights;
+    return response;
+  }
+
+  // Server-sent events with every turn's result, e.g. for a spectator view.
+  subscribe(onTurn) {
+    if (this.id === null) {
+      return null;
+    }
+    const source = new EventSource(`${this.serverUrl}/session/${this.id}/events`);
+    source.addEventListener('turn', (event) => onTurn(JSON.parse(event.data)));
+    return source;
+  }
+
+  close() {
+    if (this.id !== null) {
+      axios.delete(`${this.serverUrl}/session/${this.id}`).catch(() => {});
+      this.id = null;
+    }
+  }
+}